@@ -158,6 +158,60 @@ PASSWORD_RESET_TIMEOUT = 14400
 LOGIN_REDIRECT_URL = "polecacz:index"
 LOGOUT_REDIRECT_URL = "polecacz:index"
 
+# Recommendations
+# Backend used to find similar games: "sql" (GameTag join), "index" (in-memory tag bitsets),
+# "sparse" (game x tag matrix) or "neighbours" (lists precomputed with compute_game_neighbours command).
+# RECOMMENDATION_METRIC is used by "sparse" backend and compute_game_neighbours command.
+# Shared tags are weighted with inverse document frequency if RECOMMENDATION_WEIGHTING is "idf"
+RECOMMENDATION_BACKEND = os.environ.get("RECOMMENDATION_BACKEND", "index")
+RECOMMENDATION_METRIC = os.environ.get("RECOMMENDATION_METRIC", "overlap")
+RECOMMENDATION_WEIGHTING = os.environ.get("RECOMMENDATION_WEIGHTING", "")
+# Games which appear together in users' collections are blended with tag similarity if
+# RECOMMENDATION_COOCCURRENCE_WEIGHT is positive, tag score has weight 1
+RECOMMENDATION_COOCCURRENCE_WEIGHT = float(
+    os.environ.get("RECOMMENDATION_COOCCURRENCE_WEIGHT", 0)
+)
+# Games recommended in well rated recommendations are boosted if RECOMMENDATION_FEEDBACK_WEIGHT
+# is positive
+RECOMMENDATION_FEEDBACK_WEIGHT = float(os.environ.get("RECOMMENDATION_FEEDBACK_WEIGHT", 0))
+# Larger pool of similar games is re-ranked with maximal marginal relevance if
+# RECOMMENDATION_DIVERSITY (from 0 to 1) is positive, higher value gives more diverse games
+RECOMMENDATION_DIVERSITY = float(os.environ.get("RECOMMENDATION_DIVERSITY", 0))
+
+# Recommendations are computed during request if RECOMMENDATION_JOBS is empty. With "thread" they
+# are computed by pool of RECOMMENDATION_JOB_WORKERS threads in web server process, with "db" they
+# wait in database for process_recommendation_jobs command
+RECOMMENDATION_JOBS = os.environ.get("RECOMMENDATION_JOBS", "")
+RECOMMENDATION_JOB_WORKERS = int(os.environ.get("RECOMMENDATION_JOB_WORKERS", 2))
+# Recommendations claimed by worker which did not finish them within RECOMMENDATION_JOB_TIMEOUT
+# seconds, e.g. because worker was restarted, are moved back to queue
+RECOMMENDATION_JOB_TIMEOUT = int(os.environ.get("RECOMMENDATION_JOB_TIMEOUT", 300))
+
+# Results of recommendations are cached in "recommendations" cache, least recently used
+# results are removed above MAX_ENTRIES. Versions of data used by in-memory indexes and cached
+# results are kept in database, so local memory caches are correct with many web workers, shared
+# backend (e.g. Redis or Memcached) lets workers reuse results of each other and share counters of
+# cache hits and misses
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+    "recommendations": {
+        "BACKEND": os.environ.get(
+            "RECOMMENDATION_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("RECOMMENDATION_CACHE_LOCATION", "recommendations"),
+        "TIMEOUT": int(os.environ.get("RECOMMENDATION_CACHE_TTL", 3600)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 1000)),
+        },
+    },
+}
+
 storage_config = {
 
 }
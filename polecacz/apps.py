@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PolecaczConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "polecacz"
+
+    def ready(self):
+        from polecacz.signals import connect_signals
+
+        connect_signals()
@@ -1,90 +1,273 @@
 import datetime
 import csv
+import os
+import tempfile
 import time
-from typing import Union
+from itertools import islice
+from typing import Iterable, Iterator, Union
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from polecacz.bgg_api import MECHANICS_MAP, CATEGORIES_MAP
+from polecacz.bgg_api import MECHANICS_MAP, CATEGORIES_MAP, xml_parser
+from polecacz.bgg_api.pipeline import ImportPipeline
+from polecacz.bgg_api.rate_limiter import TokenBucket
+from polecacz.bgg_api.response_cache import ResponseCache
 
 
 class BGGApiWrapper:
-    def __init__(self):
+    # XMLAPI2 accepts at most 20 ids in a single thing request
+    MAX_BATCH_SIZE = 20
+    MAX_RETRIES = 3
+    BACKOFF_TIME = 0.5
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+    CONNECTION_RETRIES = 2
+
+    def __init__(
+        self,
+        batch_size: int = MAX_BATCH_SIZE,
+        workers: int = 1,
+        rate: float = None,
+        parser: str = "lxml",
+        cache: ResponseCache = None,
+        parse_processes: int = 0,
+        pool_size: int = None,
+        timeout: tuple[float, float] = (5, 30),
+    ):
+        """
+        :param batch_size: Number of games requested in single thing request
+        :param workers: Number of concurrent requests to XMLAPI2
+        :param rate: Maximal number of requests per second, unlimited if not provided
+        :param parser: Parser used for XMLAPI2 responses, "lxml" or "soup"
+        :param cache: Disk cache for raw responses, responses are always downloaded if not provided
+        :param parse_processes: Number of processes parsing responses, parsing is done in single thread if 0
+        :param pool_size: Number of kept-alive connections per host, by default equal to number of workers
+        :param timeout: Connect and read timeout of every request in seconds
+        """
         self.api_url = "https://boardgamegeek.com/xmlapi2/"
         self.bgg_games_url = (
             "https://raw.githubusercontent.com/beefsack/bgg-ranking-historicals/master/"
         )
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.workers = max(1, workers)
+        self.rate_limiter = TokenBucket(rate) if rate else None
+        self.parser = parser
+        self.cache = cache
+        self.dump_date = None
+        self.parse_processes = parse_processes
+        self.pipeline_counters = {}
+        self.timeout = timeout
+        self.session = BGGApiWrapper._create_session(pool_size or self.workers)
+
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """
+        Creates session which keeps connections alive and reuses them between requests. Failed connection attempts
+        are retried by adapter, responses with error status are handled by wrapper
+        :param pool_size: Number of kept-alive connections per host
+        :return: Session object
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=BGGApiWrapper.CONNECTION_RETRIES,
+                read=0,
+                status=0,
+                backoff_factor=BGGApiWrapper.BACKOFF_TIME,
+            ),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_connection_stats(self) -> dict[str, int]:
+        """
+        Get statistics of connections used by session
+        :return: Dictionary with number of sent requests, opened connections and requests sent using reused connection
+        """
+        requests_counter = connections_counter = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                requests_counter += pool.num_requests
+                connections_counter += pool.num_connections
+        return {
+            "requests": requests_counter,
+            "new_connections": connections_counter,
+            "reused_connections": requests_counter - connections_counter,
+        }
 
     def prepare_data_to_import_to_database(
-        self, number_of_games: int = None
+        self, number_of_games: int = None, games_info: Iterable[dict] = None
     ) -> tuple[list[dict], list[dict]]:
+        """
+        Retrieves information about games from BGG dump and XMLAPI2
+        :param number_of_games: Number of games taken from dump, all games if not provided
+        :param games_info: Games from dump for which information will be retrieved, if not provided dump is downloaded
+        :return: List with games information and list with games for which errors occurred
+        """
         result = []
         games_with_errors = []
-        counter = 1
-        dump_filename = self._get_games_csv()
+        if games_info is None:
+            games_info = self.get_games_info_from_dump(number_of_games)
 
-        if not dump_filename:
+        if games_info is None:
             return
 
-        games_info = BGGApiWrapper._get_games_info_from_csv_file(dump_filename)
-
-        if number_of_games:
-            games_info = games_info[:number_of_games]
-        for game in games_info:
-            print(f"Processing game number: {counter}")
-            counter += 1
-            extended_info = self._get_game_information_using_id(game["id"])
+        for game in self.iterate_data_to_import_to_database(games_info):
+            if "error" in game.keys():
+                games_with_errors.append(game)
+            else:
+                result.append(game)
+        return result, games_with_errors
 
+    def iterate_data_to_import_to_database(
+        self, games_info: Iterable[dict]
+    ) -> Iterator[dict]:
+        """
+        Retrieves information about games from XMLAPI2 and yields it as soon as it is ready, in order of games_info
+        :param games_info: Iterable with games from dump
+        :return: Iterator with games information, games for which errors occurred contain "error" key
+        """
+        for game, extended_info in self._iterate_games_information(games_info):
             if "error" in extended_info.keys():
-                games_with_errors.append({**game, **extended_info})
+                yield {**game, **extended_info}
             else:
-                result.append({**game, **extended_info})
+                yield BGGApiWrapper._map_fields_to_polish_equivalent(
+                    [{**game, **extended_info}]
+                )[0]
 
-        result = BGGApiWrapper._map_fields_to_polish_equivalent(result)
-        return result, games_with_errors
+    def get_games_info_from_dump(
+        self, number_of_games: int = None
+    ) -> Union[Iterator[dict[str, str]], None]:
+        """
+        Streams BGG dump and reads games from it lazily, download stops after number_of_games rows are read
+        :param number_of_games: Number of games taken from dump, all games if not provided
+        :return: Iterator with dictionaries containing game id, rank, average and thumbnail
+        """
+        dump_lines = self._get_games_csv()
+
+        if dump_lines is None:
+            return
+
+        games_info = BGGApiWrapper._get_games_info_from_csv(dump_lines)
 
-    def _get_games_csv(self) -> Union[str, None]:
+        if number_of_games:
+            games_info = islice(games_info, number_of_games)
+        return games_info
+
+    def _iterate_games_information(
+        self, games_info: Iterable[dict]
+    ) -> Iterator[tuple[dict, dict]]:
         """
-        Get csv file with BGG games dump
-        :return: list with game ids from BoardGameGeek page
+        Retrieves information about games using ImportPipeline, in which requests are sent by worker threads and
+        responses are parsed concurrently with them. Results are yielded in the same order as games in games_info,
+        as soon as batch with given game is ready. Games are read from games_info lazily
+        :param games_info: Iterable with games from csv file
+        :return: Iterator with game from csv file and dictionary with game information or error
+        """
+        pipeline = ImportPipeline(self, parse_processes=self.parse_processes)
+        self.pipeline_counters = pipeline.counters
+        return pipeline.run(games_info)
+
+    def _get_games_csv(self) -> Union[Iterator[str], None]:
+        """
+        Get lines of csv file with BGG games dump, cached dump is read from cache directory and other dump is read
+        from response while it is downloaded. Response is closed when lines are exhausted or iterator is closed
+        :return: Iterator with lines of dump or None if dump could not be downloaded
         """
         number_of_retries = 0
         current_date = datetime.datetime.now()
         while number_of_retries < 3:
-            dump_name = str(current_date.date()) + ".csv"
-            response = requests.get(self.bgg_games_url + dump_name)
-            if response.status_code == 200:
-                dump_filename = f"dump-{dump_name}"
-                with open(dump_filename, "wb") as file:
-                    file.write(response.content)
-                return dump_filename
-            else:
-                current_date = current_date - datetime.timedelta(days=1)
-                number_of_retries += 1
+            dump_url = self.bgg_games_url + str(current_date.date()) + ".csv"
+            cached_path = self.cache.get_path(dump_url) if self.cache else None
+            if cached_path:
+                self.dump_date = str(current_date.date())
+                return BGGApiWrapper._read_csv_file(cached_path)
+            if not (self.cache and self.cache.offline):
+                try:
+                    response = self.session.get(
+                        dump_url, stream=True, timeout=self.timeout
+                    )
+                except requests.exceptions.RequestException as error:
+                    print(f"There was an error while downloading dump: {error}")
+                    response = None
+                if response is not None:
+                    if response.status_code == 200:
+                        self.dump_date = str(current_date.date())
+                        return self._read_csv_response(response, dump_url)
+                    response.close()
                 time.sleep(0.5)
+            current_date = current_date - datetime.timedelta(days=1)
+            number_of_retries += 1
         print("There was an error while downloading dump")
 
+    def _read_csv_response(
+        self, response: requests.Response, dump_url: str
+    ) -> Iterator[str]:
+        """
+        Reads lines of dump while it is downloaded. When cache is used, lines are also written to temporary file,
+        which is stored in cache only if whole dump was read
+        :param response: Streamed response with dump
+        :param dump_url: URL of dump, used as cache key
+        :return: Iterator with lines of dump
+        """
+        with response:
+            response.encoding = "utf-8"
+            lines = response.iter_lines(
+                chunk_size=self.DOWNLOAD_CHUNK_SIZE, decode_unicode=True
+            )
+            if not self.cache:
+                yield from lines
+                return
+            file = tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", newline="", suffix=".csv", delete=False
+            )
+            try:
+                with file:
+                    for line in lines:
+                        file.write(line + "\n")
+                        yield line
+                self.cache.put_file(dump_url, file.name)
+            finally:
+                os.remove(file.name)
+
     @staticmethod
-    def _get_games_info_from_csv_file(dump_filename: str) -> list[dict[str, str]]:
+    def _read_csv_file(dump_filename: str) -> Iterator[str]:
         """
-        Retrieve game ids and their names from csv file
+        Reads lines of csv file lazily, file is closed when lines are exhausted or iterator is closed
         :param dump_filename: csv filename
-        :return: list with dictionaries containing name and id
+        :return: Iterator with lines of file
         """
-        result = []
-        with open(dump_filename, newline="\n", encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile, delimiter=",")
-            for row in reader:
-                result.append(
-                    {
-                        "id": row[0],
-                        "rank": row[3],
-                        "average": row[5],
-                        "thumbnail": row[8],
-                    }
-                )
-        return result[1:]
+        with open(dump_filename, newline="", encoding="utf-8") as csvfile:
+            yield from csvfile
+
+    @staticmethod
+    def _get_games_info_from_csv(
+        dump_lines: Iterable[str],
+    ) -> Iterator[dict[str, str]]:
+        """
+        Retrieve game ids and their names from lines of csv file. Rows are read lazily, one at a time
+        :param dump_lines: Iterable with lines of csv file
+        :return: iterator with dictionaries containing name and id
+        """
+        reader = csv.reader(dump_lines, delimiter=",")
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            yield {
+                "id": row[0],
+                "rank": row[3],
+                "average": row[5],
+                "thumbnail": row[8],
+            }
 
     def _get_game_information_using_id(self, game_id: str) -> dict:
         """
@@ -92,103 +275,166 @@ class BGGApiWrapper:
         :param game_id: Game ID
         :return: Dictionary with game information
         """
+        return self._get_games_information_using_ids([game_id])[str(game_id)]
+
+    def _get_games_information_using_ids(self, game_ids: list[str]) -> dict[str, dict]:
+        """
+        Retrieve information about several games using single API request
+        :param game_ids: List with game IDs
+        :return: Dictionary which maps every game ID to dictionary with game information or error
+        """
+        game_ids = [str(game_id) for game_id in game_ids]
+        games_info = self._request_games_info_using_api(game_ids)
+        return BGGApiWrapper._parse_games_info(game_ids, games_info, self.parser)
+
+    @staticmethod
+    def _parse_games_info(
+        game_ids: list[str], games_info: Union[str, dict], parser: str
+    ) -> dict[str, dict]:
+        """
+        Parses XMLAPI2 response with information about several games
+        :param game_ids: List with requested game IDs
+        :param games_info: XML with games info or dictionary with error returned by _request_games_info_using_api
+        :param parser: Parser used for XMLAPI2 response, "lxml" or "soup"
+        :return: Dictionary which maps every game ID to dictionary with game information or error
+        """
+        if isinstance(games_info, dict):
+            return {
+                game_id: {"game_id": game_id, "error": games_info["error"]}
+                for game_id in game_ids
+            }
+        result = {}
+        if parser == "lxml":
+            try:
+                for game_id, game_info in xml_parser.iterate_items(games_info):
+                    result[game_id] = game_info
+            except etree.XMLSyntaxError as error:
+                print(f"There was an error with parsing API response: {error}")
+        else:
+            soup = BeautifulSoup(games_info, features="xml")
+            for item in soup.find_all("item"):
+                result[item.get("id")] = BGGApiWrapper._process_game_info(item)
+        for game_id in game_ids:
+            if game_id not in result:
+                print(
+                    f"There was an error with retriving information about game with id: {game_id}"
+                )
+                result[game_id] = {
+                    "game_id": game_id,
+                    "error": "Game is missing in API response",
+                }
+        return result
+
+    @staticmethod
+    def _process_game_info(item: Tag) -> dict:
+        """
+        Processes xml item with game info into form of dictionary
+        :param item: XML item with game info
+        :return: Dictionary with game info
+        """
 
-        def _get_tag_value(tag_name: str, soup: BeautifulSoup, **kwargs) -> str:
+        def _get_tag_value(tag_name: str, **kwargs) -> str:
             """
-            Get tag value from XML object
+            Get tag value from XML item
             :return: XML tag value
             """
-            tag = soup.items.item.find(tag_name, kwargs)
+            tag = item.find(tag_name, kwargs)
             return tag.get("value")
 
-        def _get_tag(tag_name: str, soup: BeautifulSoup, **kwargs) -> str:
+        def _get_tag(tag_name: str, **kwargs) -> str:
             """
-            Get tag value from XML object
+            Get tag value from XML item
             :return: XML tag value
             """
-            tag = soup.items.item.find(tag_name, kwargs)
-            return tag.string
+            tag = item.find(tag_name, kwargs)
+            return tag.string if tag else None
 
-        def _get_tag_list_values(
-            tag_name: str, soup: BeautifulSoup, **kwargs
-        ) -> list[str]:
+        def _get_tag_list_values(tag_name: str, **kwargs) -> list[str]:
             """
-            Get list with tag values from XML object
+            Get list with tag values from XML item
             :return: XML tag value
             """
-            tags = soup.items.item.find_all(tag_name, kwargs)
+            tags = item.find_all(tag_name, kwargs)
             return [tag.get("value") for tag in tags]
 
-        def _process_game_info(game_info: str) -> dict:
-            """
-            Processes xml object with game info into form of dictionary
-            :param game_info: XML object with game info
-            :return: Dictionary with game info
-            """
-            result = {}
-            soup = BeautifulSoup(game_info, features="xml")
-            result["game_name"] = _get_tag_value(
-                tag_name="name", soup=soup, **{"type": "primary"}
-            )
-            result["year_published"] = _get_tag_value(
-                tag_name="yearpublished", soup=soup
-            )
-            result["min_players"] = _get_tag_value(tag_name="minplayers", soup=soup)
-            result["max_players"] = _get_tag_value(tag_name="maxplayers", soup=soup)
-            result["playing_time"] = _get_tag_value(tag_name="playingtime", soup=soup)
-            result["alternate_name"] = _get_tag_list_values(
-                tag_name="name", soup=soup, **{"type": "alternate"}
-            )
-            result["categories"] = _get_tag_list_values(
-                tag_name="link", soup=soup, **{"type": "boardgamecategory"}
-            )
-            result["mechanics"] = _get_tag_list_values(
-                tag_name="link", soup=soup, **{"type": "boardgamemechanic"}
-            )
-            result["designer"] = ", ".join(
-                _get_tag_list_values(
-                    tag_name="link", soup=soup, **{"type": "boardgamedesigner"}
-                )[:10]
-            )
-            result["artist"] = ", ".join(
-                _get_tag_list_values(
-                    tag_name="link", soup=soup, **{"type": "boardgameartist"}
-                )[:10]
-            )
-            thumbnail = _get_tag(tag_name="thumbnail", soup=soup)
-            if thumbnail:
-                result["thumbnail"] = thumbnail
-            return result
+        result = {}
+        result["game_name"] = _get_tag_value(tag_name="name", **{"type": "primary"})
+        result["year_published"] = _get_tag_value(tag_name="yearpublished")
+        result["min_players"] = _get_tag_value(tag_name="minplayers")
+        result["max_players"] = _get_tag_value(tag_name="maxplayers")
+        result["playing_time"] = _get_tag_value(tag_name="playingtime")
+        result["alternate_name"] = _get_tag_list_values(
+            tag_name="name", **{"type": "alternate"}
+        )
+        result["categories"] = _get_tag_list_values(
+            tag_name="link", **{"type": "boardgamecategory"}
+        )
+        result["mechanics"] = _get_tag_list_values(
+            tag_name="link", **{"type": "boardgamemechanic"}
+        )
+        result["designer"] = ", ".join(
+            _get_tag_list_values(tag_name="link", **{"type": "boardgamedesigner"})[:10]
+        )
+        result["artist"] = ", ".join(
+            _get_tag_list_values(tag_name="link", **{"type": "boardgameartist"})[:10]
+        )
+        thumbnail = _get_tag(tag_name="thumbnail")
+        if thumbnail:
+            result["thumbnail"] = thumbnail
+        return result
 
-        game_info = self._request_game_info_using_api(game_id)
-        if isinstance(game_info, dict):
-            return game_info
-        processed_game_info = _process_game_info(game_info)
-        return processed_game_info
+    def _request_games_info_using_api(self, game_ids: list[str]) -> Union[str, dict]:
+        """
+        Requests information about games using XMLAPI2. If games information was returned succesfully returns XML in
+        string form, if not returns dictionary with game ids and response content
+        :param game_ids: List with game IDs
+        :return: XML with games info if request was accepted or dicitonary with game ids and response content.
+        """
+        request_url = self.api_url + f"thing?id={','.join(game_ids)}"
+        if self.cache:
+            cached_content = self.cache.get(request_url)
+            if cached_content is not None:
+                return cached_content.decode("utf-8")
+            if self.cache.offline:
+                return {"game_ids": game_ids, "error": b"Response is not cached"}
+        error = b""
+        for attempt in range(self.MAX_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            response = None
+            try:
+                response = self.session.get(request_url, timeout=self.timeout)
+                if response.status_code == 200:
+                    if self.cache:
+                        self.cache.put(request_url, response.content)
+                    return response.text
+                error = response.content
+            except requests.exceptions.RequestException as exception:
+                error = str(exception).encode("utf-8")
+            if attempt < self.MAX_RETRIES:
+                time.sleep(self._get_backoff_time(response, attempt))
+        print(
+            f"There was an error with retriving information about games with ids: {', '.join(game_ids)}"
+        )
+        return {"game_ids": game_ids, "error": error}
 
-    def _request_game_info_using_api(self, game_id: str) -> Union[str, dict]:
+    def _get_backoff_time(
+        self, response: Union[requests.Response, None], attempt: int
+    ) -> float:
         """
-        Requests information about game using XMLAPI2. If game information was returned succesfully returns XML in
-        string form, if not returns dictionary with game id and response content
-        :param game_id: Game ID
-        :return: XML with game info if request was accepted or dicitonary with game id and response content.
+        Calculates time to wait before next request. BGG answers with 202 when request was queued and with 429
+        when too many requests were sent, in the latter case Retry-After header is honoured if present
+        :param response: Response which was not accepted, None if request failed
+        :param attempt: Number of already failed attempts
+        :return: Time in seconds
         """
-        request_url = self.api_url + f"thing?id={game_id}"
-        try:
-            number_of_retries = 0
-            response = requests.get(request_url)
-            while response.status_code != 200:
-                time.sleep(0.5)
-                number_of_retries += 1
-                response = requests.get(request_url)
-                if number_of_retries >= 3 and response.status_code != 200:
-                    raise requests.exceptions.ConnectionError
-            return response.text
-        except requests.exceptions.ConnectionError:
-            print(
-                f"There was an error with retriving information about game with id: {game_id}"
-            )
-            return {"game_id": game_id, "error": response.content}
+        backoff_time = self.BACKOFF_TIME * 2**attempt
+        if response is not None and response.status_code == 429:
+            try:
+                return max(backoff_time, float(response.headers["Retry-After"]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return backoff_time
 
     @staticmethod
     def _map_fields_to_polish_equivalent(result: list[dict]) -> list[dict]:
@@ -0,0 +1,260 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+_END = object()
+
+
+class _StageError:
+    """
+    Wraps exception raised in pipeline stage, so it can be passed to the next stage
+    """
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageCounter:
+    """
+    Counts games processed by pipeline stage and time spent on processing them
+    """
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, busy_time: float) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_time += busy_time
+
+    @property
+    def throughput(self) -> float:
+        """
+        Number of games which stage is able to process per second using all its workers
+        """
+        if not self.busy_time:
+            return 0.0
+        return self.items * self.workers / self.busy_time
+
+    def __str__(self):
+        return (
+            f"{self.name}: {self.items} games, {self.busy_time:.2f}s busy, "
+            f"{self.throughput:.1f} games/s"
+        )
+
+
+def _timed_call(function: Callable, *args) -> tuple[object, float]:
+    """
+    Calls function and measures its execution time, used in worker threads and processes
+    :return: Function result and execution time in seconds
+    """
+    start = time.monotonic()
+    result = function(*args)
+    return result, time.monotonic() - start
+
+
+class ImportPipeline:
+    """
+    Retrieves information about games in stages running concurrently: fetching responses from XMLAPI2 in worker
+    threads and parsing them in separate thread or process pool. Stages are connected with bounded queues, so
+    the slowest stage, including consumer writing games, limits the speed of the whole pipeline
+    """
+
+    def __init__(self, wrapper, queue_size: int = 4, parse_processes: int = 0):
+        """
+        :param wrapper: BGGApiWrapper used to request and parse games information
+        :param queue_size: Maximal number of batches waiting between stages
+        :param parse_processes: Number of processes used for parsing, parsing is done in single thread if 0
+        """
+        self.wrapper = wrapper
+        self.queue_size = max(1, queue_size)
+        self.parse_processes = parse_processes
+        self.counters = {
+            "fetch": StageCounter("fetch", wrapper.workers),
+            "parse": StageCounter("parse", max(1, parse_processes)),
+        }
+
+    def run(self, games_info: Iterable[dict]) -> Iterator[tuple[dict, dict]]:
+        """
+        Runs pipeline for given games, results are yielded in order of games_info
+        :param games_info: Iterable with games from dump
+        :return: Iterator with game from dump and dictionary with game information or error
+        """
+        games_info = iter(games_info)
+        batches = iter(lambda: list(islice(games_info, self.wrapper.batch_size)), [])
+        fetched, parsed = queue.Queue(self.queue_size), queue.Queue(self.queue_size)
+        stop = threading.Event()
+        fetch_executor = ThreadPoolExecutor(max_workers=self.wrapper.workers)
+        if self.parse_processes:
+            parse_executor = ProcessPoolExecutor(max_workers=self.parse_processes)
+        else:
+            parse_executor = ThreadPoolExecutor(max_workers=1)
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(self._fetch(fetch_executor, batches), fetched, stop),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._run_stage,
+                args=(
+                    self._parse(parse_executor, self._iterate_queue(fetched, stop)),
+                    parsed,
+                    stop,
+                ),
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            processed = 0
+            for batch, extended_infos in self._iterate_queue(parsed, stop):
+                print(
+                    f"Processing games number: {processed + 1}-{processed + len(batch)}"
+                )
+                processed += len(batch)
+                for game in batch:
+                    yield game, extended_infos[game["id"]]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            fetch_executor.shutdown(cancel_futures=True)
+            parse_executor.shutdown(cancel_futures=True)
+
+    def _fetch(
+        self, executor: Executor, batches: Iterable[list[dict]]
+    ) -> Iterator[tuple[list[dict], object]]:
+        """
+        Requests games information for batches using executor
+        :return: Iterator with batch and XMLAPI2 response
+        """
+
+        def submit(task: tuple[list[dict], None]) -> Future:
+            batch, _ = task
+            return executor.submit(
+                _timed_call,
+                self.wrapper._request_games_info_using_api,
+                [game["id"] for game in batch],
+            )
+
+        for (batch, _), games_info in self._ordered_map(
+            submit,
+            ((batch, None) for batch in batches),
+            self.counters["fetch"],
+            2 * self.wrapper.workers,
+        ):
+            yield batch, games_info
+
+    def _parse(
+        self, executor: Executor, responses: Iterable[tuple[list[dict], object]]
+    ) -> Iterator[tuple[list[dict], dict]]:
+        """
+        Parses XMLAPI2 responses using executor
+        :return: Iterator with batch and dictionary which maps game ID to game information or error
+        """
+
+        def submit(task: tuple[list[dict], object]) -> Future:
+            batch, games_info = task
+            return executor.submit(
+                _timed_call,
+                type(self.wrapper)._parse_games_info,
+                [game["id"] for game in batch],
+                games_info,
+                self.wrapper.parser,
+            )
+
+        for (batch, _), extended_infos in self._ordered_map(
+            submit, responses, self.counters["parse"], 2 * max(1, self.parse_processes)
+        ):
+            yield batch, extended_infos
+
+    @staticmethod
+    def _ordered_map(
+        submit: Callable[[tuple[list[dict], object]], Future],
+        tasks: Iterable[tuple[list[dict], object]],
+        counter: StageCounter,
+        window: int,
+    ) -> Iterator[tuple[tuple[list[dict], object], object]]:
+        """
+        Submits tasks, which consist of batch and its payload, and yields their results in order. At most window
+        tasks are submitted ahead
+        :return: Iterator with task and its result
+        """
+        pending = deque()
+        for task in tasks:
+            pending.append((task, submit(task)))
+            if len(pending) < window:
+                continue
+            yield ImportPipeline._get_result(*pending.popleft(), counter)
+        while pending:
+            yield ImportPipeline._get_result(*pending.popleft(), counter)
+
+    @staticmethod
+    def _get_result(
+        task: tuple[list[dict], object], future: Future, counter: StageCounter
+    ) -> tuple[tuple[list[dict], object], object]:
+        """
+        Waits for task result and counts processed games
+        :return: Task and its result
+        """
+        result, busy_time = future.result()
+        counter.add(len(task[0]), busy_time)
+        return task, result
+
+    @staticmethod
+    def _run_stage(
+        source: Iterator, output: queue.Queue, stop: threading.Event
+    ) -> None:
+        """
+        Moves items from source to output queue until source is exhausted or pipeline is stopped
+        """
+        try:
+            for item in source:
+                if not ImportPipeline._put(output, item, stop):
+                    return
+        except BaseException as error:
+            ImportPipeline._put(output, _StageError(error), stop)
+            return
+        ImportPipeline._put(output, _END, stop)
+
+    @staticmethod
+    def _put(output: queue.Queue, item: object, stop: threading.Event) -> bool:
+        """
+        Puts item to bounded queue, waits while queue is full unless pipeline is stopped
+        :return: Whether item was put to queue
+        """
+        while not stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _iterate_queue(source: queue.Queue, stop: threading.Event) -> Iterator:
+        """
+        Yields items from queue until end of stage, exceptions raised in previous stage are raised again
+        """
+        while True:
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
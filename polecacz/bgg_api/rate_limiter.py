@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, which limits number of operations per second
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: Number of tokens added to bucket every second
+        :param capacity: Maximal number of tokens stored in bucket, by default equal to rate
+        """
+        if rate <= 0:
+            raise ValueError("Rate has to be greater than 0")
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Takes one token from bucket, blocks until token is available
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+    def _refill(self) -> None:
+        """
+        Adds tokens which were generated since last refill
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
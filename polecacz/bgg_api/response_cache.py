@@ -0,0 +1,153 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Union
+
+
+class ResponseCache:
+    """
+    Disk cache for raw API responses. Every response is stored in a file named after hash of its URL, file
+    modification time is the moment when response was stored and access time is the moment of last usage. Sizes
+    of responses are tracked in memory in order of usage, so directory is scanned only once when cache is created
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = None,
+        max_size: int = None,
+        offline: bool = False,
+    ):
+        """
+        :param directory: Directory in which responses are stored
+        :param ttl: Number of seconds after which response expires, responses never expire if not provided
+        :param max_size: Maximal size of cache in bytes, least recently used responses are removed above it
+        :param offline: Whether only cached responses should be used, expired responses are served in this mode
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = OrderedDict()
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._sizes[path] = size
+        self._size = sum(self._sizes.values())
+
+    def get(self, url: str) -> Union[bytes, None]:
+        """
+        Get cached response content, response removed by other thread after it was found is treated as not cached
+        :param url: Requested URL
+        :return: Response content or None if response is not cached
+        """
+        path = self.get_path(url)
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def get_path(self, url: str) -> Union[str, None]:
+        """
+        Get path to file with cached response and mark it as recently used
+        :param url: Requested URL
+        :return: Path to file with response content or None if response is not cached
+        """
+        path = self._get_cache_path(url)
+        with self._lock:
+            try:
+                modification_time = os.path.getmtime(path)
+            except FileNotFoundError:
+                self._forget(path)
+                return None
+            if (
+                not self.offline
+                and self.ttl is not None
+                and time.time() - modification_time > self.ttl
+            ):
+                os.remove(path)
+                self._forget(path)
+                return None
+            os.utime(path, (time.time(), modification_time))
+            if path in self._sizes:
+                self._sizes.move_to_end(path)
+        return path
+
+    def put(self, url: str, content: bytes) -> None:
+        """
+        Stores response content in cache
+        :param url: Requested URL
+        :param content: Response content
+        """
+        with self._create_temporary_file() as file:
+            file.write(content)
+        self._store(url, file.name)
+
+    def put_file(self, url: str, filename: str) -> None:
+        """
+        Stores copy of file with response content in cache
+        :param url: Requested URL
+        :param filename: Path to file with response content
+        """
+        with self._create_temporary_file() as file:
+            with open(filename, "rb") as source:
+                shutil.copyfileobj(source, file)
+        self._store(url, file.name)
+
+    def _create_temporary_file(self):
+        return tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".tmp-", delete=False
+        )
+
+    def _store(self, url: str, temporary_filename: str) -> None:
+        """
+        Moves temporary file into its place in cache and removes least recently used responses if needed
+        :param url: Requested URL
+        :param temporary_filename: Path to temporary file with response content
+        """
+        path = self._get_cache_path(url)
+        size = os.path.getsize(temporary_filename)
+        with self._lock:
+            os.replace(temporary_filename, path)
+            self._forget(path)
+            self._sizes[path] = size
+            self._size += size
+            self._evict()
+
+    def _forget(self, path: str) -> None:
+        """
+        Stops tracking size of response which was removed or replaced
+        :param path: Path to file with response content
+        """
+        self._size -= self._sizes.pop(path, 0)
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used responses until cache size is not greater than max_size
+        """
+        if self.max_size is None:
+            return
+        while self._size > self.max_size and self._sizes:
+            path, size = self._sizes.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _get_cache_path(self, url: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest()
+        )
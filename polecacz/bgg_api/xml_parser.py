@@ -0,0 +1,72 @@
+from io import BytesIO
+from typing import Iterator, Union
+
+from lxml import etree
+
+SIMPLE_FIELDS = {
+    "yearpublished": "year_published",
+    "minplayers": "min_players",
+    "maxplayers": "max_players",
+    "playingtime": "playing_time",
+}
+
+LINK_FIELDS = {
+    "boardgamecategory": "categories",
+    "boardgamemechanic": "mechanics",
+    "boardgamedesigner": "designer",
+    "boardgameartist": "artist",
+}
+
+
+def iterate_items(games_info: Union[str, bytes]) -> Iterator[tuple[str, dict]]:
+    """
+    Parses XMLAPI2 thing response item by item. Every item is read in single pass over its children and
+    removed from the tree right after processing, so memory usage does not grow with number of items
+    :param games_info: XML with games info
+    :return: Iterator with game id and dictionary with game info
+    """
+    if isinstance(games_info, str):
+        games_info = games_info.encode("utf-8")
+    context = etree.iterparse(BytesIO(games_info.strip()), events=("end",), tag="item")
+    for _, item in context:
+        yield item.get("id"), process_item(item)
+        item.clear()
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+
+
+def process_item(item: etree._Element) -> dict:
+    """
+    Processes xml item with game info into form of dictionary
+    :param item: XML item with game info
+    :return: Dictionary with game info
+    """
+    result = {field: None for field in SIMPLE_FIELDS.values()}
+    result["game_name"] = None
+    result["alternate_name"] = []
+    links = {field: [] for field in LINK_FIELDS.values()}
+    thumbnail = None
+    for child in item:
+        tag = child.tag
+        if tag == "name":
+            name_type = child.get("type")
+            if name_type == "primary" and result["game_name"] is None:
+                result["game_name"] = child.get("value")
+            elif name_type == "alternate":
+                result["alternate_name"].append(child.get("value"))
+        elif tag == "link":
+            field = LINK_FIELDS.get(child.get("type"))
+            if field:
+                links[field].append(child.get("value"))
+        elif tag in SIMPLE_FIELDS:
+            if result[SIMPLE_FIELDS[tag]] is None:
+                result[SIMPLE_FIELDS[tag]] = child.get("value")
+        elif tag == "thumbnail" and thumbnail is None:
+            thumbnail = child.text
+    result["categories"] = links["categories"]
+    result["mechanics"] = links["mechanics"]
+    result["designer"] = ", ".join(links["designer"][:10])
+    result["artist"] = ", ".join(links["artist"][:10])
+    if thumbnail:
+        result["thumbnail"] = thumbnail
+    return result
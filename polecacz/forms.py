@@ -14,3 +14,42 @@ class OpinionForm(forms.ModelForm):
     class Meta:
         model = Opinion
         fields = ("rating", "description")
+
+
+class RecommendationConstraintsForm(forms.Form):
+    """
+    Class responsible for validating optional constraints which recommended games have to satisfy
+    """
+
+    players = forms.IntegerField(
+        label="Liczba graczy", min_value=1, max_value=100, required=False
+    )
+    max_playing_time = forms.IntegerField(
+        label="Maksymalny czas gry (min)", min_value=1, required=False
+    )
+    year_from = forms.IntegerField(
+        label="Rok wydania od", min_value=0, max_value=9999, required=False
+    )
+    year_to = forms.IntegerField(
+        label="Rok wydania do", min_value=0, max_value=9999, required=False
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        year_from, year_to = cleaned_data.get("year_from"), cleaned_data.get("year_to")
+        if year_from is not None and year_to is not None and year_from > year_to:
+            raise forms.ValidationError(
+                "Rok wydania od nie może być późniejszy niż rok wydania do"
+            )
+        return cleaned_data
+
+    def get_constraints(self) -> dict:
+        """
+        Get constraints which were provided by user
+        :return: Dictionary with provided constraints
+        """
+        return {
+            name: value
+            for name, value in self.cleaned_data.items()
+            if value is not None
+        }
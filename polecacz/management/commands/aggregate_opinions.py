@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polecacz.recommendations.feedback import rebuild_feedback
+
+
+class Command(BaseCommand):
+    help = "Aggregates opinion ratings of recommended games and their tags"
+
+    def handle(self, *args, **options):
+        """
+        Replaces aggregated ratings with ratings of all opinions. Aggregates are updated when opinion is added,
+        so command is needed only for initial build or after opinions were removed
+        """
+        start = time.monotonic()
+        number_of_games, number_of_tags = rebuild_feedback()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Aggregated opinions of {number_of_games} games and {number_of_tags} tags "
+                f"in {time.monotonic() - start:.2f}s"
+            )
+        )
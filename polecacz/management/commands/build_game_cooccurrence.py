@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polecacz.recommendations.cooccurrence import rebuild_cooccurrence
+from polecacz.recommendations.result_cache import invalidate_recommendation_cache
+
+
+class Command(BaseCommand):
+    help = "Counts how often every pair of games appears in the same users' collection"
+
+    def handle(self, *args, **options):
+        """
+        Replaces stored co-occurrence with counts from owned games, selected games and recommendations. Stored
+        counts are kept up to date after collections change, so command is needed only for initial build or
+        after games were added to collections from the game side of relation
+        """
+        start = time.monotonic()
+        number_of_pairs = rebuild_cooccurrence()
+        invalidate_recommendation_cache()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Counted {number_of_pairs} pairs of games "
+                f"in {time.monotonic() - start:.2f}s"
+            )
+        )
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polecacz.models import GameNeighbour
+from polecacz.recommendations.result_cache import invalidate_recommendation_cache
+from polecacz.recommendations.sparse_engine import SparseRecommendationEngine
+from polecacz.recommendations.tag_weights import get_score_scale, get_tag_weights
+
+
+class Command(BaseCommand):
+    help = "Precomputes list of the most similar games for every game"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=50,
+            help="Number of neighbours stored for every game",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of games scored with single matrix product",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Scores every game against all games using sparse recommendation engine and replaces stored neighbours.
+        Metric and weighting are taken from RECOMMENDATION_METRIC and RECOMMENDATION_WEIGHTING settings
+        """
+        start = time.monotonic()
+        engine = SparseRecommendationEngine.from_database()
+        metric = getattr(settings, "RECOMMENDATION_METRIC", "overlap")
+        weights = None
+        if getattr(settings, "RECOMMENDATION_WEIGHTING", None) == "idf":
+            weights = get_tag_weights().weights
+        scale = get_score_scale(weights, metric)
+        neighbours = []
+        for batch_start in range(0, len(engine), options["batch_size"]):
+            game_ids = engine.game_ids[
+                batch_start : batch_start + options["batch_size"]
+            ]
+            scored_games = engine.score_most_similar_games_batch(
+                [engine.get_tag_names(game_id) for game_id in game_ids],
+                [[game_id] for game_id in game_ids],
+                options["top_n"],
+                metric,
+                weights,
+            )
+            for game_id, similar_games in zip(game_ids, scored_games):
+                neighbours.extend(
+                    GameNeighbour(
+                        game_id=game_id, neighbour_id=neighbour_id, score=score / scale
+                    )
+                    for neighbour_id, score in similar_games
+                )
+        with transaction.atomic():
+            GameNeighbour.objects.all().delete()
+            GameNeighbour.objects.bulk_create(neighbours, batch_size=1000)
+        invalidate_recommendation_cache()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Computed {len(neighbours)} neighbours for {len(engine)} games "
+                f"in {time.monotonic() - start:.2f}s"
+            )
+        )
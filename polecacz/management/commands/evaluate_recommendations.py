@@ -0,0 +1,129 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polecacz.recommendations.evaluation import (
+    BACKENDS,
+    RELEVANT_RATING,
+    create_synthetic_cases,
+    evaluate,
+    get_recommender,
+    load_historical_cases,
+)
+from polecacz.recommendations.tag_index import (
+    INDEX_VERSION_KEY,
+    invalidate_tag_index,
+    replace_data_version,
+)
+from polecacz.recommendations.tag_weights import (
+    TAG_WEIGHTS_VERSION_KEY,
+    invalidate_tag_weights,
+)
+
+
+class Command(BaseCommand):
+    help = "Evaluates quality and speed of recommendation backends offline"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            action="append",
+            dest="backends",
+            help=f"Evaluated backend, one of {', '.join(BACKENDS)} or dotted path of recommender function. "
+            "Can be used many times, all built-in backends are evaluated if not provided",
+        )
+        parser.add_argument(
+            "--source",
+            choices=("historical", "synthetic"),
+            default="historical",
+            help="Replay rated recommendations or create synthetic users and games",
+        )
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=200,
+            help="Maximal number of replayed recommendations or number of synthetic users",
+        )
+        parser.add_argument(
+            "--games",
+            type=int,
+            default=500,
+            help="Number of synthetic games",
+        )
+        parser.add_argument(
+            "--min-rating",
+            type=int,
+            default=RELEVANT_RATING,
+            help="Minimal opinion rating for which recommended games are relevant",
+        )
+        parser.add_argument(
+            "-k",
+            type=int,
+            default=10,
+            help="Number of recommended games",
+        )
+        parser.add_argument(
+            "--setting",
+            action="append",
+            default=[],
+            help="Setting overridden during evaluation in form NAME=VALUE, e.g. RECOMMENDATION_DIVERSITY=0.3",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        """
+        Runs every backend on the same cases and prints precision@k, coverage of catalogue, p50 and p95 latency
+        and number of queries per recommendation. Synthetic games are created in transaction which is rolled back
+        """
+        overrides = dict(self._parse_setting(setting) for setting in options["setting"])
+        recommenders = [
+            (name, get_recommender(name, overrides))
+            for name in options["backends"] or BACKENDS
+        ]
+        start = time.monotonic()
+        if options["source"] == "synthetic":
+            with transaction.atomic():
+                cases = create_synthetic_cases(
+                    options["cases"], options["games"], seed=options["seed"]
+                )
+                # Signals bump versions after commit, indexes have to see synthetic games before rollback
+                replace_data_version(INDEX_VERSION_KEY)
+                replace_data_version(TAG_WEIGHTS_VERSION_KEY)
+                if "neighbours" in dict(recommenders):
+                    call_command("compute_game_neighbours", stdout=self.stdout)
+                self._report(recommenders, cases, options["k"])
+                transaction.set_rollback(True)
+            invalidate_tag_index()
+            invalidate_tag_weights()
+        else:
+            cases = load_historical_cases(options["min_rating"], options["cases"])
+            self._report(recommenders, cases, options["k"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Evaluated {len(cases)} cases in {time.monotonic() - start:.2f}s"
+            )
+        )
+
+    def _report(self, recommenders: list, cases: list, limit: int) -> None:
+        self.stdout.write(
+            f"{'backend':<40} {'precision@' + str(limit):>13} {'coverage':>9} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'queries':>8}"
+        )
+        for name, recommender in recommenders:
+            result = evaluate(recommender, cases, limit)
+            self.stdout.write(
+                f"{name:<40} {result['precision']:>13.3f} {result['coverage']:>9.3f} "
+                f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['queries']:>8.2f}"
+            )
+
+    @staticmethod
+    def _parse_setting(setting: str) -> tuple:
+        name, separator, value = setting.partition("=")
+        if not separator:
+            raise CommandError(f"Setting {setting} has to be in form NAME=VALUE")
+        try:
+            return name, float(value)
+        except ValueError:
+            return name, value
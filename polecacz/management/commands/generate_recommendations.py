@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polecacz.recommendations.batch import generate_recommendations
+
+
+class Command(BaseCommand):
+    help = "Generates recommendation for every user with selected or owned games"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="Number of recommended games for every user",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of scoring processes, number of processors is used if not provided",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Number of users scored with single matrix product",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Scores all users with sparse recommendation engine and replaces generated recommendations which were not
+        rated yet, meant to be run as nightly job
+        """
+        start = time.monotonic()
+        number_of_recommendations, number_of_games = generate_recommendations(
+            options["limit"], options["workers"], options["chunk_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {number_of_recommendations} recommendations with {number_of_games} games "
+                f"in {time.monotonic() - start:.2f}s"
+            )
+        )
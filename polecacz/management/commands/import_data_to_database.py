@@ -1,46 +1,467 @@
-from django.core.management.base import BaseCommand
+import datetime
+import time
+from itertools import islice
+from typing import Iterable, Iterator, Union
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from taggit.models import Tag
 
 from polecacz.bgg_api.api_wrapper import BGGApiWrapper
-from polecacz.models import Game
+from polecacz.bgg_api.pipeline import StageCounter
+from polecacz.bgg_api.response_cache import ResponseCache
+from polecacz.models import Game, GameTag, ImportCheckpoint, ImportRetry
+from polecacz.recommendations.tag_index import invalidate_tag_index
+from polecacz.recommendations.tag_weights import invalidate_tag_weights
+
+GAME_FIELDS = [
+    "rank",
+    "rating",
+    "thumbnail",
+    "name",
+    "year_published",
+    "min_players",
+    "max_players",
+    "playing_time",
+    "artist",
+    "designer",
+]
+
+DUMP_FIELDS = ["rank", "rating"]
+
+# Fields which API wrapper adds to dump row of game which could not be retrieved
+ERROR_FIELDS = ["game_id", "error"]
 
 
 class Command(BaseCommand):
     help = "Imports game data to database"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of concurrent requests to BGG API",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=2.0,
+            help="Maximal number of requests to BGG API per second",
+        )
+        parser.add_argument(
+            "--parse-processes",
+            type=int,
+            default=0,
+            help="Number of processes parsing BGG responses, parsing is done in single thread if 0",
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            help="Number of kept-alive connections to BGG, equal to number of workers by default",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Read timeout of requests to BGG API in seconds",
+        )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Write games using bulk queries in chunked transactions",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of games written in single transaction",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Fetch details only for new games and games with stale details",
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=30,
+            help="Number of days after which game details are fetched again in incremental mode",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            help="Directory in which raw BGG responses are cached, responses are not cached if not provided",
+        )
+        parser.add_argument(
+            "--cache-ttl",
+            type=float,
+            default=24,
+            help="Number of hours after which cached response expires",
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=int,
+            default=500,
+            help="Maximal size of response cache in megabytes",
+        )
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Use only cached responses, requires --cache-dir",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue unfinished import of the same dump from last checkpoint",
+        )
+        parser.add_argument(
+            "--retry",
+            action="store_true",
+            help="Import only games from retry queue",
+        )
+
     def handle(self, *args, **options):
         """
         Creates or updates existing game data using csv file, which is downloaded
         """
-        bgg_api_wrap = BGGApiWrapper()
-        data, wrong_data = bgg_api_wrap.prepare_data_to_import_to_database(400)
-        counter = 0
-        for game_info in data:
-            try:
-                game, _ = Game.objects.update_or_create(game_id=game_info["id"])
-                self._set_game_attributes(game, game_info)
-                game.save()
-                counter += 1
-            except Exception as exception:
+        if options["offline"] and not options["cache_dir"]:
+            raise CommandError("--offline requires --cache-dir")
+        cache = None
+        if options["cache_dir"]:
+            cache = ResponseCache(
+                options["cache_dir"],
+                ttl=options["cache_ttl"] * 3600,
+                max_size=options["cache_size"] * 1024 * 1024,
+                offline=options["offline"],
+            )
+        bgg_api_wrap = BGGApiWrapper(
+            workers=options["workers"],
+            rate=options["rate"],
+            cache=cache,
+            parse_processes=options["parse_processes"],
+            pool_size=options["pool_size"],
+            timeout=(5, options["timeout"]),
+        )
+        checkpoint = None
+        if options["retry"]:
+            games_info = [retry.game_info for retry in ImportRetry.objects.all()]
+        else:
+            games_info = bgg_api_wrap.get_games_info_from_dump(400)
+            if games_info is None:
+                return
+            games_info = self._number_rows(games_info)
+            checkpoint = self._get_checkpoint(bgg_api_wrap.dump_date, options["resume"])
+            if checkpoint.last_row:
                 self.stdout.write(
-                    self.style.WARNING(
-                        f"There was a problem with game: {game_info}, Exception: {exception.__class__.__name__}: {str(exception)}"
+                    self.style.SUCCESS(
+                        f"Resuming import from row {checkpoint.last_row + 1}"
                     )
                 )
+                games_info = islice(games_info, checkpoint.last_row, None)
+        if options["incremental"]:
+            games_info = self._prepare_incremental_import(
+                games_info,
+                datetime.timedelta(days=options["max_age"]),
+                options["chunk_size"],
+            )
+
+        write_counter = StageCounter("write")
+        counter, failed_counter = self._import_in_chunks(
+            bgg_api_wrap.iterate_data_to_import_to_database(games_info),
+            options["chunk_size"],
+            options["bulk"],
+            checkpoint,
+            write_counter,
+        )
+        if checkpoint:
+            checkpoint.finished = True
+            checkpoint.save()
         self.stdout.write(self.style.SUCCESS(f"Processed {counter} games"))
-        if wrong_data:
+        for stage_counter in [*bgg_api_wrap.pipeline_counters.values(), write_counter]:
+            self.stdout.write(str(stage_counter))
+        connection_stats = bgg_api_wrap.get_connection_stats()
+        self.stdout.write(
+            f"connections: {connection_stats['requests']} requests, "
+            f"{connection_stats['new_connections']} new, {connection_stats['reused_connections']} reused"
+        )
+        if failed_counter:
             self.stdout.write(
                 self.style.WARNING(
-                    "There was an error with preparing data to import, affected games: "
+                    f"There was an error with preparing data to import for {failed_counter} games, "
+                    f"they were added to retry queue, use --retry to import them again"
                 )
             )
-            for game in wrong_data:
-                self.stdout.write(self.style.WARNING(game))
 
     @staticmethod
-    def _set_game_attributes(game: Game, game_info: dict) -> Game:
+    def _number_rows(games_info: Iterable[dict]) -> Iterator[dict]:
         """
-        Sets game attributes based on game_info dictionary
-        :param game: Game object for which attributes will be set
+        Adds number of dump row to every game
+        :param games_info: Iterable with games from dump
+        :return: Iterator with games from dump
+        """
+        for row, game_info in enumerate(games_info, 1):
+            game_info["row"] = row
+            yield game_info
+
+    @staticmethod
+    def _get_checkpoint(dump_date: str, resume: bool) -> ImportCheckpoint:
+        """
+        Get checkpoint for given dump, progress is reset unless import is resumed
+        :param dump_date: Date of dump used in import
+        :param resume: Whether unfinished import from the same dump should be continued
+        :return: ImportCheckpoint object
+        """
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(dump_date=dump_date)
+        if not resume or checkpoint.finished:
+            checkpoint.last_row = 0
+            checkpoint.finished = False
+            checkpoint.save()
+        return checkpoint
+
+    def _import_in_chunks(
+        self,
+        data: Iterable[dict],
+        chunk_size: int,
+        bulk: bool,
+        checkpoint: Union[ImportCheckpoint, None],
+        write_counter: StageCounter,
+    ) -> tuple[int, int]:
+        """
+        Writes games as soon as chunk of them is retrieved, every chunk is written in separate transaction together
+        with checkpoint. Games which could not be retrieved are added to retry queue, tag index and tag weights are
+        invalidated once after every chunk is committed, because bulk queries do not send signals
+        :param data: Iterable with information about games
+        :param chunk_size: Number of games written in single transaction
+        :param bulk: Whether games should be written using bulk queries
+        :param checkpoint: Checkpoint which is moved after every chunk, not used if not provided
+        :param write_counter: Counter of games written to database and time spent on writing
+        :return: Number of processed games and number of games added to retry queue
+        """
+        counter = failed_counter = 0
+        data = iter(data)
+        for chunk in iter(lambda: list(islice(data, chunk_size)), []):
+            games = [game_info for game_info in chunk if "error" not in game_info]
+            failed_games = [game_info for game_info in chunk if "error" in game_info]
+            start = time.monotonic()
+            with transaction.atomic():
+                if bulk:
+                    counter += self._bulk_import_chunk(games)
+                else:
+                    counter += self._import(games)
+                self._update_retry_queue(games, failed_games)
+                if checkpoint and "row" in chunk[-1]:
+                    checkpoint.last_row = chunk[-1]["row"]
+                    checkpoint.save()
+                invalidate_tag_index()
+                invalidate_tag_weights()
+            write_counter.add(len(chunk), time.monotonic() - start)
+            failed_counter += len(failed_games)
+        return counter, failed_counter
+
+    @staticmethod
+    def _update_retry_queue(games: list[dict], failed_games: list[dict]) -> None:
+        """
+        Removes retrieved games from retry queue and adds games which could not be retrieved together with their
+        whole dump row
+        :param games: List with games which were retrieved
+        :param failed_games: List with games which could not be retrieved
+        """
+        ImportRetry.objects.filter(
+            game_id__in=[game_info["id"] for game_info in games]
+        ).delete()
+        queued_games = ImportRetry.objects.in_bulk(
+            [game_info["id"] for game_info in failed_games], field_name="game_id"
+        )
+        new_retries = []
+        for game_info in failed_games:
+            error = game_info["error"]
+            if isinstance(error, bytes):
+                error = error.decode("utf-8", errors="replace")
+            retry = queued_games.get(game_info["id"])
+            if retry:
+                retry.attempts += 1
+                retry.error = error
+            else:
+                new_retries.append(
+                    ImportRetry(
+                        game_id=game_info["id"],
+                        game_info={
+                            key: value
+                            for key, value in game_info.items()
+                            if key not in ERROR_FIELDS
+                        },
+                        error=error,
+                    )
+                )
+        ImportRetry.objects.bulk_update(queued_games.values(), ["attempts", "error"])
+        ImportRetry.objects.bulk_create(new_retries)
+
+    def _prepare_incremental_import(
+        self,
+        games_info: Iterable[dict],
+        max_age: datetime.timedelta,
+        chunk_size: int,
+    ) -> list[dict]:
+        """
+        Updates fields which come from dump for games with fresh details and selects games, which details have to
+        be fetched from API, that is new games and games which details are older than max_age. Dump is compared
+        with database in chunks, so only games which have to be fetched are kept in memory. Thumbnail is not
+        compared, because stored thumbnail comes from API and differs from the one in dump
+        :param games_info: Iterable with games from dump
+        :param max_age: Age after which game details are fetched again
+        :param chunk_size: Number of games compared with database using single query
+        :return: List with games from dump which details have to be fetched
+        """
+        stale_date = timezone.now() - max_age
+        to_fetch = []
+        new_counter = refreshed_counter = skipped_counter = changed_counter = 0
+        games_info = iter(games_info)
+        for chunk in iter(lambda: list(islice(games_info, chunk_size)), []):
+            stored_games = {
+                game.game_id: game
+                for game in Game.objects.filter(
+                    game_id__in=[game["id"] for game in chunk]
+                ).only("id", "game_id", *DUMP_FIELDS, "details_updated_at")
+            }
+            changed_games = []
+            for game_info in chunk:
+                game = stored_games.get(game_info["id"])
+                if game is None:
+                    new_counter += 1
+                    to_fetch.append(game_info)
+                elif (
+                    game.details_updated_at is None
+                    or game.details_updated_at < stale_date
+                ):
+                    refreshed_counter += 1
+                    to_fetch.append(game_info)
+                else:
+                    skipped_counter += 1
+                    dump_values = (int(game_info["rank"]), float(game_info["average"]))
+                    if dump_values != (game.rank, game.rating):
+                        game.rank, game.rating = dump_values
+                        changed_games.append(game)
+            if changed_games:
+                with transaction.atomic():
+                    Game.objects.bulk_update(changed_games, DUMP_FIELDS)
+                    invalidate_tag_index()
+                changed_counter += len(changed_games)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Skipped {skipped_counter} games ({changed_counter} with updated ranking), "
+                f"refreshed {refreshed_counter} games, new {new_counter} games"
+            )
+        )
+        return to_fetch
+
+    def _import(self, data: list[dict]) -> int:
+        """
+        Creates or updates games one by one
+        :param data: List with information about games
+        :return: Number of processed games
+        """
+        counter = 0
+        for game_info in data:
+            try:
+                with transaction.atomic():
+                    game, _ = Game.objects.update_or_create(game_id=game_info["id"])
+                    self._set_game_attributes(game, game_info)
+                    game.save()
+                counter += 1
+            except Exception as exception:
+                self._write_game_warning(game_info, exception)
+        return counter
+
+    def _bulk_import_chunk(self, chunk: list[dict]) -> int:
+        """
+        Creates new games, updates changed games and synchronizes their tags using constant number of queries
+        :param chunk: List with information about games
+        :return: Number of processed games
+        """
+        existing_games = {
+            game.game_id: game
+            for game in Game.objects.filter(
+                game_id__in=[game_info["id"] for game_info in chunk]
+            )
+        }
+        new_games, changed_games, game_tags = [], [], {}
+        for game_info in chunk:
+            game = existing_games.get(game_info["id"])
+            is_new = game is None
+            if is_new:
+                game = Game(game_id=game_info["id"])
+            old_values = [getattr(game, field) for field in GAME_FIELDS]
+            try:
+                self._set_game_fields(game, game_info)
+            except Exception as exception:
+                self._write_game_warning(game_info, exception)
+                continue
+            if is_new:
+                new_games.append(game)
+            elif old_values != [getattr(game, field) for field in GAME_FIELDS]:
+                changed_games.append(game)
+            game_tags[game.id] = {*game_info["categories"], *game_info["mechanics"]}
+
+        Game.objects.bulk_create(new_games)
+        Game.objects.bulk_update(changed_games, GAME_FIELDS + ["details_updated_at"])
+        Game.objects.filter(id__in=game_tags.keys()).exclude(
+            id__in=[game.id for game in new_games + changed_games]
+        ).update(details_updated_at=timezone.now())
+        self._bulk_set_tags(game_tags)
+        return len(game_tags)
+
+    @staticmethod
+    def _bulk_set_tags(game_tags: dict) -> None:
+        """
+        Sets tags of many games at once, only missing GameTag rows are inserted and only redundant ones are removed
+        :param game_tags: Dictionary which maps game id to set with tag names
+        """
+        tag_names = set().union(*game_tags.values())
+        tags = {tag.name: tag.id for tag in Tag.objects.filter(name__in=tag_names)}
+        for tag_name in tag_names - tags.keys():
+            tags[tag_name] = Tag.objects.get_or_create(name=tag_name)[0].id
+
+        wanted = {
+            (game_id, tags[tag_name])
+            for game_id, names in game_tags.items()
+            for tag_name in names
+        }
+        existing = {}
+        for game_tag_id, game_id, tag_id in GameTag.objects.filter(
+            content_object_id__in=game_tags.keys()
+        ).values_list("id", "content_object_id", "tag_id"):
+            existing[(game_id, tag_id)] = game_tag_id
+
+        redundant = [
+            game_tag_id for key, game_tag_id in existing.items() if key not in wanted
+        ]
+        if redundant:
+            GameTag.objects.filter(id__in=redundant).delete()
+        GameTag.objects.bulk_create(
+            [
+                GameTag(content_object_id=game_id, tag_id=tag_id)
+                for game_id, tag_id in wanted - existing.keys()
+            ]
+        )
+
+    def _write_game_warning(self, game_info: dict, exception: Exception) -> None:
+        """
+        Writes warning about game which could not be imported
+        :param game_info: Dictionary with information about game
+        :param exception: Exception which was raised during import
+        """
+        self.stdout.write(
+            self.style.WARNING(
+                f"There was a problem with game: {game_info}, Exception: {exception.__class__.__name__}: {str(exception)}"
+            )
+        )
+
+    @staticmethod
+    def _set_game_fields(game: Game, game_info: dict) -> Game:
+        """
+        Sets game fields, except tags, based on game_info dictionary
+        :param game: Game object for which fields will be set
         :param game_info: Dictionary with information about game
         """
         game.rank = int(game_info["rank"])
@@ -53,4 +474,16 @@ class Command(BaseCommand):
         game.playing_time = int(game_info["playing_time"])
         game.artist = game_info["artist"]
         game.designer = game_info["designer"]
+        game.details_updated_at = timezone.now()
+        return game
+
+    @staticmethod
+    def _set_game_attributes(game: Game, game_info: dict) -> Game:
+        """
+        Sets game attributes based on game_info dictionary
+        :param game: Game object for which attributes will be set
+        :param game_info: Dictionary with information about game
+        """
+        Command._set_game_fields(game, game_info)
         game.tags.set([*game_info["categories"], *game_info["mechanics"]])
+        return game
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polecacz.recommendations.jobs import process_pending_recommendations
+
+
+class Command(BaseCommand):
+    help = "Computes recommendations which wait in queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process pending recommendations and exit instead of waiting for new ones",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Number of seconds between checks of queue",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Processes recommendations created with RECOMMENDATION_JOBS set to "db", also picks up recommendations
+        which were not computed by pool of threads before web server was stopped
+        """
+        while True:
+            processed = process_pending_recommendations()
+            if processed:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Computed {processed} recommendations")
+                )
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
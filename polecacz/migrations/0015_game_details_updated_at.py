@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0014_imagemetadata_add_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="details_updated_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
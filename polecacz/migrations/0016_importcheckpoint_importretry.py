@@ -0,0 +1,50 @@
+# Generated by Django 4.1 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0015_game_details_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dump_date", models.CharField(max_length=10, unique=True)),
+                ("last_row", models.IntegerField(default=0)),
+                ("finished", models.BooleanField(default=False)),
+                ("update_date", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ImportRetry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("game_id", models.CharField(max_length=35, unique=True)),
+                ("game_info", models.JSONField()),
+                ("error", models.TextField(blank=True)),
+                ("attempts", models.IntegerField(default=1)),
+                ("update_date", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1 on 2026-10-17 21:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0016_importcheckpoint_importretry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameNeighbour",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbours",
+                        to="polecacz.game",
+                    ),
+                ),
+                (
+                    "neighbour",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="polecacz.game",
+                    ),
+                ),
+            ],
+        ),
+    ]
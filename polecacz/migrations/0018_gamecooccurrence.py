@@ -0,0 +1,48 @@
+# Generated by Django 4.1 on 2026-10-17 21:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0017_gameneighbour"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameCooccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("counter", models.IntegerField(default=0)),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cooccurrences",
+                        to="polecacz.game",
+                    ),
+                ),
+                (
+                    "other_game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="polecacz.game",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("game", "other_game")},
+            },
+        ),
+    ]
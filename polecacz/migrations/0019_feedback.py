@@ -0,0 +1,63 @@
+# Generated by Django 4.1 on 2026-10-17 21:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("taggit", "0005_auto_20220424_2025"),
+        ("polecacz", "0018_gamecooccurrence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagFeedback",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("counter", models.IntegerField(default=0)),
+                (
+                    "tag",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feedback",
+                        to="taggit.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="GameFeedback",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("counter", models.IntegerField(default=0)),
+                (
+                    "game",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feedback",
+                        to="polecacz.game",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0019_feedback"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Oczekuje"),
+                    ("running", "W trakcie"),
+                    ("done", "Gotowa"),
+                    ("failed", "Błąd"),
+                ],
+                db_index=True,
+                default="done",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0020_recommendation_status"),
+    ]
+
+    operations = [
+        # Existing table of recommended games is reused as through model, so only state is changed here
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="RecommendedGame",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "game",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="recommendation_entries",
+                                to="polecacz.game",
+                            ),
+                        ),
+                        (
+                            "recommendation",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="polecacz.recommendation",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "polecacz_recommendation_recommended_games",
+                        "ordering": ("rank",),
+                        "unique_together": {("recommendation", "game")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="recommendation",
+                    name="recommended_games",
+                    field=models.ManyToManyField(
+                        related_name="recommended_games",
+                        through="polecacz.RecommendedGame",
+                        to="polecacz.game",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="recommendedgame",
+            name="rank",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="recommendedgame",
+            name="score",
+            field=models.FloatField(null=True),
+        ),
+    ]
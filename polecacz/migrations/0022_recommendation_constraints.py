@@ -0,0 +1,37 @@
+# Generated by Django 4.1 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0021_recommendedgame"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="constraints",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["min_players", "max_players"],
+                name="polecacz_ga_min_pla_14c595_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["playing_time"], name="polecacz_ga_playing_2e0c1b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["year_published"], name="polecacz_ga_year_pu_4f3c01_idx"
+            ),
+        ),
+    ]
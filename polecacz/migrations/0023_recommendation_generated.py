@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0022_recommendation_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="generated",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-17 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0023_recommendation_generated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendedgame",
+            name="breakdown",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
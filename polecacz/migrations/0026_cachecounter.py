@@ -0,0 +1,29 @@
+# Generated by Django 4.1 on 2026-10-17 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0025_dataversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=100, unique=True)),
+                ("value", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-17 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0026_cachecounter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendation",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.1 on 2026-10-17 22:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polecacz", "0027_recommendation_claimed_at"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="CacheCounter",
+        ),
+    ]
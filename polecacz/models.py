@@ -4,7 +4,7 @@ from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from taggit.managers import TaggableManager
-from taggit.models import TaggedItemBase
+from taggit.models import Tag, TaggedItemBase
 
 
 class GameTag(TaggedItemBase):
@@ -32,23 +32,65 @@ class Game(models.Model):
     min_players = models.IntegerField(null=True)
     max_players = models.IntegerField(null=True)
     playing_time = models.IntegerField(null=True)
+    details_updated_at = models.DateTimeField(null=True)
     tags = TaggableManager(through=GameTag)
 
     def __str__(self):
         return f"{self.name}, Tags: {self.tags.names()}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["min_players", "max_players"]),
+            models.Index(fields=["playing_time"]),
+            models.Index(fields=["year_published"]),
+        ]
+
 
 class Recommendation(models.Model):
     """
     Recommendation model, keeps information about created recommendation
     """
 
+    class Status(models.TextChoices):
+        PENDING = "pending", "Oczekuje"
+        RUNNING = "running", "W trakcie"
+        DONE = "done", "Gotowa"
+        FAILED = "failed", "Błąd"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     selected_games = models.ManyToManyField(Game, related_name="selected_games")
-    recommended_games = models.ManyToManyField(Game, related_name="recommended_games")
+    recommended_games = models.ManyToManyField(
+        Game, related_name="recommended_games", through="RecommendedGame"
+    )
     opinion_created = models.BooleanField(default=False, null=True)
     creation_date = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.DONE, db_index=True
+    )
+    constraints = models.JSONField(default=dict, blank=True)
+    generated = models.BooleanField(default=False, db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+
+class RecommendedGame(models.Model):
+    """
+    RecommendedGame model, keeps position of game in recommendation, its similarity score and breakdown of score
+    with shared tags and their contributions
+    """
+
+    recommendation = models.ForeignKey(Recommendation, on_delete=models.CASCADE)
+    game = models.ForeignKey(
+        Game, on_delete=models.CASCADE, related_name="recommendation_entries"
+    )
+    rank = models.PositiveIntegerField(default=0)
+    score = models.FloatField(null=True)
+    breakdown = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        db_table = "polecacz_recommendation_recommended_games"
+        unique_together = ("recommendation", "game")
+        ordering = ("rank",)
 
 
 class SelectedGames(models.Model):
@@ -90,3 +132,81 @@ class Opinion(models.Model):
     )
     description = models.TextField(max_length=500)
     recommendation = models.ForeignKey(Recommendation, on_delete=models.CASCADE)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    ImportCheckpoint model, keeps information about progress of game import from given dump
+    """
+
+    dump_date = models.CharField(max_length=10, unique=True)
+    last_row = models.IntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    update_date = models.DateTimeField(auto_now=True)
+
+
+class ImportRetry(models.Model):
+    """
+    ImportRetry model, keeps information about games which could not be retrieved from API during import
+    """
+
+    game_id = models.CharField(max_length=35, unique=True)
+    game_info = models.JSONField()
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=1)
+    update_date = models.DateTimeField(auto_now=True)
+
+
+class DataVersion(models.Model):
+    """
+    DataVersion model, keeps version of data from which in-memory indexes and cached recommendations were built,
+    version is replaced when data changes, so all processes using database notice the change
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    version = models.CharField(max_length=32)
+
+
+class GameNeighbour(models.Model):
+    """
+    GameNeighbour model, keeps information about game from precomputed list of games most similar to given game
+    """
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="neighbours")
+    neighbour = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+
+class GameCooccurrence(models.Model):
+    """
+    GameCooccurrence model, keeps number of users' collections (owned games, selected games and games selected
+    for recommendations) in which both games appear, every pair is stored in both directions
+    """
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="cooccurrences")
+    other_game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="+")
+    counter = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("game", "other_game")
+
+
+class GameFeedback(models.Model):
+    """
+    GameFeedback model, keeps sum and number of opinion ratings of recommendations in which game was recommended
+    """
+
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, related_name="feedback")
+    rating_sum = models.IntegerField(default=0)
+    counter = models.IntegerField(default=0)
+
+
+class TagFeedback(models.Model):
+    """
+    TagFeedback model, keeps sum and number of opinion ratings of recommendations in which games with tag were
+    recommended
+    """
+
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, related_name="feedback")
+    rating_sum = models.IntegerField(default=0)
+    counter = models.IntegerField(default=0)
@@ -0,0 +1,200 @@
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+
+from polecacz.models import OwnedGames, Recommendation, RecommendedGame, SelectedGames
+from polecacz.recommendations.batch_worker import init_worker, score_chunk
+from polecacz.recommendations.breakdown import make_breakdown
+from polecacz.recommendations.sparse_engine import SparseRecommendationEngine
+from polecacz.recommendations.tag_weights import (
+    get_score_scale,
+    get_tag_weights,
+    unscale_contributions,
+)
+
+
+def load_user_interactions() -> dict:
+    """
+    Loads selected and owned games of all users with two queries
+    :return: Dictionary which maps user id to list with ids of selected games and list with ids of owned games
+    """
+    interactions = {}
+    for through_model, owner_field, position in (
+        (SelectedGames.selected_games.through, "selectedgames__user_id", 0),
+        (OwnedGames.owned_games.through, "ownedgames__user_id", 1),
+    ):
+        for user_id, game_id in through_model.objects.values_list(
+            owner_field, "game_id"
+        ).iterator():
+            interactions.setdefault(user_id, ([], []))[position].append(game_id)
+    return interactions
+
+
+def get_selection(selected_ids: list, owned_ids: list) -> tuple[list, list]:
+    """
+    Chooses games for which recommendation is generated. Selected games are used like in recommendation created
+    by user, owned games are used when user did not select any game. Owned games are never recommended
+    :param selected_ids: List with ids of games selected by user
+    :param owned_ids: List with ids of games owned by user
+    :return: List with ids of games used as selection and list with ids of games which should not be returned
+    """
+    selection = selected_ids or owned_ids
+    return selection, list({*selection, *owned_ids})
+
+
+def score_users(
+    engine: SparseRecommendationEngine,
+    selections: list[tuple[list, list]],
+    limit: int,
+    metric: str = "overlap",
+    weights: dict[str, float] = None,
+) -> list[list[tuple[str, float, dict]]]:
+    """
+    Scores all games against selections of many users with single matrix product, breakdown of score is
+    created for every recommended game
+    :param engine: Engine with games and tags
+    :param selections: List with ids of selected games and ids of games which should not be returned
+    :param limit: Maximal number of recommended games for every user
+    :param metric: Similarity measure, one of METRICS
+    :param weights: Weight of every tag, every tag has weight 1 if not provided
+    :return: List with game ids, scores and breakdowns ordered by similarity for every selection
+    """
+    tag_lists = [
+        {
+            tag_name
+            for game_id in selected_ids
+            for tag_name in engine.get_tag_names(game_id)
+        }
+        for selected_ids, _ in selections
+    ]
+    scored_games = engine.score_most_similar_games_batch(
+        tag_lists,
+        [exclude_ids for _, exclude_ids in selections],
+        limit,
+        metric,
+        weights,
+    )
+    scale = get_score_scale(weights, metric)
+    result = []
+    for tags, games in zip(tag_lists, scored_games):
+        tag_contributions = unscale_contributions(
+            engine.explain_games(
+                [game_id for game_id, _ in games], tags, metric, weights
+            ),
+            scale,
+        )
+        result.append(
+            [
+                (game_id, score / scale, make_breakdown(tag_contributions[game_id]))
+                for game_id, score in games
+            ]
+        )
+    return result
+
+
+def _iterate_chunks(items: list, chunk_size: int) -> Iterator[list]:
+    for start in range(0, len(items), chunk_size):
+        yield items[start : start + chunk_size]
+
+
+def generate_recommendations(
+    limit: int = 10,
+    workers: int = None,
+    chunk_size: int = 200,
+    start_method: str = None,
+) -> tuple[int, int]:
+    """
+    Generates fresh recommendation for every user with selected or owned games. Interactions are loaded in bulk,
+    users are scored in chunks with sparse engine in pool of processes and results are written with bulk inserts.
+    Previous generated recommendations without opinion are replaced. Metric and weighting are taken from
+    RECOMMENDATION_METRIC and RECOMMENDATION_WEIGHTING settings
+    :param limit: Maximal number of recommended games for every user
+    :param workers: Number of processes, scoring runs in current process if it is 1, number of processors is
+    used if not provided
+    :param chunk_size: Number of users scored with single matrix product
+    :param start_method: Method of starting processes, e.g. "fork" or "spawn", default method of platform is
+    used if not provided
+    :return: Number of created recommendations and number of recommended games
+    """
+    interactions = load_user_interactions()
+    user_ids = list(interactions)
+    selections = [get_selection(*interactions[user_id]) for user_id in user_ids]
+    engine = SparseRecommendationEngine.from_database()
+    metric = getattr(settings, "RECOMMENDATION_METRIC", "overlap")
+    weights = None
+    if getattr(settings, "RECOMMENDATION_WEIGHTING", None) == "idf":
+        weights = get_tag_weights().weights
+    chunks = list(_iterate_chunks(selections, chunk_size))
+    if workers == 1:
+        scored_chunks = [
+            score_users(engine, chunk, limit, metric, weights) for chunk in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=init_worker,
+            initargs=(
+                pickle.dumps({"engine": engine, "metric": metric, "weights": weights}),
+            ),
+        ) as executor:
+            scored_chunks = list(
+                executor.map(score_chunk, chunks, [limit] * len(chunks))
+            )
+    scored_games = [games for chunk in scored_chunks for games in chunk]
+    return save_recommendations(
+        [
+            (user_id, selected_ids, games)
+            for user_id, (selected_ids, _), games in zip(
+                user_ids, selections, scored_games
+            )
+            if games
+        ]
+    )
+
+
+def save_recommendations(
+    recommendations: Iterable[tuple[int, list, list[tuple[str, float, dict]]]]
+) -> tuple[int, int]:
+    """
+    Replaces generated recommendations without opinion with new ones using bulk inserts
+    :param recommendations: Iterable with user id, ids of selected games and recommended game ids with scores
+    and breakdowns
+    :return: Number of created recommendations and number of recommended games
+    """
+    recommendations = list(recommendations)
+    objects = [
+        Recommendation(user_id=user_id, generated=True)
+        for user_id, _, _ in recommendations
+    ]
+    selected_games = []
+    recommended_games = []
+    for recommendation, (_, selected_ids, games) in zip(objects, recommendations):
+        selected_games.extend(
+            Recommendation.selected_games.through(
+                recommendation_id=recommendation.id, game_id=game_id
+            )
+            for game_id in selected_ids
+        )
+        recommended_games.extend(
+            RecommendedGame(
+                recommendation_id=recommendation.id,
+                game_id=game_id,
+                rank=rank,
+                score=score,
+                breakdown=breakdown,
+            )
+            for rank, (game_id, score, breakdown) in enumerate(games, start=1)
+        )
+    with transaction.atomic():
+        Recommendation.objects.filter(generated=True, opinion_created=False).delete()
+        Recommendation.objects.bulk_create(objects, batch_size=1000)
+        Recommendation.selected_games.through.objects.bulk_create(
+            selected_games, batch_size=1000
+        )
+        RecommendedGame.objects.bulk_create(recommended_games, batch_size=1000)
+    return len(objects), len(recommended_games)
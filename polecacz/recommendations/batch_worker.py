@@ -0,0 +1,30 @@
+import pickle
+
+import django
+from django.apps import apps
+
+# Module is imported by processes of pool before Django is set up, so models can be imported only in functions
+_worker_state = {}
+
+
+def init_worker(state: bytes):
+    """
+    Sets up Django in processes started with "spawn" or "forkserver", which do not inherit loaded apps, and
+    unpickles engine afterwards, because unpickling it imports models
+    :param state: Pickled dictionary with engine, metric and weights
+    """
+    if not apps.ready:
+        django.setup()
+    _worker_state.update(pickle.loads(state))
+
+
+def score_chunk(selections: list[tuple[list, list]], limit: int) -> list:
+    from polecacz.recommendations.batch import score_users
+
+    return score_users(
+        _worker_state["engine"],
+        selections,
+        limit,
+        _worker_state["metric"],
+        _worker_state["weights"],
+    )
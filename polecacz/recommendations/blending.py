@@ -0,0 +1,35 @@
+from polecacz.models import Game
+
+BLEND_POOL_FACTOR = 5
+
+
+def blend_scores(
+    games: list[Game],
+    weighted_scores: list[tuple[dict, float]],
+    limit: int,
+    names: list[str] = None,
+) -> list[Game]:
+    """
+    Orders games by weighted sum of scores, every score is divided by its highest absolute value first, so scores
+    with different ranges can be blended
+    :param games: List with candidate games
+    :param weighted_scores: List with dictionary which maps game id to score and weight of this score
+    :param limit: Maximal number of returned games
+    :param names: Names of scores, if provided contribution of every score is set in components attribute
+    :return: List with games ordered by blended score and rating, blended score is set in score attribute
+    """
+    normalized_weights = [
+        (scores, weight / (max(map(abs, scores.values()), default=0) or 1))
+        for scores, weight in weighted_scores
+    ]
+
+    for game in games:
+        contributions = [
+            weight * scores.get(game.id, 0) for scores, weight in normalized_weights
+        ]
+        game.score = sum(contributions)
+        if names is not None:
+            game.components = dict(zip(names, contributions))
+    return sorted(
+        games, key=lambda game: (-game.score, game.rating is None, -(game.rating or 0))
+    )[:limit]
@@ -0,0 +1,76 @@
+from django.db.models import Aggregate, JSONField
+
+BREAKDOWN_PRECISION = 4
+
+
+class TagBreakdown(Aggregate):
+    """
+    Aggregates matching tags of game with their contributions to score into breakdown in the same form as
+    make_breakdown, so score and its breakdown are computed with the same query
+    """
+
+    function = "jsonb_object_agg"
+    template = "jsonb_build_object('tags', %(function)s(%(expressions)s))"
+    output_field = JSONField()
+
+    def __init__(self, tag_name, contribution, **extra):
+        """
+        :param tag_name: Expression with name of matching tag
+        :param contribution: Expression with contribution of tag to score
+        """
+        super().__init__(tag_name, contribution, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function="json_group_object",
+            template="json_object('tags', %(function)s(%(expressions)s))",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function="JSON_OBJECTAGG",
+            template="JSON_OBJECT('tags', %(function)s(%(expressions)s))",
+            **extra_context,
+        )
+
+
+def make_breakdown(tag_contributions: dict = None, **components: float) -> dict:
+    """
+    Creates compact breakdown of score, contributions are rounded and components without contribution are skipped
+    :param tag_contributions: Dictionary which maps name of matching tag to its contribution to score
+    :param components: Contributions of other parts of score, e.g. cooccurrence or feedback
+    :return: Dictionary with tag contributions under "tags" key and other components under their names
+    """
+    breakdown = {
+        "tags": {
+            tag_name: round(float(contribution), BREAKDOWN_PRECISION)
+            for tag_name, contribution in sorted(
+                (tag_contributions or {}).items(), key=lambda item: -item[1]
+            )
+        }
+    }
+    for name, contribution in components.items():
+        if contribution:
+            breakdown[name] = round(float(contribution), BREAKDOWN_PRECISION)
+    return breakdown
+
+
+def scale_breakdown(tag_contributions: dict, total: float) -> dict:
+    """
+    Scales tag contributions, so they sum to given total, used when tag score is normalized before blending
+    :param tag_contributions: Dictionary which maps tag name to its contribution
+    :param total: Sum of scaled contributions
+    :return: Dictionary with scaled contributions
+    """
+    tag_score = sum(tag_contributions.values())
+    if not tag_score:
+        return {}
+    return {
+        tag_name: contribution * total / tag_score
+        for tag_name, contribution in tag_contributions.items()
+    }
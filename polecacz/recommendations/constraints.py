@@ -0,0 +1,67 @@
+import re
+from typing import Iterable, Union
+
+import numpy as np
+
+CONSTRAINT_FIELDS = ("min_players", "max_players", "playing_time", "year_published")
+
+
+class GameAttributes:
+    """
+    Attributes of games used by constraints kept in arrays ordered by game positions, so in-memory backends check
+    constraints of all games with a few vectorized comparisons. Missing values are kept as NaN, which fails every
+    comparison, so games without value do not satisfy constraint like in get_constraints_filter query
+    """
+
+    def __init__(self, rows: Iterable[tuple]):
+        """
+        :param rows: Iterable with minimal number of players, maximal number of players, playing time and year of
+        publication of every game in order of positions, missing trailing values are treated as unknown
+        """
+        rows = [
+            tuple(row) + (None,) * (len(CONSTRAINT_FIELDS) - len(row)) for row in rows
+        ]
+        columns = list(zip(*rows)) if rows else [()] * len(CONSTRAINT_FIELDS)
+        self.min_players, self.max_players, self.playing_time = (
+            np.array(
+                [np.nan if value is None else value for value in column], dtype=float
+            )
+            for column in columns[:3]
+        )
+        self.year_published = np.array(
+            [self._parse_year(value) for value in columns[3]], dtype=float
+        )
+
+    @staticmethod
+    def _parse_year(year: Union[str, None]) -> float:
+        """
+        Year is kept as text, only four digit years are compared like in get_constraints_filter
+        """
+        if year is None or not re.fullmatch(r"[0-9]{4}", year):
+            return np.nan
+        return float(year)
+
+    def get_mask(self, constraints: dict = None) -> Union[np.ndarray, None]:
+        """
+        Checks which games satisfy constraints
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :return: Boolean array with value for every game position or None if there are no constraints
+        """
+        constraints = {
+            name: value
+            for name, value in (constraints or {}).items()
+            if value is not None
+        }
+        if not constraints:
+            return None
+        mask = np.ones(len(self.min_players), dtype=bool)
+        if "players" in constraints:
+            mask &= self.min_players <= constraints["players"]
+            mask &= self.max_players >= constraints["players"]
+        if "max_playing_time" in constraints:
+            mask &= self.playing_time <= constraints["max_playing_time"]
+        if "year_from" in constraints:
+            mask &= self.year_published >= constraints["year_from"]
+        if "year_to" in constraints:
+            mask &= self.year_published <= constraints["year_to"]
+        return mask
@@ -0,0 +1,159 @@
+from collections import Counter
+from itertools import permutations
+from typing import Iterable, Union
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from polecacz.models import (
+    GameCooccurrence,
+    OwnedGames,
+    Recommendation,
+    SelectedGames,
+)
+from polecacz.recommendations.result_cache import invalidate_recommendation_cache
+
+
+def iterate_collections() -> Iterable[set]:
+    """
+    Iterates all collections of games which are used to count co-occurrence: games owned by users, games selected
+    by users and games selected for every recommendation created by user. Generated recommendations are skipped,
+    because their games are copied from collections of users
+    :return: Iterable with sets of game ids
+    """
+    for through_model, owner_field, game_field in (
+        (OwnedGames.owned_games.through, "ownedgames_id", "game_id"),
+        (SelectedGames.selected_games.through, "selectedgames_id", "game_id"),
+        (Recommendation.selected_games.through, "recommendation_id", "game_id"),
+    ):
+        rows = through_model.objects.all()
+        if through_model is Recommendation.selected_games.through:
+            rows = rows.filter(recommendation__generated=False)
+        collections = {}
+        for owner_id, game_id in rows.values_list(owner_field, game_field).iterator():
+            collections.setdefault(owner_id, set()).add(game_id)
+        yield from collections.values()
+
+
+def count_cooccurrence(collections: Iterable[set]) -> Counter:
+    """
+    Counts collections in which every pair of games appears
+    :param collections: Iterable with sets of game ids
+    :return: Counter which maps ordered pair of game ids to number of collections, pairs are counted in both
+    directions
+    """
+    counter = Counter()
+    for collection in collections:
+        counter.update(permutations(collection, 2))
+    return counter
+
+
+def rebuild_cooccurrence() -> int:
+    """
+    Replaces stored co-occurrence with counts from all collections
+    :return: Number of stored pairs
+    """
+    counter = count_cooccurrence(iterate_collections())
+    with transaction.atomic():
+        GameCooccurrence.objects.all().delete()
+        GameCooccurrence.objects.bulk_create(
+            [
+                GameCooccurrence(
+                    game_id=game_id, other_game_id=other_game_id, counter=value
+                )
+                for (game_id, other_game_id), value in counter.items()
+            ],
+            batch_size=1000,
+        )
+    return len(counter)
+
+
+def update_cooccurrence(changed_ids: set, other_ids: set, delta: int) -> None:
+    """
+    Updates co-occurrence after games were added to or removed from collection, only pairs which contain changed
+    games are touched. Missing pairs are inserted with conflicts ignored and counters are changed with single
+    update, so concurrent changes of collections neither fail on unique constraint nor lose increments
+    :param changed_ids: Set with ids of added or removed games
+    :param other_ids: Set with ids of games which stay in collection
+    :param delta: 1 when games were added, -1 when they were removed
+    """
+    changed_ids = set(changed_ids)
+    game_ids = changed_ids | set(other_ids)
+    if not changed_ids or len(game_ids) < 2:
+        return
+    pairs = Q(game_id__in=changed_ids, other_game_id__in=game_ids) | Q(
+        game_id__in=game_ids, other_game_id__in=changed_ids
+    )
+    with transaction.atomic():
+        if delta > 0:
+            GameCooccurrence.objects.bulk_create(
+                [
+                    GameCooccurrence(game_id=game_id, other_game_id=other_game_id)
+                    for game_id, other_game_id in permutations(game_ids, 2)
+                    if game_id in changed_ids or other_game_id in changed_ids
+                ],
+                ignore_conflicts=True,
+            )
+        GameCooccurrence.objects.filter(pairs).update(counter=F("counter") + delta)
+        if delta < 0:
+            GameCooccurrence.objects.filter(pairs, counter__lte=0).delete()
+
+
+def collection_changed(
+    sender, instance, action: str, reverse: bool, pk_set: Union[set, None], **kwargs
+) -> None:
+    """
+    Receiver of m2m_changed signal of collections, keeps co-occurrence up to date without full rebuild. Changes
+    made from the game side of relation are not tracked, rebuild_cooccurrence has to be used after them. Cached
+    recommendations are invalidated only if co-occurrence is used in recommendations
+    """
+    if reverse:
+        return
+    related_manager = _get_collection_manager(instance)
+    if action == "post_add" and pk_set:
+        collection = set(related_manager.values_list("id", flat=True))
+        update_cooccurrence(pk_set, collection, 1)
+    elif action == "pre_remove" and pk_set:
+        collection = set(related_manager.values_list("id", flat=True))
+        update_cooccurrence(set(pk_set) & collection, collection, -1)
+    elif action == "pre_clear":
+        collection = set(related_manager.values_list("id", flat=True))
+        update_cooccurrence(collection, set(), -1)
+    else:
+        return
+    if getattr(settings, "RECOMMENDATION_COOCCURRENCE_WEIGHT", 0) > 0:
+        invalidate_recommendation_cache()
+
+
+def _get_collection_manager(instance):
+    if isinstance(instance, OwnedGames):
+        return instance.owned_games
+    return instance.selected_games
+
+
+def get_cooccurrence_scores(
+    selected_ids: Iterable[str],
+    exclude_ids: Iterable[str],
+    limit: int,
+    game_filter: Q = None,
+) -> dict:
+    """
+    Sums co-occurrence of every game with selected games
+    :param selected_ids: Iterable with ids of selected games
+    :param exclude_ids: Iterable with ids of games which should not be returned
+    :param limit: Maximal number of returned games
+    :param game_filter: Filter which returned co-occurring games have to satisfy
+    :return: Dictionary which maps game id to score, games with the highest scores are returned
+    """
+    selected_ids = list(selected_ids)
+    scores = (
+        GameCooccurrence.objects.filter(game_id__in=selected_ids)
+        .exclude(other_game_id__in=[*selected_ids, *exclude_ids])
+        .filter(game_filter or Q())
+        .values("other_game_id")
+        .annotate(score=Sum("counter"))
+        .order_by("-score", "-other_game__rating")
+        .values_list("other_game_id", "score")[:limit]
+    )
+    return dict(scores)
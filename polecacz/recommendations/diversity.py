@@ -0,0 +1,81 @@
+import math
+from typing import Iterable
+
+from polecacz.recommendations.tag_index import count_bits
+
+
+def get_tag_similarity(tag_vector: int, other_tag_vector: int) -> float:
+    """
+    Cosine similarity of binary tag vectors kept as bitsets
+    :param tag_vector: Bitset with tags of game
+    :param other_tag_vector: Bitset with tags of other game
+    :return: Similarity from 0 to 1
+    """
+    denominator = math.sqrt(count_bits(tag_vector) * count_bits(other_tag_vector))
+    if not denominator:
+        return 0.0
+    return count_bits(tag_vector & other_tag_vector) / denominator
+
+
+def rerank_with_mmr(
+    candidate_ids: Iterable[str],
+    relevance: dict,
+    tag_vectors: dict[str, int],
+    limit: int,
+    diversity: float,
+) -> list[str]:
+    """
+    Selects games with maximal marginal relevance: every next game maximizes relevance reduced by similarity to the
+    most similar game selected before it. Highest similarity to selected games is updated after every selection,
+    so every pair of candidate and selected game is compared once
+    :param candidate_ids: Iterable with ids of candidate games ordered by relevance
+    :param relevance: Dictionary which maps game id to relevance score, scores are divided by the highest one
+    :param tag_vectors: Dictionary which maps game id to bitset with its tags
+    :param limit: Maximal number of returned games
+    :param diversity: Weight of similarity to selected games from 0 to 1, 0 keeps order by relevance
+    :return: List with game ids in new order
+    """
+    candidates = list(candidate_ids)
+    max_relevance = max(
+        (relevance.get(game_id, 0) for game_id in candidates), default=0
+    )
+    max_relevance = max_relevance or 1
+    max_similarity = {game_id: 0.0 for game_id in candidates}
+    selected = []
+    while candidates and len(selected) < limit:
+        best_game_id = max(
+            candidates,
+            key=lambda game_id: (1 - diversity)
+            * relevance.get(game_id, 0)
+            / max_relevance
+            - diversity * max_similarity[game_id],
+        )
+        selected.append(best_game_id)
+        candidates.remove(best_game_id)
+        best_tag_vector = tag_vectors.get(best_game_id, 0)
+        for game_id in candidates:
+            similarity = get_tag_similarity(
+                tag_vectors.get(game_id, 0), best_tag_vector
+            )
+            if similarity > max_similarity[game_id]:
+                max_similarity[game_id] = similarity
+    return selected
+
+
+def get_intra_list_similarity(
+    game_ids: list[str], tag_vectors: dict[str, int]
+) -> float:
+    """
+    Mean similarity of all pairs of games in list, lower value means more diverse list
+    :param game_ids: List with game ids
+    :param tag_vectors: Dictionary which maps game id to bitset with its tags
+    :return: Mean similarity from 0 to 1
+    """
+    similarities = [
+        get_tag_similarity(
+            tag_vectors.get(game_id, 0), tag_vectors.get(other_game_id, 0)
+        )
+        for number, game_id in enumerate(game_ids)
+        for other_game_id in game_ids[number + 1 :]
+    ]
+    return sum(similarities) / len(similarities) if similarities else 0.0
@@ -0,0 +1,214 @@
+import random
+import statistics
+import time
+from typing import Callable, Iterable, Union
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.module_loading import import_string
+
+from polecacz.models import (
+    Game,
+    Opinion,
+    OwnedGames,
+    Recommendation,
+    RecommendedGame,
+)
+from polecacz.service import GameService
+
+BACKENDS = ("sql", "index", "sparse", "neighbours")
+RELEVANT_RATING = 7
+SYNTHETIC_TASTE_TAGS = 3
+SYNTHETIC_NOISE_TAGS = 20
+
+Case = tuple[list, list, set]
+Recommender = Callable[[list, list, int], list[Game]]
+
+
+def recommend_games(selected_ids: list, exclude_ids: list, limit: int) -> list[Game]:
+    """
+    Finds recommended games in the same way as RecommendationService.add_recommended_games, but without result
+    cache, so every call runs recommendation engine
+    :param selected_ids: List with ids of selected games
+    :param exclude_ids: List with ids of games which should not be returned
+    :param limit: Maximal number of returned games
+    :return: List with recommended games
+    """
+    tags = GameService.get_tag_names_list_from_games(selected_ids)
+    return list(
+        GameService._find_games_similar_to_selected(
+            selected_ids, tags, exclude_ids, limit
+        )
+    )
+
+
+def get_recommender(name: str, overrides: dict = None) -> Recommender:
+    """
+    Get recommender which is evaluated. Built-in backends are recommend_games run with RECOMMENDATION_BACKEND set
+    to backend name, any other name is dotted path of function with the same signature as recommend_games
+    :param name: Name of backend from BACKENDS or dotted path of function
+    :param overrides: Dictionary with settings overridden while recommender runs, e.g. weights of blending
+    :return: Function which takes ids of selected games, ids of excluded games and limit and returns games
+    """
+    overrides = dict(overrides or {})
+    if name in BACKENDS:
+        function = recommend_games
+        overrides["RECOMMENDATION_BACKEND"] = name
+    else:
+        function = import_string(name)
+
+    def recommend(selected_ids: list, exclude_ids: list, limit: int) -> list[Game]:
+        with override_settings(**overrides):
+            return function(selected_ids, exclude_ids, limit)
+
+    return recommend
+
+
+def load_historical_cases(
+    min_rating: int = RELEVANT_RATING, limit: int = None
+) -> list[Case]:
+    """
+    Creates evaluation cases from recommendations which were rated with opinion. Selected games of well rated
+    recommendation are replayed and games recommended in it are relevant, games owned by user are excluded like
+    in live recommendation. Relevant games come from engine which was used at that time, so results favour
+    engines similar to it
+    :param min_rating: Minimal rating of opinion for which recommended games are relevant
+    :param limit: Maximal number of cases, the newest recommendations are used
+    :return: List with ids of selected games, ids of excluded games and set with ids of relevant games
+    """
+    recommendations = (
+        Recommendation.objects.filter(
+            id__in=Opinion.objects.filter(rating__gte=min_rating).values(
+                "recommendation_id"
+            ),
+            status=Recommendation.Status.DONE,
+        )
+        .order_by("-creation_date")
+        .values_list("id", "user_id")[:limit]
+    )
+    user_ids = dict(recommendations)
+    selected, relevant, owned = {}, {}, {}
+    selected_games = Recommendation.selected_games.through.objects.filter(
+        recommendation_id__in=user_ids
+    )
+    for recommendation_id, game_id in selected_games.values_list(
+        "recommendation_id", "game_id"
+    ):
+        selected.setdefault(recommendation_id, []).append(game_id)
+    for recommendation_id, game_id in RecommendedGame.objects.filter(
+        recommendation_id__in=user_ids
+    ).values_list("recommendation_id", "game_id"):
+        relevant.setdefault(recommendation_id, set()).add(game_id)
+    for user_id, game_id in OwnedGames.owned_games.through.objects.filter(
+        ownedgames__user_id__in=user_ids.values()
+    ).values_list("ownedgames__user_id", "game_id"):
+        owned.setdefault(user_id, []).append(game_id)
+    return [
+        (
+            selected[recommendation_id],
+            owned.get(user_id, []),
+            relevant[recommendation_id],
+        )
+        for recommendation_id, user_id in user_ids.items()
+        if selected.get(recommendation_id) and relevant.get(recommendation_id)
+    ]
+
+
+def create_synthetic_cases(
+    number_of_users: int,
+    number_of_games: int,
+    number_of_tastes: int = 10,
+    selected_games: int = 3,
+    seed: int = 0,
+) -> list[Case]:
+    """
+    Creates games with GameFactory and synthetic users. Every game has tags of one taste and random noise tags,
+    every user selects a few games of one taste and all other games of this taste are relevant. Games are saved
+    in database, so they should be created in transaction which is rolled back
+    :param number_of_users: Number of created cases
+    :param number_of_games: Number of created games
+    :param number_of_tastes: Number of groups of games which share tags
+    :param selected_games: Number of games selected by every user
+    :param seed: Seed of random number generator
+    :return: List with ids of selected games, ids of excluded games and set with ids of relevant games
+    """
+    from test.factories.game import GameFactory
+
+    generator = random.Random(seed)
+    noise_tags = [f"Noise{number}" for number in range(SYNTHETIC_NOISE_TAGS)]
+    tastes = {}
+    for number in range(number_of_games):
+        taste = number % number_of_tastes
+        taste_tags = [f"Taste{taste}-{tag}" for tag in range(SYNTHETIC_TASTE_TAGS)]
+        game = GameFactory(
+            tags=[
+                *generator.sample(taste_tags, SYNTHETIC_TASTE_TAGS - 1),
+                *generator.sample(noise_tags, 2),
+            ],
+            rating=round(generator.uniform(5, 9), 2),
+        )
+        tastes.setdefault(taste, []).append(game.id)
+    cases = []
+    for _ in range(number_of_users):
+        game_ids = tastes[generator.randrange(len(tastes))]
+        selected = generator.sample(game_ids, min(selected_games, len(game_ids)))
+        cases.append((selected, [], set(game_ids) - set(selected)))
+    return cases
+
+
+def evaluate(
+    recommender: Recommender,
+    cases: Iterable[Case],
+    limit: int = 10,
+    number_of_games: int = None,
+) -> dict[str, Union[int, float]]:
+    """
+    Runs recommender for every case and measures quality and cost of recommendations. The first case is run once
+    before measurement, so in-memory indexes are built outside of measured calls
+    :param recommender: Function returned by get_recommender
+    :param cases: Iterable with ids of selected games, ids of excluded games and set with ids of relevant games
+    :param limit: Number of recommended games, k of precision@k
+    :param number_of_games: Size of catalogue used for coverage, all games are counted if not provided
+    :return: Dictionary with number of cases, precision@k, coverage of catalogue, p50 and p95 latency in
+    milliseconds and mean number of queries per recommendation
+    """
+    cases = list(cases)
+    if number_of_games is None:
+        number_of_games = Game.objects.count()
+    if cases:
+        recommender(cases[0][0], cases[0][1], limit)
+    precisions, latencies, queries = [], [], []
+    recommended_ids = set()
+    for selected_ids, exclude_ids, relevant_ids in cases:
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            games = recommender(selected_ids, exclude_ids, limit)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(context.captured_queries))
+        game_ids = [game.id for game in games][:limit]
+        recommended_ids.update(game_ids)
+        precisions.append(
+            len(relevant_ids.intersection(game_ids)) / limit if limit else 0.0
+        )
+    return {
+        "cases": len(cases),
+        "precision": statistics.mean(precisions) if cases else 0.0,
+        "coverage": len(recommended_ids) / number_of_games if number_of_games else 0.0,
+        "p50_ms": get_percentile(latencies, 50) * 1000,
+        "p95_ms": get_percentile(latencies, 95) * 1000,
+        "queries": statistics.mean(queries) if cases else 0.0,
+    }
+
+
+def get_percentile(values: list[float], percentile: int) -> float:
+    """
+    Get percentile using nearest rank method
+    :param values: List with values
+    :param percentile: Percentile from 0 to 100
+    :return: Value of percentile, 0 if list is empty
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(1, -(-percentile * len(values) // 100))
+    return values[rank - 1]
@@ -0,0 +1,186 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from polecacz.models import GameFeedback, GameTag, Opinion, Recommendation, TagFeedback
+from polecacz.recommendations.result_cache import invalidate_recommendation_cache
+from polecacz.recommendations.tag_index import VersionedIndex, bump_data_version
+
+FEEDBACK_VERSION_KEY = "polecacz:feedback_version"
+NEUTRAL_RATING = 5.5
+MAX_RATING_DISTANCE = 4.5
+PRIOR_OPINIONS = 3
+
+
+class FeedbackBoosts:
+    """
+    Boosts of games and tags calculated from opinion ratings of recommendations. Mean ratings are smoothed
+    towards neutral rating with PRIOR_OPINIONS imaginary opinions and scaled to range from -1 to 1, so games with
+    single opinion are not boosted too much. Boosts are kept in dictionaries, so lookups take constant time
+    """
+
+    def __init__(
+        self,
+        game_ratings: Iterable[tuple[str, int, int]],
+        tag_ratings: Iterable[tuple[str, int, int]],
+        version: str = None,
+    ):
+        """
+        :param game_ratings: Iterable with game id, sum of ratings and number of ratings
+        :param tag_ratings: Iterable with tag name, sum of ratings and number of ratings
+        :param version: Version of feedback from which boosts were calculated
+        """
+        self.version = version
+        self.game_boosts = {
+            game_id: self._calculate_boost(rating_sum, counter)
+            for game_id, rating_sum, counter in game_ratings
+        }
+        self.tag_boosts = {
+            tag_name: self._calculate_boost(rating_sum, counter)
+            for tag_name, rating_sum, counter in tag_ratings
+        }
+
+    @classmethod
+    def from_database(cls, version: str = None) -> "FeedbackBoosts":
+        """
+        Calculates boosts using stored aggregates of opinion ratings
+        :param version: Version of feedback from which boosts are calculated
+        :return: FeedbackBoosts object
+        """
+        game_ratings = GameFeedback.objects.values_list(
+            "game_id", "rating_sum", "counter"
+        )
+        tag_ratings = TagFeedback.objects.values_list(
+            "tag__name", "rating_sum", "counter"
+        )
+        return cls(game_ratings.iterator(), tag_ratings.iterator(), version)
+
+    @staticmethod
+    def _calculate_boost(rating_sum: int, counter: int) -> float:
+        """
+        Smoothed mean rating scaled to range from -1 to 1
+        :param rating_sum: Sum of ratings
+        :param counter: Number of ratings
+        :return: Boost, 0 means neutral rating
+        """
+        mean_rating = (rating_sum + NEUTRAL_RATING * PRIOR_OPINIONS) / (
+            counter + PRIOR_OPINIONS
+        )
+        return (mean_rating - NEUTRAL_RATING) / MAX_RATING_DISTANCE
+
+    def get_boost(self, game_id: str, tag_names: Iterable[str] = ()) -> float:
+        """
+        Get boost of game, boost of game is added to mean boost of its tags
+        :param game_id: Game id
+        :param tag_names: Iterable with names of tags used in game
+        :return: Boost from -2 to 2
+        """
+        tag_boosts = [self.tag_boosts.get(tag_name, 0.0) for tag_name in tag_names]
+        tag_boost = sum(tag_boosts) / len(tag_boosts) if tag_boosts else 0.0
+        return self.game_boosts.get(game_id, 0.0) + tag_boost
+
+
+_feedback_boosts = VersionedIndex(FeedbackBoosts.from_database, FEEDBACK_VERSION_KEY)
+
+
+def get_feedback_boosts() -> FeedbackBoosts:
+    """
+    Get boosts calculated from current opinions, boosts are calculated again after opinion was added
+    :return: FeedbackBoosts object
+    """
+    return _feedback_boosts.get()
+
+
+def invalidate_feedback_boosts() -> None:
+    """
+    Marks boosts as outdated, used after aggregates of opinion ratings were changed. Cached recommendations are
+    invalidated only if boosts are used in recommendations
+    """
+    bump_data_version(FEEDBACK_VERSION_KEY)
+    if getattr(settings, "RECOMMENDATION_FEEDBACK_WEIGHT", 0) > 0:
+        invalidate_recommendation_cache()
+
+
+def add_opinion_feedback(recommendation: Recommendation, rating: int) -> None:
+    """
+    Adds rating of recommendation to aggregates of recommended games and their tags. Every tag is counted once
+    for opinion, even if it is used in many recommended games
+    :param recommendation: Recommendation object for which opinion was added
+    :param rating: Opinion rating
+    """
+    game_ids = list(recommendation.recommended_games.values_list("id", flat=True))
+    tag_ids = set(
+        GameTag.objects.filter(content_object_id__in=game_ids).values_list(
+            "tag_id", flat=True
+        )
+    )
+    with transaction.atomic():
+        GameFeedback.objects.bulk_create(
+            [GameFeedback(game_id=game_id) for game_id in game_ids],
+            ignore_conflicts=True,
+        )
+        GameFeedback.objects.filter(game_id__in=game_ids).update(
+            rating_sum=F("rating_sum") + rating, counter=F("counter") + 1
+        )
+        TagFeedback.objects.bulk_create(
+            [TagFeedback(tag_id=tag_id) for tag_id in tag_ids],
+            ignore_conflicts=True,
+        )
+        TagFeedback.objects.filter(tag_id__in=tag_ids).update(
+            rating_sum=F("rating_sum") + rating, counter=F("counter") + 1
+        )
+    invalidate_feedback_boosts()
+
+
+def rebuild_feedback() -> tuple[int, int]:
+    """
+    Replaces aggregates with ratings of all opinions, used for initial build or after opinions were removed
+    :return: Number of games and number of tags with aggregated ratings
+    """
+    recommended_games = {}
+    for (
+        recommendation_id,
+        game_id,
+    ) in Recommendation.recommended_games.through.objects.values_list(
+        "recommendation_id", "game_id"
+    ).iterator():
+        recommended_games.setdefault(recommendation_id, set()).add(game_id)
+    game_tags = {}
+    for game_id, tag_id in GameTag.objects.values_list(
+        "content_object_id", "tag_id"
+    ).iterator():
+        game_tags.setdefault(game_id, set()).add(tag_id)
+    game_aggregates, tag_aggregates = {}, {}
+    for recommendation_id, rating in Opinion.objects.values_list(
+        "recommendation_id", "rating"
+    ).iterator():
+        game_ids = recommended_games.get(recommendation_id, set())
+        tag_ids = set().union(*(game_tags.get(game_id, set()) for game_id in game_ids))
+        for aggregates, keys in (
+            (game_aggregates, game_ids),
+            (tag_aggregates, tag_ids),
+        ):
+            for key in keys:
+                rating_sum, counter = aggregates.get(key, (0, 0))
+                aggregates[key] = (rating_sum + rating, counter + 1)
+    with transaction.atomic():
+        GameFeedback.objects.all().delete()
+        GameFeedback.objects.bulk_create(
+            [
+                GameFeedback(game_id=game_id, rating_sum=rating_sum, counter=counter)
+                for game_id, (rating_sum, counter) in game_aggregates.items()
+            ],
+            batch_size=1000,
+        )
+        TagFeedback.objects.all().delete()
+        TagFeedback.objects.bulk_create(
+            [
+                TagFeedback(tag_id=tag_id, rating_sum=rating_sum, counter=counter)
+                for tag_id, (rating_sum, counter) in tag_aggregates.items()
+            ],
+            batch_size=1000,
+        )
+    invalidate_feedback_boosts()
+    return len(game_aggregates), len(tag_aggregates)
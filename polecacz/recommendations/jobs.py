@@ -0,0 +1,138 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from polecacz.models import Recommendation
+from polecacz.service import OwnedGamesService, RecommendationService
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get pool of threads which compute recommendations in process of web server, pool is created on first use
+    :return: ThreadPoolExecutor object with RECOMMENDATION_JOB_WORKERS threads
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "RECOMMENDATION_JOB_WORKERS", 2),
+                thread_name_prefix="recommendation",
+            )
+        return _executor
+
+
+def enqueue_recommendation(recommendation_id: Union[str, UUID]) -> None:
+    """
+    Schedules computation of pending recommendation. Pending recommendations are the queue, so with
+    RECOMMENDATION_JOBS set to "thread" they are submitted to pool of threads after transaction is committed,
+    with "db" they wait for process_recommendation_jobs command
+    :param recommendation_id: Recommendation id
+    """
+    if getattr(settings, "RECOMMENDATION_JOBS", "") == "thread":
+        transaction.on_commit(
+            lambda: get_executor().submit(run_recommendation_job, recommendation_id)
+        )
+
+
+def run_recommendation_job(recommendation_id: Union[str, UUID]) -> bool:
+    """
+    Computes recommendation in worker thread, database connection of thread is closed afterwards
+    :param recommendation_id: Recommendation id
+    :return: True if recommendation was computed by this job
+    """
+    try:
+        return compute_recommendation(recommendation_id)
+    finally:
+        connections.close_all()
+
+
+def compute_recommendation(recommendation_id: Union[str, UUID]) -> bool:
+    """
+    Finds recommended games of pending recommendation. Recommendation is claimed by changing its status and
+    storing time of claim, so every recommendation is computed once even if many workers process the queue. Result
+    is saved only if claim was not taken over after it became stale
+    :param recommendation_id: Recommendation id
+    :return: True if recommendation was claimed and computed, False if it was not pending
+    """
+    claimed_at = timezone.now()
+    claimed = Recommendation.objects.filter(
+        id=recommendation_id, status=Recommendation.Status.PENDING
+    ).update(status=Recommendation.Status.RUNNING, claimed_at=claimed_at)
+    if not claimed:
+        return False
+    claim = Recommendation.objects.filter(
+        id=recommendation_id,
+        status=Recommendation.Status.RUNNING,
+        claimed_at=claimed_at,
+    )
+    recommendation = Recommendation.objects.get(id=recommendation_id)
+    try:
+        with transaction.atomic():
+            selected_games_ids = list(
+                recommendation.selected_games.values_list("id", flat=True)
+            )
+            owned_games = OwnedGamesService.get_user_owned_games(recommendation.user)
+            owned_games_ids = [game.id for game in owned_games]
+            RecommendationService.add_recommended_games(
+                recommendation, selected_games_ids, owned_games_ids
+            )
+            if not claim.update(status=Recommendation.Status.DONE):
+                transaction.set_rollback(True)
+                return False
+    except Exception:
+        logger.exception("Recommendation %s could not be computed", recommendation_id)
+        claim.update(status=Recommendation.Status.FAILED)
+    return True
+
+
+def requeue_stale_recommendations(timeout: float = None) -> int:
+    """
+    Moves recommendations which stayed claimed for longer than timeout back to queue, e.g. after worker was
+    restarted or crashed between claim and completion
+    :param timeout: Number of seconds after which claim is stale, RECOMMENDATION_JOB_TIMEOUT setting is used if
+    not provided
+    :return: Number of recommendations moved back to queue
+    """
+    if timeout is None:
+        timeout = getattr(settings, "RECOMMENDATION_JOB_TIMEOUT", 300)
+    stale_date = timezone.now() - datetime.timedelta(seconds=timeout)
+    return Recommendation.objects.filter(
+        Q(claimed_at__lt=stale_date) | Q(claimed_at__isnull=True),
+        status=Recommendation.Status.RUNNING,
+    ).update(status=Recommendation.Status.PENDING, claimed_at=None)
+
+
+def process_pending_recommendations(limit: int = None) -> int:
+    """
+    Computes pending recommendations from the oldest one, stale claimed recommendations are moved back to queue
+    first
+    :param limit: Maximal number of computed recommendations, all pending recommendations are computed if not
+    provided
+    :return: Number of computed recommendations
+    """
+    requeued = requeue_stale_recommendations()
+    if requeued:
+        logger.warning("%s stale recommendations were moved back to queue", requeued)
+    pending_ids = Recommendation.objects.filter(
+        status=Recommendation.Status.PENDING
+    ).order_by("creation_date")
+    pending_ids = pending_ids.values_list("id", flat=True)
+    if limit is not None:
+        pending_ids = pending_ids[:limit]
+    return sum(
+        compute_recommendation(recommendation_id)
+        for recommendation_id in list(pending_ids)
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import json
+from typing import Iterable, Union
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from polecacz.recommendations.tag_index import (
+    INDEX_VERSION_KEY,
+    bump_data_version,
+    get_data_versions,
+)
+
+RECOMMENDATION_CACHE_ALIAS = "recommendations"
+RESULT_VERSION_KEY = "polecacz:recommendation_cache_version"
+HITS_COUNTER_KEY = "polecacz:recommendation_cache_hits"
+MISSES_COUNTER_KEY = "polecacz:recommendation_cache_misses"
+
+
+class RecommendationCache:
+    """
+    Cache of recommended game ids, scores and breakdowns of scores keyed by sorted ids of selected games and hash
+    of excluded games. Key contains version of games and tags data, so results computed before games or tags
+    changed are never served. TTL and eviction are configured in "recommendations" cache alias, "default" cache
+    is used if alias is missing. Hit and miss counters are kept in the same cache without timeout, so they are
+    counted by all processes sharing the cache without touching database during recommendation
+    """
+
+    def __init__(self, alias: str = RECOMMENDATION_CACHE_ALIAS):
+        """
+        :param alias: Alias of Django cache in which results are kept
+        """
+        try:
+            self.cache = caches[alias]
+        except InvalidCacheBackendError:
+            self.cache = caches["default"]
+
+    def make_key(
+        self,
+        selected_ids: Iterable[str],
+        exclude_ids: Iterable[str],
+        limit: int,
+        constraints: dict = None,
+    ) -> str:
+        """
+        Creates key of recommendation, configuration of recommendation backend is part of the key
+        :param selected_ids: Iterable with ids of selected games
+        :param exclude_ids: Iterable with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param constraints: Dictionary with constraints which returned games satisfy
+        :return: Cache key
+        """
+        selected = ",".join(sorted(str(game_id) for game_id in set(selected_ids)))
+        excluded = hashlib.sha1(
+            ",".join(sorted(str(game_id) for game_id in set(exclude_ids))).encode()
+        ).hexdigest()
+        configuration = ",".join(
+            str(getattr(settings, name, None))
+            for name in (
+                "RECOMMENDATION_BACKEND",
+                "RECOMMENDATION_METRIC",
+                "RECOMMENDATION_WEIGHTING",
+                "RECOMMENDATION_COOCCURRENCE_WEIGHT",
+                "RECOMMENDATION_FEEDBACK_WEIGHT",
+                "RECOMMENDATION_DIVERSITY",
+            )
+        )
+        key = "|".join(
+            [
+                *get_data_versions([INDEX_VERSION_KEY, RESULT_VERSION_KEY]),
+                configuration,
+                selected,
+                excluded,
+                str(limit),
+                json.dumps(constraints or {}, sort_keys=True),
+            ]
+        )
+        return (
+            "polecacz:explained_recommendation:"
+            + hashlib.sha1(key.encode()).hexdigest()
+        )
+
+    def get(self, key: str) -> Union[list[tuple[str, float, dict]], None]:
+        """
+        Get cached ids, scores and breakdowns of recommended games and count hit or miss
+        :param key: Cache key created with make_key
+        :return: List with game ids, scores and breakdowns or None if result is not cached
+        """
+        game_ids = self.cache.get(key)
+        self._increment(
+            HITS_COUNTER_KEY if game_ids is not None else MISSES_COUNTER_KEY
+        )
+        return game_ids
+
+    def set(self, key: str, scored_game_ids: list[tuple[str, float, dict]]) -> None:
+        """
+        Stores ids, scores and breakdowns of recommended games using TTL of cache alias
+        :param key: Cache key created with make_key
+        :param scored_game_ids: List with game ids, scores and breakdowns
+        """
+        self.cache.set(key, scored_game_ids)
+
+    def get_stats(self) -> dict[str, Union[int, float]]:
+        """
+        Get number of cache hits and misses
+        :return: Dictionary with hits, misses and hit ratio
+        """
+        counters = self.cache.get_many([HITS_COUNTER_KEY, MISSES_COUNTER_KEY])
+        hits = counters.get(HITS_COUNTER_KEY, 0)
+        misses = counters.get(MISSES_COUNTER_KEY, 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.cache.set_many({HITS_COUNTER_KEY: 0, MISSES_COUNTER_KEY: 0}, timeout=None)
+
+    def _increment(self, counter_key: str) -> None:
+        self.cache.add(counter_key, 0, timeout=None)
+        try:
+            self.cache.incr(counter_key)
+        except ValueError:
+            # Counter was evicted between add and incr
+            self.cache.add(counter_key, 1, timeout=None)
+
+
+def invalidate_recommendation_cache() -> None:
+    """
+    Marks all cached recommendations as outdated, used when precomputed data is replaced without changing games
+    """
+    bump_data_version(RESULT_VERSION_KEY)
@@ -0,0 +1,343 @@
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+
+from polecacz.models import Game, GameTag
+from polecacz.recommendations.constraints import CONSTRAINT_FIELDS, GameAttributes
+from polecacz.recommendations.tag_index import (
+    VersionedIndex,
+    normalize_game_id,
+    normalize_game_ids,
+)
+
+METRICS = ("overlap", "cosine", "jaccard")
+
+
+class SparseRecommendationEngine:
+    """
+    Recommendation engine backed by game x tag sparse matrix. Games are numbered by rating descending like in
+    TagIndex. Selections are turned into tag vectors and scored against all games with single matrix product,
+    so many selections can be scored at once
+    """
+
+    def __init__(
+        self,
+        games: Iterable[tuple],
+        game_tags: Iterable[tuple[str, str]],
+        version: str = None,
+    ):
+        """
+        :param games: Iterable with game id, rating and optionally attributes used by constraints in order of
+        CONSTRAINT_FIELDS
+        :param game_tags: Iterable with game id and tag name
+        :param version: Version of data from which matrix was built
+        """
+        games = sorted(
+            games, key=lambda game: (game[1] is None, -(game[1] or 0), str(game[0]))
+        )
+        self.version = version
+        self.game_ids = [normalize_game_id(game[0]) for game in games]
+        self.attributes = GameAttributes(game[2:] for game in games)
+        self.positions = {
+            game_id: number for number, game_id in enumerate(self.game_ids)
+        }
+        self.tag_numbers = {}
+        pairs = set()
+        for game_id, tag_name in game_tags:
+            position = self.positions.get(normalize_game_id(game_id))
+            if position is None:
+                continue
+            tag_number = self.tag_numbers.setdefault(tag_name, len(self.tag_numbers))
+            pairs.add((position, tag_number))
+        self.tag_names = list(self.tag_numbers)
+        rows, columns = zip(*pairs) if pairs else ((), ())
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, columns)),
+            shape=(len(self.game_ids), len(self.tag_numbers)),
+        )
+
+    @classmethod
+    def from_database(cls, version: str = None) -> "SparseRecommendationEngine":
+        """
+        Builds engine using all games and their tags
+        :param version: Version of data from which engine is built
+        :return: SparseRecommendationEngine object
+        """
+        games = Game.objects.values_list("id", "rating", *CONSTRAINT_FIELDS)
+        game_tags = GameTag.objects.values_list("content_object_id", "tag__name")
+        return cls(games.iterator(), game_tags.iterator(), version)
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def get_tag_names(self, game_id: str) -> list[str]:
+        """
+        Get names of tags used in game
+        :param game_id: Game id
+        :return: List with tag names
+        """
+        position = self.positions.get(normalize_game_id(game_id))
+        if position is None:
+            return []
+        row = self.matrix.indices[
+            self.matrix.indptr[position] : self.matrix.indptr[position + 1]
+        ]
+        return [self.tag_names[tag_number] for tag_number in row]
+
+    def score(
+        self,
+        tag_lists: list[Iterable[str]],
+        metric: str = "overlap",
+        weights: dict[str, float] = None,
+    ) -> np.ndarray:
+        """
+        Scores all games against every list of tags
+        :param tag_lists: List with tag names used in every selection
+        :param metric: Similarity measure, "overlap" counts shared tags, "cosine" and "jaccard" normalize it
+        :param weights: Weight of every tag, tag vectors of games and selections are scaled by weights if provided
+        :return: Array with selection in every row and game in every column
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        query = self._build_query_matrix(tag_lists)
+        tag_weights = self._build_weights_vector(weights)
+        weighted_matrix = self.matrix
+        if weights:
+            weighted_matrix = self.matrix @ sparse.diags(tag_weights, format="csr")
+        if metric == "cosine":
+            weighted_query = query
+            if weights:
+                weighted_query = query @ sparse.diags(tag_weights, format="csr")
+            overlap = (weighted_query @ weighted_matrix.T).toarray()
+            query_norms = np.sqrt(query @ tag_weights**2)[:, np.newaxis]
+            game_norms = np.sqrt(self.matrix @ tag_weights**2)[np.newaxis, :]
+            denominator = query_norms * game_norms
+        else:
+            overlap = (query @ weighted_matrix.T).toarray()
+            if metric == "overlap":
+                return overlap
+            query_sizes = (query @ tag_weights)[:, np.newaxis]
+            game_sizes = (self.matrix @ tag_weights)[np.newaxis, :]
+            denominator = query_sizes + game_sizes - overlap
+        return np.divide(
+            overlap,
+            denominator,
+            out=np.zeros_like(overlap),
+            where=denominator > 0,
+        )
+
+    def _build_weights_vector(self, weights: dict[str, float] = None) -> np.ndarray:
+        """
+        Builds vector with weight of every tag column, tags without weight have weight 1
+        :param weights: Weight of every tag
+        :return: Array with weights
+        """
+        tag_weights = np.ones(len(self.tag_numbers), dtype=np.float64)
+        for tag_name, weight in (weights or {}).items():
+            tag_number = self.tag_numbers.get(tag_name)
+            if tag_number is not None:
+                tag_weights[tag_number] = weight
+        return tag_weights
+
+    def explain_games(
+        self,
+        game_ids: Iterable[str],
+        tags: Iterable[str],
+        metric: str = "overlap",
+        weights: dict[str, float] = None,
+    ) -> dict:
+        """
+        Finds shared tags of chosen games together with their contributions to score, contributions of every game
+        sum to its score calculated with the same metric
+        :param game_ids: Iterable with game ids
+        :param tags: Iterable with tag names
+        :param metric: Similarity measure, one of METRICS
+        :param weights: Weight of every tag, every tag has weight 1 if not provided
+        :return: Dictionary which maps game id to dictionary with shared tag names and their contributions
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        query_weights = {
+            tag_name: (weights or {}).get(tag_name, 1)
+            for tag_name in set(tags)
+            if tag_name in self.tag_numbers
+        }
+        result = {}
+        for game_id in normalize_game_ids(game_ids):
+            game_weights = {
+                tag_name: (weights or {}).get(tag_name, 1)
+                for tag_name in self.get_tag_names(game_id)
+            }
+            shared = {
+                tag_name: weight
+                for tag_name, weight in game_weights.items()
+                if tag_name in query_weights
+            }
+            if metric == "cosine":
+                shared = {tag_name: weight**2 for tag_name, weight in shared.items()}
+                denominator = np.sqrt(
+                    sum(weight**2 for weight in query_weights.values())
+                ) * np.sqrt(sum(weight**2 for weight in game_weights.values()))
+            elif metric == "jaccard":
+                denominator = (
+                    sum(query_weights.values())
+                    + sum(game_weights.values())
+                    - sum(shared.values())
+                )
+            else:
+                denominator = 1
+            result[game_id] = {
+                tag_name: float(contribution / denominator) if denominator else 0.0
+                for tag_name, contribution in shared.items()
+            }
+        return result
+
+    def find_most_similar_games(
+        self,
+        tags: Iterable[str],
+        exclude_ids: Iterable[str] = (),
+        limit: int = 10,
+        metric: str = "overlap",
+        weights: dict[str, float] = None,
+    ) -> list[str]:
+        """
+        Finds games most similar to provided tags, games with the same score are ordered by rating. Games without
+        any of provided tags are not returned
+        :param tags: Iterable with tag names
+        :param exclude_ids: Iterable with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param metric: Similarity measure, one of METRICS
+        :param weights: Weight of every tag, every tag has weight 1 if not provided
+        :return: List with game ids ordered by similarity
+        """
+        (similar_games_ids,) = self.find_most_similar_games_batch(
+            [tags], [exclude_ids], limit, metric, weights
+        )
+        return similar_games_ids
+
+    def find_most_similar_games_batch(
+        self,
+        tag_lists: list[Iterable[str]],
+        exclude_ids_lists: list[Iterable[str]] = None,
+        limit: int = 10,
+        metric: str = "overlap",
+        weights: dict[str, float] = None,
+    ) -> list[list[str]]:
+        """
+        Finds most similar games for many selections using single matrix product
+        :param tag_lists: List with tag names used in every selection
+        :param exclude_ids_lists: List with ids of games which should not be returned for every selection
+        :param limit: Maximal number of returned games for every selection
+        :param metric: Similarity measure, one of METRICS
+        :param weights: Weight of every tag, every tag has weight 1 if not provided
+        :return: List with game ids ordered by similarity for every selection
+        """
+        return [
+            [game_id for game_id, _ in similar_games]
+            for similar_games in self.score_most_similar_games_batch(
+                tag_lists, exclude_ids_lists, limit, metric, weights
+            )
+        ]
+
+    def score_most_similar_games_batch(
+        self,
+        tag_lists: list[Iterable[str]],
+        exclude_ids_lists: list[Iterable[str]] = None,
+        limit: int = 10,
+        metric: str = "overlap",
+        weights: dict[str, float] = None,
+        include_ids: Iterable[str] = None,
+        constraints: dict = None,
+    ) -> list[list[tuple[str, float]]]:
+        """
+        Finds most similar games for many selections together with their scores
+        :param tag_lists: List with tag names used in every selection
+        :param exclude_ids_lists: List with ids of games which should not be returned for every selection
+        :param limit: Maximal number of returned games for every selection
+        :param metric: Similarity measure, one of METRICS
+        :param weights: Weight of every tag, every tag has weight 1 if not provided
+        :param include_ids: Iterable with ids of games which can be returned for every selection, all games can be
+        returned if not provided
+        :param constraints: Dictionary with constraints described in get_constraints_filter, which returned games
+        satisfy
+        :return: List with game ids and scores ordered by similarity for every selection
+        """
+        scores = self.score(tag_lists, metric, weights)
+        if include_ids is not None:
+            included = np.zeros(len(self.game_ids), dtype=bool)
+            included[
+                [
+                    self.positions[game_id]
+                    for game_id in normalize_game_ids(include_ids)
+                    if game_id in self.positions
+                ]
+            ] = True
+            scores[:, ~included] = 0
+        constraints_mask = self.attributes.get_mask(constraints)
+        if constraints_mask is not None:
+            scores[:, ~constraints_mask] = 0
+        for row, exclude_ids in enumerate(exclude_ids_lists or []):
+            excluded = [
+                self.positions[game_id]
+                for game_id in normalize_game_ids(exclude_ids)
+                if game_id in self.positions
+            ]
+            scores[row, excluded] = 0
+        result = []
+        for row_scores in scores:
+            positions = self._top_positions(row_scores, limit)
+            result.append(
+                [
+                    (self.game_ids[position], float(row_scores[position]))
+                    for position in positions
+                ]
+            )
+        return result
+
+    def _build_query_matrix(self, tag_lists: list[Iterable[str]]) -> sparse.csr_matrix:
+        """
+        Builds binary selection x tag matrix, tags which are not used in any game are skipped
+        :param tag_lists: List with tag names used in every selection
+        :return: Sparse matrix
+        """
+        rows, columns = [], []
+        for row, tags in enumerate(tag_lists):
+            tag_numbers = {
+                self.tag_numbers[tag_name]
+                for tag_name in tags
+                if tag_name in self.tag_numbers
+            }
+            rows.extend([row] * len(tag_numbers))
+            columns.extend(tag_numbers)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, columns)),
+            shape=(len(tag_lists), len(self.tag_numbers)),
+        )
+
+    @staticmethod
+    def _top_positions(scores: np.ndarray, limit: int) -> np.ndarray:
+        """
+        Selects games with the highest positive scores, ties are resolved by game position, which follows rating
+        :param scores: Array with score of every game
+        :param limit: Maximal number of returned games
+        :return: Array with game positions
+        """
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit > 0:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            threshold = scores[candidates[top]].min()
+            candidates = candidates[scores[candidates] >= threshold]
+        order = np.lexsort((candidates, -scores[candidates]))[:limit]
+        return candidates[order]
+
+
+_sparse_engine = VersionedIndex(SparseRecommendationEngine.from_database)
+
+
+def get_sparse_engine() -> SparseRecommendationEngine:
+    """
+    Get engine built from current games, engine is rebuilt when data was changed since it was built
+    :return: SparseRecommendationEngine object
+    """
+    return _sparse_engine.get()
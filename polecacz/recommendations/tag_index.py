@@ -0,0 +1,419 @@
+import threading
+import uuid
+from functools import partial
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator, Union
+
+import numpy as np
+from django.db import transaction
+
+from polecacz.models import DataVersion, Game, GameTag
+from polecacz.recommendations.constraints import CONSTRAINT_FIELDS, GameAttributes
+
+INDEX_VERSION_KEY = "polecacz:tag_index_version"
+
+_pending_versions = threading.local()
+
+
+class TagIndex:
+    """
+    In-memory index of game tags. Games are numbered by rating descending and every tag is kept as a bitset in which
+    bit n is set when game number n has the tag. Number of shared tags is counted for all games at once by adding
+    tag bitsets in bit-sliced form, so scoring costs a few operations on integers of catalogue size per tag. Tags of
+    every game are also kept as bitset in which bit n is set when game has tag number n, it is used to compare games
+    with each other
+    """
+
+    def __init__(
+        self,
+        games: Iterable[tuple],
+        game_tags: Iterable[tuple[str, str]],
+        version: str = None,
+    ):
+        """
+        :param games: Iterable with game id, rating and optionally attributes used by constraints in order of
+        CONSTRAINT_FIELDS
+        :param game_tags: Iterable with game id and tag name
+        :param version: Version of data from which index was built
+        """
+        games = sorted(
+            games, key=lambda game: (game[1] is None, -(game[1] or 0), str(game[0]))
+        )
+        self.version = version
+        self.game_ids = [normalize_game_id(game[0]) for game in games]
+        self.attributes = GameAttributes(game[2:] for game in games)
+        self.positions = {
+            game_id: number for number, game_id in enumerate(self.game_ids)
+        }
+        self.all_games = (1 << len(self.game_ids)) - 1
+        self.game_tag_names = {}
+        tag_positions = {}
+        for game_id, tag_name in game_tags:
+            game_id = normalize_game_id(game_id)
+            position = self.positions.get(game_id)
+            if position is None:
+                continue
+            tag_positions.setdefault(tag_name, []).append(position)
+            self.game_tag_names.setdefault(game_id, []).append(tag_name)
+        self.tag_bitsets = {
+            tag_name: self._to_bitset(positions, len(self.game_ids))
+            for tag_name, positions in tag_positions.items()
+        }
+        tag_numbers = {
+            tag_name: number for number, tag_name in enumerate(tag_positions)
+        }
+        self.tag_vectors = {
+            game_id: sum(1 << tag_numbers[tag_name] for tag_name in set(tag_names))
+            for game_id, tag_names in self.game_tag_names.items()
+        }
+
+    @staticmethod
+    def _to_bitset(positions: list[int], size: int) -> int:
+        """
+        Converts positions of set bits to bitset, bits are set in byte array because every operation on integer
+        copies it
+        :param positions: List with positions of set bits
+        :param size: Number of bits in bitset
+        :return: Bitset in form of integer
+        """
+        bitset = bytearray((size + 7) // 8)
+        for position in positions:
+            bitset[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bitset, "little")
+
+    @classmethod
+    def from_database(cls, version: str = None) -> "TagIndex":
+        """
+        Builds index using all games and their tags
+        :param version: Version of data from which index is built
+        :return: TagIndex object
+        """
+        games = Game.objects.values_list("id", "rating", *CONSTRAINT_FIELDS)
+        game_tags = GameTag.objects.values_list("content_object_id", "tag__name")
+        return cls(games.iterator(), game_tags.iterator(), version)
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def get_tag_names(self, game_ids: Iterable[str]) -> list[str]:
+        """
+        Get names of tags used in games
+        :param game_ids: Iterable with game ids
+        :return: List with unique tag names
+        """
+        tag_names = {}
+        for game_id in normalize_game_ids(game_ids):
+            for tag_name in self.game_tag_names.get(game_id, []):
+                tag_names[tag_name] = None
+        return list(tag_names)
+
+    def find_most_similar_games(
+        self,
+        tags: Iterable[str],
+        exclude_ids: Iterable[str] = (),
+        limit: int = 10,
+        weights: dict[str, int] = None,
+        include_ids: Iterable[str] = None,
+        constraints: dict = None,
+    ) -> list[str]:
+        """
+        Finds games with the biggest number of provided tags, games with the same number of tags are ordered by
+        rating. Games without any of provided tags are not returned
+        :param tags: Iterable with tag names
+        :param exclude_ids: Iterable with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param weights: Integer weight of every tag, shared tags are summed using weights instead of counted
+        :param include_ids: Iterable with ids of games which can be returned, all games can be returned if not
+        provided
+        :param constraints: Dictionary with constraints described in get_constraints_filter, which returned games
+        satisfy
+        :return: List with game ids ordered by similarity
+        """
+        planes = self._count_tags(tags, weights)
+        excluded_games = 0
+        for game_id in normalize_game_ids(exclude_ids):
+            position = self.positions.get(game_id)
+            if position is not None:
+                excluded_games |= 1 << position
+        candidates = self.all_games & ~excluded_games
+        if include_ids is not None:
+            candidates &= self._to_bitset(
+                [
+                    self.positions[game_id]
+                    for game_id in normalize_game_ids(include_ids)
+                    if game_id in self.positions
+                ],
+                len(self.game_ids),
+            )
+        constraints_mask = self.attributes.get_mask(constraints)
+        if constraints_mask is not None:
+            candidates &= int.from_bytes(
+                np.packbits(constraints_mask, bitorder="little").tobytes(), "little"
+            )
+        scored_games = 0
+        for plane in planes:
+            scored_games |= plane
+        candidates &= scored_games
+        selected_games, selected_counter = 0, 0
+        for plane in reversed(planes):
+            games_with_bit = candidates & plane
+            counter = count_bits(games_with_bit)
+            if counter and selected_counter + counter >= limit:
+                candidates = games_with_bit
+            else:
+                selected_games |= games_with_bit
+                selected_counter += counter
+                candidates &= ~plane
+        selected_positions = sorted(
+            _iterate_bits(selected_games),
+            key=lambda position: (-self._get_score(planes, position), position),
+        )
+        tied_positions = islice(_iterate_bits(candidates), limit - selected_counter)
+        return [
+            self.game_ids[position]
+            for position in chain(selected_positions, tied_positions)
+        ][:limit]
+
+    def score_games(
+        self,
+        game_ids: Iterable[str],
+        tags: Iterable[str],
+        weights: dict[str, int] = None,
+    ) -> dict:
+        """
+        Calculates scores of chosen games in the same way as find_most_similar_games
+        :param game_ids: Iterable with game ids
+        :param tags: Iterable with tag names
+        :param weights: Integer weight of every tag, every tag has weight 1 if not provided
+        :return: Dictionary which maps game id to sum of weights of shared tags
+        """
+        return {
+            game_id: sum(tag_contributions.values())
+            for game_id, tag_contributions in self.explain_games(
+                game_ids, tags, weights
+            ).items()
+        }
+
+    def explain_games(
+        self,
+        game_ids: Iterable[str],
+        tags: Iterable[str],
+        weights: dict[str, int] = None,
+    ) -> dict:
+        """
+        Finds shared tags of chosen games together with their contributions to score
+        :param game_ids: Iterable with game ids
+        :param tags: Iterable with tag names
+        :param weights: Integer weight of every tag, every tag has weight 1 if not provided
+        :return: Dictionary which maps game id to dictionary with shared tag names and their weights
+        """
+        tags = set(tags)
+        return {
+            game_id: {
+                tag_name: weights.get(tag_name, 1) if weights else 1
+                for tag_name in self.game_tag_names.get(game_id, [])
+                if tag_name in tags
+            }
+            for game_id in normalize_game_ids(game_ids)
+        }
+
+    def _count_tags(
+        self, tags: Iterable[str], weights: dict[str, int] = None
+    ) -> list[int]:
+        """
+        Counts provided tags in all games. Counter is kept in bit-sliced form: bit n of plane k is bit k of score
+        of game number n, tag bitset is added to counter with ripple-carry addition once for every set bit of
+        tag weight, starting from plane of this bit
+        :param tags: Iterable with tag names
+        :param weights: Integer weight of every tag, every tag has weight 1 if not provided
+        :return: List with counter planes starting from the least significant one
+        """
+        planes = []
+        for tag_name in set(tags):
+            tag_bitset = self.tag_bitsets.get(tag_name, 0)
+            weight = weights.get(tag_name, 1) if weights else 1
+            plane_number = 0
+            while tag_bitset and weight > 0:
+                if weight & 1:
+                    self._add_to_planes(planes, tag_bitset, plane_number)
+                weight >>= 1
+                plane_number += 1
+        return planes
+
+    @staticmethod
+    def _add_to_planes(planes: list[int], carry: int, plane_number: int) -> None:
+        """
+        Adds bitset to bit-sliced counter starting from given plane
+        :param planes: List with counter planes, it is modified in place
+        :param carry: Bitset which is added
+        :param plane_number: Number of the least significant plane to which bitset is added
+        """
+        while len(planes) < plane_number:
+            planes.append(0)
+        while carry:
+            if plane_number == len(planes):
+                planes.append(carry)
+                return
+            plane = planes[plane_number]
+            planes[plane_number], carry = plane ^ carry, plane & carry
+            plane_number += 1
+
+    @staticmethod
+    def _get_score(planes: list[int], position: int) -> int:
+        return sum(
+            (plane >> position & 1) << plane_number
+            for plane_number, plane in enumerate(planes)
+        )
+
+
+def count_bits(bitset: int) -> int:
+    return bin(bitset).count("1")
+
+
+def _iterate_bits(bitset: int) -> Iterator[int]:
+    """
+    Iterates positions of set bits starting from the lowest one
+    """
+    while bitset:
+        lowest_bit = bitset & -bitset
+        yield lowest_bit.bit_length() - 1
+        bitset ^= lowest_bit
+
+
+def normalize_game_id(game_id: Union[uuid.UUID, str]) -> Union[uuid.UUID, str]:
+    """
+    Converts id of game given as text, e.g. taken from session or form data, to UUID which is used as key in
+    in-memory indexes. Ids which are not valid UUIDs are returned unchanged
+    :param game_id: Game id
+    :return: Normalized game id
+    """
+    if isinstance(game_id, str):
+        try:
+            return uuid.UUID(game_id)
+        except ValueError:
+            return game_id
+    return game_id
+
+
+def normalize_game_ids(game_ids: Iterable[Union[uuid.UUID, str]]) -> list:
+    """
+    Converts ids of games given as text to UUIDs, see normalize_game_id
+    :param game_ids: Iterable with game ids
+    :return: List with normalized game ids
+    """
+    return [normalize_game_id(game_id) for game_id in game_ids]
+
+
+def get_data_version(version_key: str = INDEX_VERSION_KEY) -> str:
+    """
+    Get version of data kept in database, new version is created if it is missing
+    :param version_key: Key under which version is kept
+    :return: Version of data
+    """
+    data_version, _ = DataVersion.objects.get_or_create(
+        key=version_key, defaults={"version": uuid.uuid4().hex}
+    )
+    return data_version.version
+
+
+def get_data_versions(version_keys: Iterable[str]) -> list[str]:
+    """
+    Get versions of many kinds of data with single query, missing versions are created
+    :param version_keys: Iterable with keys under which versions are kept
+    :return: List with versions in order of keys
+    """
+    version_keys = list(version_keys)
+    versions = dict(
+        DataVersion.objects.filter(key__in=version_keys).values_list("key", "version")
+    )
+    return [
+        versions[version_key]
+        if version_key in versions
+        else get_data_version(version_key)
+        for version_key in version_keys
+    ]
+
+
+def bump_data_version(version_key: str = INDEX_VERSION_KEY) -> None:
+    """
+    Replaces version of data kept in database after current transaction is committed. Version bumped many times
+    in one transaction, e.g. by signals of every saved game, is replaced once
+    :param version_key: Key under which version is kept
+    """
+    if not hasattr(_pending_versions, "keys"):
+        _pending_versions.keys = set()
+    _pending_versions.keys.add(version_key)
+    transaction.on_commit(partial(_replace_pending_version, version_key))
+
+
+def replace_data_version(version_key: str = INDEX_VERSION_KEY) -> None:
+    """
+    Replaces version of data kept in database immediately, in transaction new version is seen by current process
+    at once and by other processes together with changed data
+    :param version_key: Key under which version is kept
+    """
+    DataVersion.objects.update_or_create(
+        key=version_key, defaults={"version": uuid.uuid4().hex}
+    )
+
+
+def _replace_pending_version(version_key: str) -> None:
+    # Callbacks of one commit run one after another, only the first callback of every key replaces version
+    if version_key not in _pending_versions.keys:
+        return
+    _pending_versions.keys.discard(version_key)
+    replace_data_version(version_key)
+
+
+class VersionedIndex:
+    """
+    Keeps index in memory of process and rebuilds it when games or tags were changed since it was built. Version of
+    data is kept in database, so changes made in one process are visible in all processes
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str], object],
+        version_key: str = INDEX_VERSION_KEY,
+    ):
+        """
+        :param builder: Function which builds index from database using version of data
+        :param version_key: Key under which version of data used by index is kept
+        """
+        self.builder = builder
+        self.version_key = version_key
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Get index built from current data
+        :return: Index object
+        """
+        version = get_data_version(self.version_key)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = self.builder(version)
+            return self._index
+
+
+_tag_index = VersionedIndex(TagIndex.from_database)
+
+
+def get_tag_index() -> TagIndex:
+    """
+    Get index built from current games, index is rebuilt when data was changed since it was built
+    :return: TagIndex object
+    """
+    return _tag_index.get()
+
+
+def invalidate_tag_index(*args, **kwargs) -> None:
+    """
+    Marks in-memory indexes as outdated in all processes, used as receiver of signals sent when games or tags
+    change
+    """
+    bump_data_version(INDEX_VERSION_KEY)
@@ -0,0 +1,119 @@
+import math
+from typing import Iterable
+
+from django.db.models import Count
+
+from polecacz.models import Game, GameTag
+from polecacz.recommendations.tag_index import VersionedIndex, bump_data_version
+
+TAG_WEIGHTS_VERSION_KEY = "polecacz:tag_weights_version"
+WEIGHT_SCALE = 100
+
+
+class TagWeights:
+    """
+    Inverse document frequency of tags over all games. Weights are kept as integers scaled by WEIGHT_SCALE, so sums
+    of weights are exact and every recommendation backend orders games in the same way. Scores are divided by
+    WEIGHT_SCALE before they are shown or stored
+    """
+
+    def __init__(
+        self, tag_counts: dict[str, int], number_of_games: int, version: str = None
+    ):
+        """
+        :param tag_counts: Dictionary which maps tag name to number of games with this tag
+        :param number_of_games: Number of all games
+        :param version: Version of tag distribution from which weights were calculated
+        """
+        self.version = version
+        self.number_of_games = number_of_games
+        self.weights = {
+            tag_name: self._calculate_weight(number_of_games, counter)
+            for tag_name, counter in tag_counts.items()
+        }
+
+    @classmethod
+    def from_database(cls, version: str = None) -> "TagWeights":
+        """
+        Calculates weights using number of games with every tag
+        :param version: Version of tag distribution from which weights are calculated
+        :return: TagWeights object
+        """
+        tag_counts = GameTag.objects.values_list("tag__name").annotate(
+            counter=Count("content_object", distinct=True)
+        )
+        return cls(dict(tag_counts), Game.objects.count(), version)
+
+    @staticmethod
+    def _calculate_weight(number_of_games: int, counter: int) -> int:
+        """
+        Smoothed inverse document frequency, tag used in all games has weight 1
+        :param number_of_games: Number of all games
+        :param counter: Number of games with tag
+        :return: Weight scaled by WEIGHT_SCALE
+        """
+        idf = math.log((1 + number_of_games) / (1 + counter)) + 1
+        return round(idf * WEIGHT_SCALE)
+
+    def get_weights(self, tags: Iterable[str]) -> dict[str, int]:
+        """
+        Get weights of provided tags, tags which are not used in any game get the highest possible weight
+        :param tags: Iterable with tag names
+        :return: Dictionary which maps tag name to weight
+        """
+        missing_tag_weight = self._calculate_weight(self.number_of_games, 0)
+        return {
+            tag_name: self.weights.get(tag_name, missing_tag_weight)
+            for tag_name in tags
+        }
+
+
+def get_score_scale(weights: dict = None, metric: str = "overlap") -> int:
+    """
+    Get factor by which scores calculated with weights of TagWeights are multiplied. Overlap is sum of weights
+    scaled by WEIGHT_SCALE, so it is divided before it is shown or stored, other metrics do not depend on scale
+    :param weights: Weights passed to recommendation backend, scores are not scaled if not provided
+    :param metric: Similarity measure, one of METRICS of sparse engine
+    :return: Number by which scores and contributions of tags are divided
+    """
+    return WEIGHT_SCALE if weights and metric == "overlap" else 1
+
+
+def unscale_contributions(tag_contributions: dict, scale: int) -> dict:
+    """
+    Divides contributions of tags by scale returned by get_score_scale
+    :param tag_contributions: Dictionary which maps game id to dictionary with tag names and their contributions
+    :param scale: Number by which contributions are divided
+    :return: Dictionary with divided contributions
+    """
+    if scale == 1:
+        return tag_contributions
+    return {
+        game_id: {
+            tag_name: contribution / scale
+            for tag_name, contribution in contributions.items()
+        }
+        for game_id, contributions in tag_contributions.items()
+    }
+
+
+_tag_weights = VersionedIndex(TagWeights.from_database, TAG_WEIGHTS_VERSION_KEY)
+
+
+def get_tag_weights() -> TagWeights:
+    """
+    Get weights calculated from current tag distribution, weights are calculated again when games or tags were
+    added or removed
+    :return: TagWeights object
+    """
+    return _tag_weights.get()
+
+
+def invalidate_tag_weights(*args, **kwargs) -> None:
+    """
+    Marks weights as outdated, used as receiver of signals sent when tag distribution changes. Updates of games
+    which were already created are ignored, because they do not change tag distribution
+    """
+    if kwargs.get("sender") is Game and kwargs.get("created") is False:
+        return
+    bump_data_version(TAG_WEIGHTS_VERSION_KEY)
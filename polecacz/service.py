@@ -1,11 +1,23 @@
 from typing import Union
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.http import Http404
 from pyrebase import pyrebase
 
-from polecacz.models import Game, SelectedGames, Recommendation, OwnedGames, ImageMetadata
-from django.db.models import Count, QuerySet, Q
+from polecacz.models import Game, SelectedGames, Recommendation, OwnedGames, ImageMetadata, GameNeighbour, GameTag, \
+    RecommendedGame
+from polecacz.recommendations.blending import BLEND_POOL_FACTOR, blend_scores
+from polecacz.recommendations.breakdown import TagBreakdown, make_breakdown, scale_breakdown
+from polecacz.recommendations.cooccurrence import get_cooccurrence_scores
+from polecacz.recommendations.diversity import rerank_with_mmr
+from polecacz.recommendations.feedback import get_feedback_boosts
+from polecacz.recommendations.result_cache import RecommendationCache
+from polecacz.recommendations.sparse_engine import get_sparse_engine
+from polecacz.recommendations.tag_index import get_tag_index
+from polecacz.recommendations.tag_weights import WEIGHT_SCALE, get_score_scale, get_tag_weights, unscale_contributions
+from django.db.models import Case, Count, FloatField, IntegerField, QuerySet, Q, Sum, Value, When
+from django.db.models.functions import Cast
 from gierkopolecacz.settings import storage_config
 
 
@@ -58,17 +70,348 @@ class GameService:
         return Game.objects.order_by(order)
 
     @staticmethod
-    def find_most_similar_games(tags: list[str]) -> QuerySet:
-        """
-        Finds most similar games using provided tags
+    def find_most_similar_games(
+        tags: list[str],
+        exclude_ids: list[str] = None,
+        limit: int = None,
+        constraints: dict = None,
+        include_ids: list[str] = None,
+    ) -> Union[QuerySet, list[Game]]:
+        """
+        Finds most similar games using provided tags. Games are scored by backend selected with
+        RECOMMENDATION_BACKEND setting, query using GameTag join is used if setting is not provided. Shared tags
+        are weighted with their inverse document frequency if RECOMMENDATION_WEIGHTING is "idf". Games which do
+        not satisfy constraints are filtered out with indexed query by "sql" backend and with attributes kept in
+        memory by "index" and "sparse" backends
         :param tags: List with tags used in games
-        :return: QuerySet with games ordered by similarity
-        """
-        similar_games = Game.objects.filter(tags__name__in=tags)
-        similar_games = similar_games.annotate(same_tags=Count("tags")).order_by(
-            "-same_tags", "-rating"
+        :param exclude_ids: List with ids of games which should not be returned
+        :param limit: Maximal number of returned games, all similar games are returned if not provided
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :param include_ids: List with ids of games which can be returned, all games can be returned if not provided
+        :return: QuerySet or list with games ordered by similarity, every game has score attribute and breakdown
+        attribute with shared tags and their contributions to score
+        """
+        backend = getattr(settings, "RECOMMENDATION_BACKEND", "sql")
+        weights = None
+        if getattr(settings, "RECOMMENDATION_WEIGHTING", None) == "idf":
+            weights = get_tag_weights().get_weights(set(tags))
+        if backend == "index":
+            index = get_tag_index()
+            similar_games_ids = index.find_most_similar_games(
+                tags,
+                exclude_ids or [],
+                limit if limit is not None else len(index),
+                weights,
+                include_ids,
+                constraints,
+            )
+            tag_contributions = unscale_contributions(
+                index.explain_games(similar_games_ids, tags, weights), get_score_scale(weights)
+            )
+            scores = {game_id: sum(contributions.values()) for game_id, contributions in tag_contributions.items()}
+        elif backend == "sparse":
+            engine = get_sparse_engine()
+            metric = getattr(settings, "RECOMMENDATION_METRIC", "overlap")
+            (scored_games,) = engine.score_most_similar_games_batch(
+                [tags],
+                [exclude_ids or []],
+                limit if limit is not None else len(engine),
+                metric,
+                weights,
+                include_ids,
+                constraints,
+            )
+            scale = get_score_scale(weights, metric)
+            scores = {game_id: score / scale for game_id, score in scored_games}
+            similar_games_ids = list(scores)
+            tag_contributions = unscale_contributions(
+                engine.explain_games(similar_games_ids, tags, metric, weights), scale
+            )
+        else:
+            similar_games = Game.objects.filter(GameService.get_constraints_filter(constraints), tags__name__in=tags)
+            if include_ids is not None:
+                similar_games = similar_games.filter(id__in=include_ids)
+            if exclude_ids:
+                similar_games = similar_games.exclude(id__in=exclude_ids)
+            if weights:
+                tag_weight = Case(
+                    *[
+                        When(tags__name=tag_name, then=Value(weight))
+                        for tag_name, weight in weights.items()
+                    ],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                # Weights are summed as integers, so ties are the same as in other backends
+                same_tags = Cast(Sum(tag_weight), FloatField()) / Value(WEIGHT_SCALE, output_field=FloatField())
+                tag_contribution = Cast(tag_weight, FloatField()) / Value(WEIGHT_SCALE, output_field=FloatField())
+            else:
+                tag_contribution = Value(1)
+                same_tags = Count("tags")
+            similar_games = similar_games.annotate(
+                score=same_tags, breakdown=TagBreakdown("tags__name", tag_contribution)
+            ).order_by("-score", "-rating")
+            return similar_games[:limit] if limit is not None else similar_games
+        return GameService._get_scored_games(
+            similar_games_ids,
+            scores,
+            {game_id: make_breakdown(tag_contributions.get(game_id)) for game_id in similar_games_ids},
         )
-        return similar_games
+
+    @staticmethod
+    def get_constraints_filter(constraints: dict = None, prefix: str = "") -> Q:
+        """
+        Builds filter of games which satisfy constraints, every constraint is checked using indexed column
+        :param constraints: Dictionary with optional constraints: "players" which has to be between minimal and
+        maximal number of players, "max_playing_time" in minutes and "year_from", "year_to" of publication
+        :param prefix: Prefix of game fields, used when games are filtered through relation
+        :return: Q object, empty if there are no constraints
+        """
+        constraints = constraints or {}
+        constraints_filter = Q()
+        if constraints.get("players") is not None:
+            constraints_filter &= Q(
+                **{
+                    f"{prefix}min_players__lte": constraints["players"],
+                    f"{prefix}max_players__gte": constraints["players"],
+                }
+            )
+        if constraints.get("max_playing_time") is not None:
+            constraints_filter &= Q(**{f"{prefix}playing_time__lte": constraints["max_playing_time"]})
+        # Year is kept as text, so years are compared as zero padded four digit strings
+        for constraint, lookup in (("year_from", "gte"), ("year_to", "lte")):
+            if constraints.get(constraint) is not None:
+                constraints_filter &= Q(
+                    **{
+                        f"{prefix}year_published__{lookup}": f"{constraints[constraint]:04d}",
+                        f"{prefix}year_published__regex": r"^[0-9]{4}$",
+                    }
+                )
+        return constraints_filter
+
+    @staticmethod
+    def _get_scored_games(game_ids: list[str], scores: dict, breakdowns: dict = None) -> list[Game]:
+        """
+        Get games in given order with score and breakdown attributes set
+        :param game_ids: List with game ids
+        :param scores: Dictionary which maps game id to score
+        :param breakdowns: Dictionary which maps game id to breakdown of score created with make_breakdown
+        :return: List with games
+        """
+        games = Game.objects.in_bulk(game_ids)
+        scored_games = []
+        for game_id in game_ids:
+            game = games.get(game_id)
+            if game is not None:
+                game.score = scores.get(game_id)
+                game.breakdown = (breakdowns or {}).get(game_id) or make_breakdown()
+                scored_games.append(game)
+        return scored_games
+
+    @staticmethod
+    def find_games_similar_to_selected(
+        selected_ids: list[str],
+        tags: list[str],
+        exclude_ids: list[str],
+        limit: int = 10,
+        constraints: dict = None,
+    ) -> list[Game]:
+        """
+        Finds games most similar to selected games, results are cached by ids of selected and excluded games and
+        constraints
+        :param selected_ids: List with ids of selected games
+        :param tags: List with tags used in selected games
+        :param exclude_ids: List with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :return: List with games ordered by similarity
+        """
+        recommendation_cache = RecommendationCache()
+        key = recommendation_cache.make_key(selected_ids, exclude_ids, limit, constraints)
+        scored_games_ids = recommendation_cache.get(key)
+        if scored_games_ids is None:
+            similar_games = list(
+                GameService._find_games_similar_to_selected(
+                    selected_ids, tags, exclude_ids, limit, constraints
+                )
+            )
+            recommendation_cache.set(
+                key, [(game.id, float(game.score), game.breakdown) for game in similar_games]
+            )
+            return similar_games
+        return GameService._get_scored_games(
+            [game_id for game_id, _, _ in scored_games_ids],
+            {game_id: score for game_id, score, _ in scored_games_ids},
+            {game_id: breakdown for game_id, _, breakdown in scored_games_ids},
+        )
+
+    @staticmethod
+    def _find_games_similar_to_selected(
+        selected_ids: list[str],
+        tags: list[str],
+        exclude_ids: list[str],
+        limit: int = 10,
+        constraints: dict = None,
+    ) -> Union[QuerySet, list[Game]]:
+        """
+        Finds games most similar to selected games. If RECOMMENDATION_DIVERSITY is positive, larger pool of the
+        most similar games is re-ranked with maximal marginal relevance, so returned games are less similar to
+        each other
+        :param selected_ids: List with ids of selected games
+        :param tags: List with tags used in selected games
+        :param exclude_ids: List with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :return: QuerySet or list with games ordered by similarity
+        """
+        diversity = getattr(settings, "RECOMMENDATION_DIVERSITY", 0)
+        if diversity <= 0:
+            return GameService._find_relevant_games(selected_ids, tags, exclude_ids, limit, constraints)
+        candidates = {
+            game.id: game
+            for game in GameService._find_relevant_games(
+                selected_ids, tags, exclude_ids, limit * BLEND_POOL_FACTOR, constraints
+            )
+        }
+        diverse_games_ids = rerank_with_mmr(
+            candidates,
+            {game_id: game.score for game_id, game in candidates.items()},
+            get_tag_index().tag_vectors,
+            limit,
+            diversity,
+        )
+        return [candidates[game_id] for game_id in diverse_games_ids]
+
+    @staticmethod
+    def _find_relevant_games(
+        selected_ids: list[str],
+        tags: list[str],
+        exclude_ids: list[str],
+        limit: int = 10,
+        constraints: dict = None,
+    ) -> Union[QuerySet, list[Game]]:
+        """
+        Finds games most similar to selected games. If RECOMMENDATION_BACKEND is "neighbours", precomputed
+        neighbour lists of selected games are merged by summing scores, games are found using tags otherwise or
+        when any of selected games has no precomputed neighbours. Games found using tags are blended with games
+        which appear in the same collections if RECOMMENDATION_COOCCURRENCE_WEIGHT is positive and with boosts
+        calculated from opinions if RECOMMENDATION_FEEDBACK_WEIGHT is positive
+        :param selected_ids: List with ids of selected games
+        :param tags: List with tags used in selected games
+        :param exclude_ids: List with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :return: QuerySet or list with games ordered by similarity
+        """
+        if getattr(settings, "RECOMMENDATION_BACKEND", "sql") == "neighbours":
+            neighbours = GameNeighbour.objects.filter(game_id__in=selected_ids)
+            games_with_neighbours = neighbours.values("game_id").distinct().count()
+            if games_with_neighbours == len(set(selected_ids)):
+                scores = dict(
+                    neighbours.exclude(neighbour_id__in=[*selected_ids, *exclude_ids])
+                    .filter(GameService.get_constraints_filter(constraints, "neighbour__"))
+                    .values("neighbour_id")
+                    .annotate(total_score=Sum("score"))
+                    .order_by("-total_score", "-neighbour__rating")
+                    .values_list("neighbour_id", "total_score")[:limit]
+                )
+                return GameService._get_scored_games(
+                    list(scores),
+                    scores,
+                    {game_id: make_breakdown(neighbours=score) for game_id, score in scores.items()},
+                )
+        cooccurrence_weight = getattr(settings, "RECOMMENDATION_COOCCURRENCE_WEIGHT", 0)
+        feedback_weight = getattr(settings, "RECOMMENDATION_FEEDBACK_WEIGHT", 0)
+        if cooccurrence_weight > 0 or feedback_weight > 0:
+            return GameService._blend_similar_games(
+                selected_ids, tags, exclude_ids, limit, cooccurrence_weight, feedback_weight, constraints
+            )
+        return GameService.find_most_similar_games(
+            tags, [*selected_ids, *exclude_ids], limit, constraints
+        )
+
+    @staticmethod
+    def _blend_similar_games(
+        selected_ids: list[str],
+        tags: list[str],
+        exclude_ids: list[str],
+        limit: int,
+        cooccurrence_weight: float,
+        feedback_weight: float,
+        constraints: dict = None,
+    ) -> list[Game]:
+        """
+        Finds larger pool of games using tags and games which co-occur with selected games, then orders them by
+        tag score blended with co-occurrence score and boost calculated from opinions. Tag scores and their
+        breakdowns come from backend selected with RECOMMENDATION_BACKEND setting
+        :param selected_ids: List with ids of selected games
+        :param tags: List with tags used in selected games
+        :param exclude_ids: List with ids of games which should not be returned
+        :param limit: Maximal number of returned games
+        :param cooccurrence_weight: Weight of co-occurrence score, tag score has weight 1
+        :param feedback_weight: Weight of opinion boost, tag score has weight 1
+        :param constraints: Dictionary with constraints described in get_constraints_filter
+        :return: List with games ordered by blended score, every game has blended score in score attribute and
+        contributions of shared tags, co-occurrence and opinions in breakdown attribute
+        """
+        pool_size = limit * BLEND_POOL_FACTOR
+        candidates = {
+            game.id: game
+            for game in GameService.find_most_similar_games(
+                tags, [*selected_ids, *exclude_ids], pool_size, constraints
+            )
+        }
+        cooccurrence_scores = {}
+        if cooccurrence_weight > 0:
+            cooccurrence_scores = get_cooccurrence_scores(
+                selected_ids,
+                exclude_ids,
+                pool_size,
+                GameService.get_constraints_filter(constraints, "other_game__"),
+            )
+            missing_ids = [game_id for game_id in cooccurrence_scores if game_id not in candidates]
+            if missing_ids:
+                candidates.update(
+                    (game.id, game)
+                    for game in GameService.find_most_similar_games(
+                        tags, [*selected_ids, *exclude_ids], constraints=constraints, include_ids=missing_ids
+                    )
+                )
+                candidates.update(
+                    Game.objects.in_bulk([game_id for game_id in missing_ids if game_id not in candidates])
+                )
+        tag_scores = {game.id: getattr(game, "score", 0) for game in candidates.values()}
+        tag_contributions = {
+            game.id: getattr(game, "breakdown", {}).get("tags", {}) for game in candidates.values()
+        }
+        feedback_boosts = {}
+        if feedback_weight > 0:
+            boosts = get_feedback_boosts()
+            game_tag_names = {}
+            for game_id, tag_name in GameTag.objects.filter(content_object_id__in=list(candidates)).values_list(
+                "content_object_id", "tag__name"
+            ):
+                game_tag_names.setdefault(game_id, []).append(tag_name)
+            feedback_boosts = {
+                game_id: boosts.get_boost(game_id, game_tag_names.get(game_id, []))
+                for game_id in candidates
+            }
+        blended_games = blend_scores(
+            list(candidates.values()),
+            [
+                (tag_scores, 1),
+                (cooccurrence_scores, cooccurrence_weight),
+                (feedback_boosts, feedback_weight),
+            ],
+            limit,
+            ["tags", "cooccurrence", "feedback"],
+        )
+        for game in blended_games:
+            components = game.components
+            game.breakdown = make_breakdown(
+                scale_breakdown(tag_contributions[game.id], components.pop("tags")), **components
+            )
+        return blended_games
 
     @staticmethod
     def filter_games_which_contains_string(
@@ -128,6 +471,19 @@ class GameService:
         """
         return [tag for tag in game.tags.values_list("name", flat=True)]
 
+    @staticmethod
+    def get_tag_names_list_from_games(games_ids: list[str]) -> list[str]:
+        """
+        Return list with unique tag names used in games, tags of all games are fetched with single query
+        :param games_ids: List with game ids
+        :return: List with tag names
+        """
+        return list(
+            GameTag.objects.filter(content_object_id__in=games_ids)
+            .values_list("tag__name", flat=True)
+            .distinct()
+        )
+
 
 class SelectedGamesService:
     @staticmethod
@@ -189,15 +545,17 @@ class RecommendationService:
     @staticmethod
     def get_recommended_games(id: str) -> Union[QuerySet, list]:
         """
-        Get all games which was recommended
+        Get all games which was recommended, games are read with single query in order in which they were
+        recommended
         :param id: Recommendation id
-        :return: Queryset with recommended games
+        :return: List with recommended games, every game has score and breakdown attributes
         """
-        try:
-            recommendation = Recommendation.objects.get(id=id)
-        except Recommendation.DoesNotExist:
-            return []
-        return recommendation.recommended_games.all()
+        recommended_games = []
+        for entry in RecommendedGame.objects.filter(recommendation_id=id).select_related("game").order_by("rank"):
+            entry.game.score = entry.score
+            entry.game.breakdown = entry.breakdown
+            recommended_games.append(entry.game)
+        return recommended_games
 
     @staticmethod
     def get_selected_games(id: str) -> Union[QuerySet, list]:
@@ -248,6 +606,37 @@ class RecommendationService:
             raise Http404
         return recommendation
 
+    @staticmethod
+    def add_recommended_games(
+        recommendation: Recommendation, selected_games_ids: list[str], owned_games_ids: list[str]
+    ) -> list[Game]:
+        """
+        Finds games in which were used similar mechanics and game categories and satisfy constraints of
+        recommendation, then adds them to recommendation together with their positions, scores and breakdowns of
+        scores
+        :param recommendation: Recommendation object
+        :param selected_games_ids: List with game ids which were used to create recommendation
+        :param owned_games_ids: List with ids of games owned by user, they are not recommended
+        :return: List with 10 recommended games
+        """
+        tag_list = GameService.get_tag_names_list_from_games(selected_games_ids)
+        recommended_games = GameService.find_games_similar_to_selected(
+            selected_games_ids, tag_list, owned_games_ids, limit=10, constraints=recommendation.constraints
+        )
+        RecommendedGame.objects.bulk_create(
+            [
+                RecommendedGame(
+                    recommendation=recommendation,
+                    game=game,
+                    rank=rank,
+                    score=getattr(game, "score", None),
+                    breakdown=getattr(game, "breakdown", None) or {},
+                )
+                for rank, game in enumerate(recommended_games, start=1)
+            ]
+        )
+        return recommended_games
+
     @staticmethod
     def create_recommendation(**kwargs) -> Recommendation:
         """
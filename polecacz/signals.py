@@ -0,0 +1,36 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from taggit.models import Tag
+
+from polecacz.models import Game, GameTag, OwnedGames, Recommendation, SelectedGames
+from polecacz.recommendations.cooccurrence import collection_changed
+from polecacz.recommendations.tag_index import invalidate_tag_index
+from polecacz.recommendations.tag_weights import invalidate_tag_weights
+
+
+def connect_signals() -> None:
+    """
+    Connects receivers which keep in-memory recommendation data up to date with games and their tags and
+    co-occurrence of games up to date with users' collections
+    """
+    for model in (Game, GameTag, Tag):
+        for receiver in (invalidate_tag_index, invalidate_tag_weights):
+            post_save.connect(
+                receiver,
+                sender=model,
+                dispatch_uid=f"{receiver.__name__}_{model.__name__}_save",
+            )
+            post_delete.connect(
+                receiver,
+                sender=model,
+                dispatch_uid=f"{receiver.__name__}_{model.__name__}_delete",
+            )
+    for through_model in (
+        OwnedGames.owned_games.through,
+        SelectedGames.selected_games.through,
+        Recommendation.selected_games.through,
+    ):
+        m2m_changed.connect(
+            collection_changed,
+            sender=through_model,
+            dispatch_uid=f"collection_changed_{through_model.__name__}",
+        )
@@ -57,11 +57,21 @@ urlpatterns = [
         views.RecommendationDetailView.as_view(),
         name="recommendation_detail",
     ),
+    path(
+        "recommendation/<uuid:pk>/status/",
+        never_cache(views.RecommendationStatusView.as_view()),
+        name="recommendation_status",
+    ),
     path(
         "create_recommendation/",
         views.CreateRecommendationView.as_view(),
         name="create_recommendation",
     ),
+    path(
+        "recommendation_cache_stats/",
+        never_cache(views.RecommendationCacheStatsView.as_view()),
+        name="recommendation_cache_stats",
+    ),
     path("opinion/<uuid:pk>/", views.OpinionFormView.as_view(), name="create_opinion"),
     path("opinion/create/<uuid:pk>/", views.AddOpinionView.as_view(), name="add_opinion"),
 ]
@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
-from django.db.models import QuerySet
-from django.http import JsonResponse, HttpRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, HttpRequest
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
 from django.utils.datastructures import MultiValueDictKeyError
@@ -12,8 +13,11 @@ from django.views import generic
 
 from gierkopolecacz.settings import MEDIA_ROOT
 from polecacz.bgg_api import CATEGORIES_MAP, MECHANICS_MAP
-from polecacz.forms import OpinionForm
+from polecacz.forms import OpinionForm, RecommendationConstraintsForm
 from polecacz.models import Game, Opinion, SelectedGames, Recommendation, OwnedGames, ImageMetadata
+from polecacz.recommendations.feedback import add_opinion_feedback
+from polecacz.recommendations.jobs import enqueue_recommendation
+from polecacz.recommendations.result_cache import RecommendationCache
 from polecacz.service import SelectedGamesService, RecommendationService, GameService, OwnedGamesService, \
     FirebaseStorageService, ImageMetadataService
 from polecacz.validators import validate_file_extension, validate_file_size, TooBigFileException
@@ -222,6 +226,11 @@ class SelectedGamesListView(LoginRequiredMixin, generic.ListView):
         )
         return SelectedGamesService.get_user_selected_games(self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["constraints_form"] = RecommendationConstraintsForm()
+        return context
+
 
 class OwnedGamesListView(LoginRequiredMixin, generic.ListView):
     """
@@ -262,10 +271,35 @@ class RecommendationDetailView(LoginRequiredMixin, generic.DetailView):
         context["recommended_games"] = RecommendationService().get_recommended_games(id)
         context["selected_games"] = RecommendationService().get_selected_games(id)[:4]
         context["opinion_created"] = RecommendationService().get_opinion_created(id)
+        context["status"] = self.object.status
         context["id"] = id
         return context
 
 
+class RecommendationStatusView(LoginRequiredMixin, generic.View):
+
+    def get(self, request: HttpRequest, pk: str) -> JsonResponse:
+        """
+        Method responsible for returning status of recommendation, used to wait for recommendation computed in
+        background
+        :param request: Incoming HttpRequest with all data
+        :param pk: Recommendation id
+        """
+        recommendation = RecommendationService.get_recommendation_by_id(id=pk)
+        if recommendation.user != request.user:
+            raise Http404
+        return JsonResponse(
+            {
+                "status": 200,
+                "data": {
+                    "status": recommendation.status,
+                    "finished": recommendation.status
+                    in (Recommendation.Status.DONE, Recommendation.Status.FAILED),
+                },
+            }
+        )
+
+
 class RecommendationListView(LoginRequiredMixin, generic.ListView):
     """
     View responsible for retrieving Recommendation list
@@ -330,6 +364,7 @@ class AddOpinionView(LoginRequiredMixin, generic.View):
             opinion.save()
             recommendation.opinion_created = True
             recommendation.save()
+            add_opinion_feedback(recommendation, opinion.rating)
             return redirect("polecacz:recommendation_list")
         else:
             return render(
@@ -367,6 +402,19 @@ class GameSearchView(LoginRequiredMixin, generic.View):
         return JsonResponse({"status": 200, "data": payload})
 
 
+class RecommendationCacheStatsView(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        """
+        Returns number of hits and misses of recommendation cache, available only for staff
+        :param request: Incoming HttpRequest with all data
+        """
+        return JsonResponse({"status": 200, "data": RecommendationCache().get_stats()})
+
+
 def _build_url_with_pagination_and_order(url: str, request: HttpRequest) -> str:
     """
     Builds url with all attributes like pagination, ordering, searched games,
@@ -524,48 +572,43 @@ class RemoveFromSelectedGamesView(LoginRequiredMixin, generic.View):
 class CreateRecommendationView(LoginRequiredMixin, generic.View):
     def post(self, request: HttpRequest):
         """
-        Creates Recommendation object based on user selected games
+        Creates Recommendation object based on user selected games. Recommended games have to satisfy optional
+        constraints sent in form. Recommended games are found in background job if RECOMMENDATION_JOBS setting is
+        provided, user is redirected to recommendation which waits for it
         :param request: Incoming HttpRequest with all data
         """
+        constraints_form = RecommendationConstraintsForm(request.POST)
+        if not constraints_form.is_valid():
+            for errors in constraints_form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+            return redirect("polecacz:selected_games")
         selected_games_obj = SelectedGamesService.get_selected_games_object_by_user(
             user=request.user
         )
-        games = selected_games_obj.selected_games.all()
+        if not selected_games_obj:
+            return redirect("polecacz:selected_games")
+        games = list(selected_games_obj.selected_games.all())
         if not games:
             return redirect("polecacz:selected_games")
         owned_games_obj = OwnedGamesService.get_owned_games_object_by_user(user=request.user)
         if owned_games_obj:
-            owned_games = owned_games_obj.owned_games.all()
-            owned_games_ids = GameService.get_ids_from_game_queryset(owned_games) if owned_games else []
+            owned_games_ids = GameService.get_ids_from_game_queryset(owned_games_obj.owned_games.all())
         else:
             owned_games_ids = []
 
-        recommendation_object = RecommendationService.create_recommendation(
-            user=request.user
-        )
-        games_ids = GameService.get_ids_from_game_queryset(games)
-        tag_list = []
-        for game in games:
-            recommendation_object.selected_games.add(game)
-            tag_list.extend(GameService.get_tag_names_list_from_game(game))
-
-        recommended_games_query = self._create_recommendation_using_tags(games_ids, tag_list, owned_games_ids)
-        for game in recommended_games_query[:10]:
-            recommendation_object.recommended_games.add(game)
-        recommendation_object.save()
-        selected_games_obj.selected_games.clear()
-        selected_games_obj.save()
+        games_ids = [game.id for game in games]
+        run_in_background = bool(getattr(settings, "RECOMMENDATION_JOBS", ""))
+        with transaction.atomic():
+            recommendation_object = RecommendationService.create_recommendation(
+                user=request.user,
+                status=Recommendation.Status.PENDING if run_in_background else Recommendation.Status.DONE,
+                constraints=constraints_form.get_constraints(),
+            )
+            recommendation_object.selected_games.add(*games)
+            if run_in_background:
+                enqueue_recommendation(recommendation_object.id)
+            else:
+                RecommendationService.add_recommended_games(recommendation_object, games_ids, owned_games_ids)
+            selected_games_obj.selected_games.clear()
         return redirect("polecacz:recommendation_detail", recommendation_object.id)
-
-    def _create_recommendation_using_tags(self,
-        used_games_ids: list[str], tag_list: list[str], owned_games_ids: list[str]
-    ) -> QuerySet:
-        """
-        Returns games in which were used similar mechanics and game categories
-        :param used_games_ids: List with game ids which were used to create recommendations
-        :param tag_list: List with tags used in games which were used to create recommendations
-        :return: QuerySet with games in which were used similar mechanics and game categories
-        """
-        recommended_games_query = GameService.find_most_similar_games(list(set(tag_list)))
-        recommended_games_query = recommended_games_query.exclude(id__in=used_games_ids+owned_games_ids)
-        return recommended_games_query
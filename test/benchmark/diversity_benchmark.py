@@ -0,0 +1,75 @@
+"""
+Benchmark and offline evaluation of diversity re-ranking on synthetic catalogue. For every value of diversity it
+reports latency of maximal marginal relevance re-ranking, intra-list similarity of recommended games and share of
+relevance kept compared to top games without re-ranking.
+Run from repository root: python -m test.benchmark.diversity_benchmark [number_of_games]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gierkopolecacz.settings")
+django.setup()
+
+from polecacz.recommendations.diversity import (
+    get_intra_list_similarity,
+    rerank_with_mmr,
+)
+from polecacz.recommendations.tag_index import TagIndex
+from test.benchmark.recommendations_benchmark import (
+    NUMBER_OF_GAMES,
+    SELECTED_GAMES,
+    build_catalogue,
+)
+
+LIMIT = 10
+POOL_FACTOR = 5
+DIVERSITIES = (0.0, 0.1, 0.3, 0.5, 0.7)
+REPEAT = 200
+
+
+def main():
+    number_of_games = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_GAMES
+    games, game_tags = build_catalogue(number_of_games)
+    index = TagIndex(games, game_tags)
+    generator = random.Random(1)
+    pools = []
+    for _ in range(REPEAT):
+        selected = [game_id for game_id, _ in generator.sample(games, SELECTED_GAMES)]
+        tags = index.get_tag_names(selected)
+        candidate_ids = index.find_most_similar_games(
+            tags, selected, LIMIT * POOL_FACTOR
+        )
+        pools.append((candidate_ids, index.score_games(candidate_ids, tags)))
+
+    for diversity in DIVERSITIES:
+        latencies, similarities, kept_relevance = [], [], []
+        for candidate_ids, relevance in pools:
+            start = time.perf_counter()
+            reranked_ids = rerank_with_mmr(
+                candidate_ids, relevance, index.tag_vectors, LIMIT, diversity
+            )
+            latencies.append(time.perf_counter() - start)
+            similarities.append(
+                get_intra_list_similarity(reranked_ids, index.tag_vectors)
+            )
+            top_relevance = sum(relevance[game_id] for game_id in candidate_ids[:LIMIT])
+            kept_relevance.append(
+                sum(relevance[game_id] for game_id in reranked_ids)
+                / (top_relevance or 1)
+            )
+        latencies.sort()
+        print(
+            f"diversity {diversity}: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms, "
+            f"intra-list similarity {statistics.mean(similarities):.3f}, "
+            f"relevance kept {statistics.mean(kept_relevance):.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark comparing parsers of XMLAPI2 thing responses on recorded fixtures.
+Run from repository root: python -m test.benchmark.parsers_benchmark
+"""
+import timeit
+
+from bs4 import BeautifulSoup
+
+from polecacz.bgg_api import xml_parser
+from polecacz.bgg_api.api_wrapper import BGGApiWrapper
+
+RECORDED_THING = "test/utest/recorded_responses/thing_1_2.xml"
+BATCH_SIZE = BGGApiWrapper.MAX_BATCH_SIZE
+REPEAT = 200
+
+
+def build_batch_response(batch_size: int) -> str:
+    """
+    Builds thing response with batch_size items using recorded items
+    :param batch_size: Number of items in response
+    :return: XML in string form
+    """
+    with open(RECORDED_THING, encoding="utf-8") as file:
+        content = file.read()
+    items = [
+        "<item " + item.split("</item>", 1)[0] + "</item>"
+        for item in content.split("<item ")[1:]
+    ]
+    batch = [
+        items[i % len(items)].replace(
+            'id="%s"' % (i % len(items) + 1), 'id="%s"' % (i + 1), 1
+        )
+        for i in range(batch_size)
+    ]
+    return '<?xml version="1.0" encoding="utf-8"?><items>' + "".join(batch) + "</items>"
+
+
+def parse_with_soup(games_info: str) -> dict:
+    soup = BeautifulSoup(games_info, features="xml")
+    return {
+        item.get("id"): BGGApiWrapper._process_game_info(item)
+        for item in soup.find_all("item")
+    }
+
+
+def parse_with_lxml(games_info: str) -> dict:
+    return dict(xml_parser.iterate_items(games_info))
+
+
+def main():
+    games_info = build_batch_response(BATCH_SIZE)
+    assert parse_with_soup(games_info) == parse_with_lxml(games_info)
+    results = {}
+    for name, parser in (("soup", parse_with_soup), ("lxml", parse_with_lxml)):
+        seconds = min(
+            timeit.repeat(lambda: parser(games_info), number=REPEAT, repeat=3)
+        )
+        results[name] = seconds / REPEAT
+        print(f"{name}: {results[name] * 1000:.3f} ms per {BATCH_SIZE}-item response")
+    print(f"lxml speedup: {results['soup'] / results['lxml']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
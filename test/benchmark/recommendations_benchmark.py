@@ -0,0 +1,141 @@
+"""
+Micro-benchmark of in-memory recommendation backends on synthetic catalogue, tag index and sparse matrix engine are
+compared with counting shared tags game by game, which is what tags__name__in join with Count("tags") does in database.
+Run from repository root: python -m test.benchmark.recommendations_benchmark [number_of_games]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gierkopolecacz.settings")
+django.setup()
+
+from polecacz.bgg_api import CATEGORIES_MAP, MECHANICS_MAP
+from polecacz.recommendations.sparse_engine import SparseRecommendationEngine
+from polecacz.recommendations.tag_index import TagIndex
+from polecacz.recommendations.tag_weights import TagWeights
+
+NUMBER_OF_GAMES = 20000
+TAGS_PER_GAME = (3, 12)
+SELECTED_GAMES = 3
+REPEAT = 200
+
+
+def build_catalogue(
+    number_of_games: int, seed: int = 0
+) -> tuple[list[tuple[uuid.UUID, float]], list[tuple[uuid.UUID, str]]]:
+    """
+    Builds synthetic catalogue in which popularity of tags follows Zipf's law like in BGG data
+    :param number_of_games: Number of games in catalogue
+    :param seed: Seed of random number generator
+    :return: List with game id and rating and list with game id and tag name
+    """
+    generator = random.Random(seed)
+    tags = list(MECHANICS_MAP.values()) + list(CATEGORIES_MAP.values())
+    weights = [1 / (number + 1) for number in range(len(tags))]
+    games, game_tags = [], []
+    for _ in range(number_of_games):
+        game_id = uuid.UUID(int=generator.getrandbits(128))
+        games.append((game_id, round(generator.uniform(5, 9), 2)))
+        number_of_tags = generator.randint(*TAGS_PER_GAME)
+        for tag in set(generator.choices(tags, weights, k=number_of_tags)):
+            game_tags.append((game_id, tag))
+    return games, game_tags
+
+
+def find_most_similar_games_naive(
+    games: list[tuple[uuid.UUID, float]],
+    tags_by_game: dict[uuid.UUID, set[str]],
+    tags: list[str],
+    exclude_ids: list[uuid.UUID],
+    limit: int = 10,
+) -> list[uuid.UUID]:
+    tags = set(tags)
+    exclude_ids = set(exclude_ids)
+    scored = []
+    for game_id, rating in games:
+        same_tags = len(tags_by_game.get(game_id, set()) & tags)
+        if same_tags and game_id not in exclude_ids:
+            scored.append((-same_tags, -rating, str(game_id), game_id))
+    return [game_id for *_, game_id in sorted(scored)[:limit]]
+
+
+def measure(function, queries: list) -> list[float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(*query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    number_of_games = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_GAMES
+    games, game_tags = build_catalogue(number_of_games)
+    start = time.perf_counter()
+    index = TagIndex(games, game_tags)
+    print(
+        f"index build: {(time.perf_counter() - start) * 1000:.1f} ms for {len(index)} games"
+    )
+    start = time.perf_counter()
+    engine = SparseRecommendationEngine(games, game_tags)
+    print(f"sparse build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    tags_by_game = {}
+    for game_id, tag in game_tags:
+        tags_by_game.setdefault(game_id, set()).add(tag)
+    generator = random.Random(1)
+    queries = []
+    for _ in range(REPEAT):
+        selected = [game_id for game_id, _ in generator.sample(games, SELECTED_GAMES)]
+        queries.append((index.get_tag_names(selected), selected))
+    for tags, selected in queries[:10]:
+        assert index.find_most_similar_games(
+            tags, selected
+        ) == find_most_similar_games_naive(games, tags_by_game, tags, selected)
+        assert engine.find_most_similar_games(
+            tags, selected
+        ) == index.find_most_similar_games(tags, selected)
+
+    tag_counts = {}
+    for _, tag in game_tags:
+        tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    weights = TagWeights(tag_counts, len(games))
+    for name, function in (
+        ("index", index.find_most_similar_games),
+        (
+            "index idf",
+            lambda tags, selected: index.find_most_similar_games(
+                tags, selected, weights=weights.get_weights(tags)
+            ),
+        ),
+        ("sparse", engine.find_most_similar_games),
+        (
+            "naive",
+            lambda tags, selected: find_most_similar_games_naive(
+                games, tags_by_game, tags, selected
+            ),
+        ),
+    ):
+        latencies = sorted(measure(function, queries))
+        print(
+            f"{name}: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms"
+        )
+    start = time.perf_counter()
+    engine.find_most_similar_games_batch(
+        [tags for tags, _ in queries], [selected for _, selected in queries]
+    )
+    print(
+        f"sparse batch: {(time.perf_counter() - start) * 1000 / len(queries):.2f} ms "
+        f"per selection in batch of {len(queries)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from polecacz.models import OwnedGames, Recommendation, RecommendedGame, SelectedGames
+from polecacz.recommendations.batch import (
+    generate_recommendations,
+    load_user_interactions,
+)
+from polecacz.recommendations.cooccurrence import (
+    count_cooccurrence,
+    iterate_collections,
+)
+from polecacz.recommendations.tag_weights import WEIGHT_SCALE, get_tag_weights
+from test.factories.game import GameFactory
+
+
+class BatchRecommendationTest(TestCase):
+    def setUp(self) -> None:
+        self.user_1 = User.objects.create_user(username="user1", password="password")
+        self.user_2 = User.objects.create_user(username="user2", password="password")
+        User.objects.create_user(username="user3", password="password")
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag1"], rating=7.0)
+        self.game_4 = GameFactory(tags=["Tag3"], rating=6.0)
+        self.game_5 = GameFactory(tags=["Tag3", "Tag4"], rating=5.0)
+        SelectedGames.objects.create(user=self.user_1).selected_games.add(self.game_1)
+        OwnedGames.objects.create(user=self.user_1).owned_games.add(self.game_2)
+        OwnedGames.objects.create(user=self.user_2).owned_games.add(self.game_4)
+
+    def get_recommended_games(self, user) -> list[tuple]:
+        return list(
+            RecommendedGame.objects.filter(
+                recommendation__user=user, recommendation__generated=True
+            )
+            .order_by("rank")
+            .values_list("game", "rank", "score")
+        )
+
+    def test_load_user_interactions(self):
+        with self.assertNumQueries(2):
+            interactions = load_user_interactions()
+        self.assertEqual(
+            interactions,
+            {
+                self.user_1.id: ([self.game_1.id], [self.game_2.id]),
+                self.user_2.id: ([], [self.game_4.id]),
+            },
+        )
+
+    def test_generate_recommendations_for_selected_and_owned_games(self):
+        self.assertEqual(generate_recommendations(workers=1), (2, 2))
+        self.assertEqual(
+            self.get_recommended_games(self.user_1), [(self.game_3.id, 1, 1.0)]
+        )
+        self.assertEqual(
+            self.get_recommended_games(self.user_2), [(self.game_5.id, 1, 1.0)]
+        )
+        recommendation = Recommendation.objects.get(user=self.user_2)
+        self.assertEqual(list(recommendation.selected_games.all()), [self.game_4])
+        self.assertEqual(recommendation.status, Recommendation.Status.DONE)
+
+    def test_generate_recommendations_replaces_only_unrated_recommendations(self):
+        generate_recommendations(workers=1)
+        Recommendation.objects.filter(user=self.user_1).update(opinion_created=True)
+        manual_recommendation = Recommendation.objects.create(user=self.user_2)
+        generate_recommendations(workers=1)
+        self.assertEqual(
+            Recommendation.objects.filter(user=self.user_1, generated=True).count(), 2
+        )
+        self.assertEqual(
+            Recommendation.objects.filter(user=self.user_2, generated=True).count(), 1
+        )
+        self.assertTrue(
+            Recommendation.objects.filter(id=manual_recommendation.id).exists()
+        )
+
+    def test_generate_recommendations_in_process_pool(self):
+        result = generate_recommendations(workers=2, chunk_size=1)
+        self.assertEqual(result, (2, 2))
+        self.assertEqual(
+            self.get_recommended_games(self.user_1), [(self.game_3.id, 1, 1.0)]
+        )
+
+    def test_generate_recommendations_with_idf_stores_unscaled_scores(self):
+        weight = get_tag_weights().weights["Tag1"] / WEIGHT_SCALE
+        with self.settings(RECOMMENDATION_WEIGHTING="idf"):
+            generate_recommendations(workers=1)
+        self.assertEqual(
+            self.get_recommended_games(self.user_1), [(self.game_3.id, 1, weight)]
+        )
+        recommended_game = RecommendedGame.objects.get(recommendation__user=self.user_1)
+        self.assertEqual(recommended_game.breakdown, {"tags": {"Tag1": weight}})
+
+    def test_generate_recommendations_in_spawned_processes(self):
+        result = generate_recommendations(workers=2, chunk_size=1, start_method="spawn")
+        self.assertEqual(result, (2, 2))
+        self.assertEqual(
+            self.get_recommended_games(self.user_1), [(self.game_3.id, 1, 1.0)]
+        )
+
+    def test_generated_recommendations_do_not_count_cooccurrence(self):
+        OwnedGames.objects.get(user=self.user_2).owned_games.add(self.game_5)
+        generate_recommendations(workers=1)
+        counter = count_cooccurrence(iterate_collections())
+        self.assertEqual(
+            counter,
+            {(self.game_4.id, self.game_5.id): 1, (self.game_5.id, self.game_4.id): 1},
+        )
+
+    def test_generate_recommendations_command(self):
+        out = StringIO()
+        call_command(
+            "generate_recommendations", "--workers", "1", "--limit", "1", stdout=out
+        )
+        self.assertIn("Generated 2 recommendations with 2 games", out.getvalue())
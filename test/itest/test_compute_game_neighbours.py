@@ -0,0 +1,47 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from polecacz.models import GameNeighbour
+from test.factories.game import GameFactory
+
+
+class ComputeGameNeighboursTest(TestCase):
+    def setUp(self) -> None:
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2", "Tag3"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag3"], rating=7.0)
+        self.game_4 = GameFactory(tags=["Tag4"], rating=6.0)
+
+    def get_neighbours(self, game) -> list[tuple]:
+        return [
+            (neighbour.neighbour, neighbour.score)
+            for neighbour in GameNeighbour.objects.filter(game=game).order_by(
+                "-score", "-neighbour__rating"
+            )
+        ]
+
+    def test_compute_game_neighbours_stores_top_n_neighbours(self):
+        out = StringIO()
+        call_command(
+            "compute_game_neighbours", "--top-n", "1", "--batch-size", "2", stdout=out
+        )
+        self.assertIn("Computed 3 neighbours for 4 games", out.getvalue())
+        self.assertEqual(self.get_neighbours(self.game_1), [(self.game_2, 2.0)])
+        self.assertEqual(self.get_neighbours(self.game_3), [(self.game_1, 1.0)])
+        self.assertEqual(self.get_neighbours(self.game_4), [])
+
+    def test_compute_game_neighbours_replaces_old_neighbours(self):
+        GameNeighbour.objects.create(game=self.game_4, neighbour=self.game_1, score=5)
+        call_command("compute_game_neighbours", stdout=StringIO())
+        self.assertEqual(
+            self.get_neighbours(self.game_1),
+            [(self.game_2, 2.0), (self.game_3, 1.0)],
+        )
+        self.assertEqual(self.get_neighbours(self.game_4), [])
+
+    def test_compute_game_neighbours_uses_metric_setting(self):
+        with self.settings(RECOMMENDATION_METRIC="jaccard"):
+            call_command("compute_game_neighbours", stdout=StringIO())
+        self.assertEqual(self.get_neighbours(self.game_3), [(self.game_1, 1 / 3)])
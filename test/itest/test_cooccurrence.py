@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from polecacz.models import GameCooccurrence, OwnedGames, Recommendation
+from polecacz.recommendations.cooccurrence import update_cooccurrence
+from polecacz.service import GameService
+from test.factories.game import GameFactory
+
+
+class GameCooccurrenceTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="user", password="password")
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag1"], rating=7.0)
+        self.game_4 = GameFactory(tags=["Tag3"], rating=6.0)
+        self.owned_games = OwnedGames.objects.create(user=self.user)
+
+    def get_counters(self) -> dict:
+        return {
+            (row.game_id, row.other_game_id): row.counter
+            for row in GameCooccurrence.objects.all()
+        }
+
+    def test_adding_and_removing_games_updates_cooccurrence(self):
+        self.owned_games.owned_games.add(self.game_1, self.game_2)
+        self.owned_games.owned_games.add(self.game_3)
+        recommendation = Recommendation.objects.create(user=self.user)
+        recommendation.selected_games.add(self.game_1, self.game_3)
+        counters = self.get_counters()
+        self.assertEqual(counters[(self.game_1.id, self.game_2.id)], 1)
+        self.assertEqual(counters[(self.game_3.id, self.game_1.id)], 2)
+        self.assertEqual(counters[(self.game_1.id, self.game_3.id)], 2)
+        self.assertEqual(len(counters), 6)
+
+        self.owned_games.owned_games.remove(self.game_3, self.game_4)
+        counters = self.get_counters()
+        self.assertEqual(counters[(self.game_1.id, self.game_3.id)], 1)
+        self.assertNotIn((self.game_2.id, self.game_3.id), counters)
+
+        self.owned_games.owned_games.clear()
+        self.assertEqual(
+            self.get_counters(),
+            {(self.game_1.id, self.game_3.id): 1, (self.game_3.id, self.game_1.id): 1},
+        )
+
+    def test_update_cooccurrence_increments_pairs_inserted_concurrently(self):
+        self.owned_games.owned_games.add(self.game_1)
+        # pair inserted by other request after collection was read
+        GameCooccurrence.objects.create(
+            game=self.game_2, other_game=self.game_1, counter=1
+        )
+        update_cooccurrence({self.game_2.id}, {self.game_1.id}, 1)
+        self.assertEqual(
+            self.get_counters(),
+            {(self.game_1.id, self.game_2.id): 1, (self.game_2.id, self.game_1.id): 2},
+        )
+        update_cooccurrence({self.game_2.id}, {self.game_1.id}, -1)
+        self.assertEqual(self.get_counters(), {(self.game_2.id, self.game_1.id): 1})
+
+    def test_build_game_cooccurrence_matches_incremental_updates(self):
+        self.owned_games.owned_games.add(self.game_1, self.game_2, self.game_3)
+        self.owned_games.owned_games.remove(self.game_2)
+        recommendation = Recommendation.objects.create(user=self.user)
+        recommendation.selected_games.add(self.game_1, self.game_3, self.game_4)
+        counters = self.get_counters()
+        GameCooccurrence.objects.all().delete()
+
+        out = StringIO()
+        call_command("build_game_cooccurrence", stdout=out)
+        self.assertIn("Counted 6 pairs of games", out.getvalue())
+        self.assertEqual(self.get_counters(), counters)
+
+    def test_find_games_similar_to_selected_blends_cooccurrence(self):
+        for username in ("user_1", "user_2"):
+            user = User.objects.create_user(username=username, password="password")
+            OwnedGames.objects.create(user=user).owned_games.add(
+                self.game_1, self.game_4
+            )
+        tags = ["Tag1", "Tag2"]
+        with self.settings(RECOMMENDATION_COOCCURRENCE_WEIGHT=0):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id], tags, [], limit=2
+            )
+        self.assertEqual(list(result), [self.game_2, self.game_3])
+        with self.settings(RECOMMENDATION_COOCCURRENCE_WEIGHT=2):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id], tags, [], limit=2
+            )
+        self.assertEqual(list(result), [self.game_4, self.game_2])
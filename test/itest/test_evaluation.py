@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from polecacz.models import Game, Opinion, OwnedGames, Recommendation, RecommendedGame
+from polecacz.recommendations.evaluation import (
+    create_synthetic_cases,
+    evaluate,
+    get_percentile,
+    get_recommender,
+    load_historical_cases,
+)
+from test.factories.game import GameFactory
+
+
+def recommend_nothing(selected_ids: list, exclude_ids: list, limit: int) -> list:
+    return []
+
+
+class EvaluationTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="user", password="password")
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag1"], rating=7.0)
+        self.game_4 = GameFactory(tags=["Tag3"], rating=6.0)
+
+    def add_recommendation(
+        self, selected_games: list, recommended_games: list, rating: int = None
+    ):
+        recommendation = Recommendation.objects.create(user=self.user)
+        recommendation.selected_games.add(*selected_games)
+        RecommendedGame.objects.bulk_create(
+            [
+                RecommendedGame(recommendation=recommendation, game=game, rank=rank)
+                for rank, game in enumerate(recommended_games, start=1)
+            ]
+        )
+        if rating is not None:
+            Opinion.objects.create(
+                user=self.user,
+                rating=rating,
+                description="description",
+                recommendation=recommendation,
+            )
+        return recommendation
+
+    def test_load_historical_cases_uses_well_rated_recommendations(self):
+        OwnedGames.objects.create(user=self.user).owned_games.add(self.game_4)
+        self.add_recommendation([self.game_1], [self.game_2, self.game_3], rating=8)
+        self.add_recommendation([self.game_2], [self.game_4], rating=2)
+        self.add_recommendation([self.game_3], [self.game_4])
+        with self.assertNumQueries(4):
+            cases = load_historical_cases()
+        self.assertEqual(
+            cases,
+            [([self.game_1.id], [self.game_4.id], {self.game_2.id, self.game_3.id})],
+        )
+
+    def test_evaluate_reports_precision_coverage_and_queries(self):
+        cases = [
+            ([self.game_1.id], [], {self.game_2.id}),
+            ([self.game_4.id], [], {self.game_1.id}),
+        ]
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend):
+                result = evaluate(get_recommender(backend), cases, limit=2)
+                self.assertEqual(result["cases"], 2)
+                self.assertAlmostEqual(result["precision"], 0.25)
+                self.assertAlmostEqual(result["coverage"], 0.5)
+                self.assertGreaterEqual(result["p95_ms"], result["p50_ms"])
+                self.assertGreaterEqual(result["queries"], 1)
+
+    def test_evaluate_custom_recommender(self):
+        recommender = get_recommender("test.itest.test_evaluation.recommend_nothing")
+        result = evaluate(recommender, [([self.game_1.id], [], {self.game_2.id})])
+        self.assertEqual(result["precision"], 0.0)
+        self.assertEqual(result["coverage"], 0.0)
+        self.assertEqual(result["queries"], 0)
+
+    def test_create_synthetic_cases(self):
+        cases = create_synthetic_cases(5, 20, number_of_tastes=2, selected_games=3)
+        self.assertEqual(Game.objects.count(), 24)
+        self.assertEqual(len(cases), 5)
+        for selected_ids, exclude_ids, relevant_ids in cases:
+            self.assertEqual(len(selected_ids), 3)
+            self.assertEqual(len(relevant_ids), 7)
+            self.assertFalse(relevant_ids.intersection(selected_ids))
+
+    def test_get_percentile(self):
+        self.assertEqual(get_percentile([], 50), 0.0)
+        self.assertEqual(get_percentile([3.0, 1.0, 2.0, 4.0], 50), 2.0)
+        self.assertEqual(get_percentile(list(range(1, 101)), 95), 95)
+
+    def test_evaluate_recommendations_command_rolls_back_synthetic_games(self):
+        out = StringIO()
+        call_command(
+            "evaluate_recommendations",
+            "--source",
+            "synthetic",
+            "--cases",
+            "4",
+            "--games",
+            "30",
+            "--backend",
+            "index",
+            "--backend",
+            "neighbours",
+            "--setting",
+            "RECOMMENDATION_DIVERSITY=0.3",
+            stdout=out,
+        )
+        self.assertIn("precision@10", out.getvalue())
+        self.assertIn("Evaluated 4 cases", out.getvalue())
+        self.assertEqual(Game.objects.count(), 4)
+
+    def test_evaluate_recommendations_command_rebuilds_index_with_synthetic_games(self):
+        get_recommender("index")([self.game_1.id], [], 10)
+        out = StringIO()
+        call_command(
+            "evaluate_recommendations",
+            "--source",
+            "synthetic",
+            "--cases",
+            "4",
+            "--games",
+            "30",
+            "--backend",
+            "index",
+            stdout=out,
+        )
+        coverage = float(
+            next(
+                line for line in out.getvalue().splitlines() if line.startswith("index")
+            ).split()[2]
+        )
+        self.assertGreater(coverage, 0)
+
+    def test_evaluate_recommendations_command_historical(self):
+        self.add_recommendation([self.game_1], [self.game_2], rating=9)
+        out = StringIO()
+        call_command(
+            "evaluate_recommendations", "-k", "1", "--backend", "sql", stdout=out
+        )
+        self.assertRegex(out.getvalue(), r"sql\s+1\.000\s+0\.250")
@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from polecacz.models import GameFeedback, Opinion, Recommendation, TagFeedback
+from polecacz.recommendations.feedback import add_opinion_feedback
+from polecacz.service import GameService
+from test.factories.game import GameFactory
+
+
+class FeedbackTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="user", password="password")
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag1", "Tag2"], rating=7.0)
+
+    def add_opinion(self, recommended_games: list, rating: int) -> None:
+        recommendation = Recommendation.objects.create(user=self.user)
+        recommendation.recommended_games.add(*recommended_games)
+        Opinion.objects.create(
+            user=self.user,
+            rating=rating,
+            description="description",
+            recommendation=recommendation,
+        )
+        add_opinion_feedback(recommendation, rating)
+
+    def get_aggregates(self) -> tuple[dict, dict]:
+        return (
+            {
+                row.game_id: (row.rating_sum, row.counter)
+                for row in GameFeedback.objects.all()
+            },
+            {
+                row.tag.name: (row.rating_sum, row.counter)
+                for row in TagFeedback.objects.select_related("tag")
+            },
+        )
+
+    def test_aggregate_opinions_matches_incremental_updates(self):
+        self.add_opinion([self.game_1, self.game_2], 3)
+        self.add_opinion([self.game_2], 8)
+        aggregates = self.get_aggregates()
+        self.assertEqual(
+            aggregates,
+            (
+                {self.game_1.id: (3, 1), self.game_2.id: (11, 2)},
+                {"Tag1": (11, 2), "Tag2": (11, 2)},
+            ),
+        )
+        GameFeedback.objects.all().delete()
+
+        out = StringIO()
+        call_command("aggregate_opinions", stdout=out)
+        self.assertIn("Aggregated opinions of 2 games and 2 tags", out.getvalue())
+        self.assertEqual(self.get_aggregates(), aggregates)
+
+    def test_find_games_similar_to_selected_boosts_well_rated_games(self):
+        self.add_opinion([self.game_3], 10)
+        self.add_opinion([self.game_2], 1)
+        with self.settings(RECOMMENDATION_FEEDBACK_WEIGHT=0):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id], ["Tag1", "Tag2"], [], limit=2
+            )
+        self.assertEqual(list(result), [self.game_2, self.game_3])
+        with self.settings(RECOMMENDATION_FEEDBACK_WEIGHT=0.5):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id], ["Tag1", "Tag2"], [], limit=2
+            )
+        self.assertEqual(list(result), [self.game_3, self.game_2])
@@ -0,0 +1,330 @@
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from polecacz.models import Game, ImportCheckpoint, ImportRetry
+from test.factories.game import GameFactory
+
+
+def prepare_game_info(game_id: str, **kwargs) -> dict:
+    game_info = {
+        "id": game_id,
+        "rank": "1",
+        "average": "8.5",
+        "thumbnail": f"https://url{game_id}.jpg",
+        "game_name": f"Game{game_id}",
+        "year_published": "2021",
+        "min_players": "1",
+        "max_players": "4",
+        "playing_time": "120",
+        "artist": "artist",
+        "designer": "designer",
+        "categories": ["Przygodowa"],
+        "mechanics": ["Współpraca"],
+    }
+    game_info.update(kwargs)
+    return game_info
+
+
+class FakeBGGApiWrapper:
+    """
+    Serves games prepared in test instead of data from BGG
+    """
+
+    games = []
+    requested = []
+    received = []
+
+    def __init__(self, **kwargs):
+        self.dump_date = "2022-09-01"
+        self.pipeline_counters = {}
+
+    def get_connection_stats(self):
+        return {"requests": 0, "new_connections": 0, "reused_connections": 0}
+
+    def get_games_info_from_dump(self, number_of_games: int = None):
+        return iter(
+            [
+                {key: game[key] for key in ("id", "rank", "average", "thumbnail")}
+                for game in self.games
+            ]
+        )
+
+    def iterate_data_to_import_to_database(self, games_info):
+        prepared_games = {game["id"]: game for game in self.games}
+        for game_info in games_info:
+            self.requested.append(game_info["id"])
+            self.received.append(dict(game_info))
+            prepared_game = prepared_games[game_info["id"]]
+            if "error" in prepared_game:
+                yield {
+                    **game_info,
+                    "game_id": game_info["id"],
+                    "error": prepared_game["error"],
+                }
+            else:
+                yield {**game_info, **prepared_game}
+
+
+class ImportDataToDatabaseTestCase(TestCase):
+    def setUp(self) -> None:
+        FakeBGGApiWrapper.games = []
+        FakeBGGApiWrapper.requested = []
+        FakeBGGApiWrapper.received = []
+        patcher = patch(
+            "polecacz.management.commands.import_data_to_database.BGGApiWrapper",
+            FakeBGGApiWrapper,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ImportDataToDatabaseTest(ImportDataToDatabaseTestCase):
+    def test_import_creates_and_updates_games(self):
+        existing_game = GameFactory(game_id="1", tags=["Przygodowa", "Old tag"])
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1", rank="5"),
+            prepare_game_info("2"),
+        ]
+        out = StringIO()
+        call_command("import_data_to_database", stdout=out)
+
+        self.assertIn("Processed 2 games", out.getvalue())
+        self.assertIn("write: 2 games", out.getvalue())
+        self.assertIn("connections: 0 requests", out.getvalue())
+        existing_game.refresh_from_db()
+        self.assertEqual(existing_game.rank, 5)
+        self.assertEqual(
+            sorted(existing_game.tags.names()), ["Przygodowa", "Współpraca"]
+        )
+        self.assertEqual(Game.objects.get(game_id="2").name, "Game2")
+
+    def test_bulk_import_creates_and_updates_games(self):
+        existing_game = GameFactory(game_id="1", tags=["Przygodowa", "Old tag"])
+        unchanged_game = GameFactory(game_id="3", tags=["Przygodowa"])
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1", rank="5"),
+            prepare_game_info("2"),
+            prepare_game_info(
+                "3",
+                rank=str(unchanged_game.rank),
+                average=str(unchanged_game.rating),
+                thumbnail=unchanged_game.thumbnail,
+                game_name=unchanged_game.name,
+                year_published=unchanged_game.year_published,
+                playing_time=str(unchanged_game.playing_time),
+                mechanics=[],
+            ),
+            prepare_game_info("4", min_players="wrong value"),
+        ]
+        out = StringIO()
+        call_command("import_data_to_database", "--bulk", stdout=out)
+
+        self.assertIn("Processed 3 games", out.getvalue())
+        self.assertIn("There was a problem with game", out.getvalue())
+        existing_game.refresh_from_db()
+        self.assertEqual(existing_game.rank, 5)
+        self.assertEqual(
+            sorted(existing_game.tags.names()), ["Przygodowa", "Współpraca"]
+        )
+        new_game = Game.objects.get(game_id="2")
+        self.assertEqual(new_game.name, "Game2")
+        self.assertEqual(sorted(new_game.tags.names()), ["Przygodowa", "Współpraca"])
+        self.assertEqual(list(unchanged_game.tags.names()), ["Przygodowa"])
+        self.assertFalse(Game.objects.filter(game_id="4").exists())
+
+    def test_bulk_import_uses_constant_number_of_queries(self):
+        def count_queries(number_of_games: int) -> int:
+            FakeBGGApiWrapper.games = [
+                prepare_game_info(str(game_id), rank=str(number_of_games))
+                for game_id in range(number_of_games)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                call_command("import_data_to_database", "--bulk", stdout=StringIO())
+            return len(context.captured_queries)
+
+        count_queries(5)
+        self.assertEqual(count_queries(10), count_queries(50))
+
+
+class IncrementalImportDataToDatabaseTest(ImportDataToDatabaseTestCase):
+    def test_incremental_import_fetches_only_new_and_stale_games(self):
+        fresh_game = GameFactory(
+            game_id="1",
+            rank=1,
+            rating=8.0,
+            thumbnail="https://url1.jpg",
+            details_updated_at=timezone.now(),
+        )
+        stale_game = GameFactory(
+            game_id="2",
+            details_updated_at=timezone.now() - datetime.timedelta(days=40),
+        )
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1", rank="3", average="8.1"),
+            prepare_game_info("2", rank="2"),
+            prepare_game_info("3", rank="4"),
+        ]
+        out = StringIO()
+        call_command("import_data_to_database", "--incremental", "--bulk", stdout=out)
+
+        self.assertEqual(FakeBGGApiWrapper.requested, ["2", "3"])
+        self.assertIn(
+            "Skipped 1 games (1 with updated ranking), refreshed 1 games, new 1 games",
+            out.getvalue(),
+        )
+        fresh_game.refresh_from_db()
+        self.assertEqual(fresh_game.rank, 3)
+        self.assertEqual(fresh_game.rating, 8.1)
+        stale_game.refresh_from_db()
+        self.assertEqual(stale_game.rank, 2)
+        self.assertGreater(
+            stale_game.details_updated_at,
+            timezone.now() - datetime.timedelta(minutes=1),
+        )
+        self.assertIsNotNone(Game.objects.get(game_id="3").details_updated_at)
+
+    def test_incremental_import_keeps_thumbnail_from_api(self):
+        fresh_games = [
+            GameFactory(
+                game_id=game_id,
+                rank=1,
+                rating=8.5,
+                thumbnail=f"https://cf.geekdo-images.com/{game_id}.jpg",
+                details_updated_at=timezone.now(),
+            )
+            for game_id in ("1", "2", "3")
+        ]
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1"),
+            prepare_game_info("2"),
+            prepare_game_info("3", rank="2"),
+        ]
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "import_data_to_database",
+                "--incremental",
+                "--chunk-size",
+                "2",
+                stdout=out,
+            )
+
+        self.assertEqual(FakeBGGApiWrapper.requested, [])
+        self.assertIn(
+            "Skipped 3 games (1 with updated ranking)",
+            out.getvalue(),
+        )
+        for game in fresh_games:
+            thumbnail = game.thumbnail
+            game.refresh_from_db()
+            self.assertEqual(game.thumbnail, thumbnail)
+        self.assertEqual(fresh_games[2].rank, 2)
+        game_queries = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('SELECT "polecacz_game"')
+        ]
+        self.assertEqual(len(game_queries), 2)
+
+    def test_incremental_import_respects_max_age(self):
+        GameFactory(
+            game_id="1", details_updated_at=timezone.now() - datetime.timedelta(days=3)
+        )
+        FakeBGGApiWrapper.games = [prepare_game_info("1")]
+        call_command(
+            "import_data_to_database",
+            "--incremental",
+            "--max-age",
+            "2",
+            stdout=StringIO(),
+        )
+        self.assertEqual(FakeBGGApiWrapper.requested, ["1"])
+
+
+class ResumableImportDataToDatabaseTest(ImportDataToDatabaseTestCase):
+    def test_import_moves_checkpoint_after_every_chunk(self):
+        FakeBGGApiWrapper.games = [prepare_game_info(str(i)) for i in range(1, 6)]
+        games = FakeBGGApiWrapper.iterate_data_to_import_to_database
+
+        def failing_iterate(wrapper, games_info):
+            for number, game_info in enumerate(games(wrapper, games_info)):
+                if number == 3:
+                    raise ConnectionError
+                yield game_info
+
+        with patch.object(
+            FakeBGGApiWrapper, "iterate_data_to_import_to_database", failing_iterate
+        ):
+            with self.assertRaises(ConnectionError):
+                call_command(
+                    "import_data_to_database", "--chunk-size", "2", stdout=StringIO()
+                )
+
+        checkpoint = ImportCheckpoint.objects.get(dump_date="2022-09-01")
+        self.assertEqual(checkpoint.last_row, 2)
+        self.assertFalse(checkpoint.finished)
+        self.assertEqual(Game.objects.count(), 2)
+
+        FakeBGGApiWrapper.requested = []
+        out = StringIO()
+        call_command(
+            "import_data_to_database", "--resume", "--chunk-size", "2", stdout=out
+        )
+        self.assertIn("Resuming import from row 3", out.getvalue())
+        self.assertEqual(FakeBGGApiWrapper.requested, ["3", "4", "5"])
+        self.assertEqual(Game.objects.count(), 5)
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.last_row, 5)
+        self.assertTrue(checkpoint.finished)
+
+    def test_import_without_resume_starts_from_beginning(self):
+        ImportCheckpoint.objects.create(dump_date="2022-09-01", last_row=1)
+        FakeBGGApiWrapper.games = [prepare_game_info("1"), prepare_game_info("2")]
+        call_command("import_data_to_database", stdout=StringIO())
+        self.assertEqual(FakeBGGApiWrapper.requested, ["1", "2"])
+
+    def test_failed_games_are_added_to_retry_queue(self):
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1"),
+            {**prepare_game_info("2"), "error": b"Not Found"},
+        ]
+        out = StringIO()
+        call_command("import_data_to_database", stdout=out)
+        self.assertIn("they were added to retry queue", out.getvalue())
+        retry = ImportRetry.objects.get(game_id="2")
+        self.assertEqual(retry.error, "Not Found")
+        self.assertEqual(retry.game_info["rank"], "1")
+
+        call_command("import_data_to_database", "--retry", stdout=StringIO())
+        retry.refresh_from_db()
+        self.assertEqual(retry.attempts, 2)
+
+        FakeBGGApiWrapper.games = [prepare_game_info("2")]
+        FakeBGGApiWrapper.requested = []
+        call_command("import_data_to_database", "--retry", stdout=StringIO())
+        self.assertEqual(FakeBGGApiWrapper.requested, ["2"])
+        self.assertFalse(ImportRetry.objects.exists())
+        self.assertTrue(Game.objects.filter(game_id="2").exists())
+
+    def test_retry_uses_whole_dump_row(self):
+        FakeBGGApiWrapper.games = [
+            prepare_game_info("1"),
+            {**prepare_game_info("2", rank="7", average="6.5"), "error": b"Not Found"},
+        ]
+        call_command("import_data_to_database", stdout=StringIO())
+        dump_row = FakeBGGApiWrapper.received[1]
+        self.assertEqual(ImportRetry.objects.get(game_id="2").game_info, dump_row)
+
+        FakeBGGApiWrapper.games = [prepare_game_info("2", rank="7", average="6.5")]
+        FakeBGGApiWrapper.received = []
+        call_command("import_data_to_database", "--retry", stdout=StringIO())
+        self.assertEqual(FakeBGGApiWrapper.received, [dump_row])
+        game = Game.objects.get(game_id="2")
+        self.assertEqual((game.rank, game.rating), (7, 6.5))
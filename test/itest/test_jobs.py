@@ -0,0 +1,114 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from polecacz.models import OwnedGames, Recommendation
+from polecacz.recommendations.jobs import (
+    compute_recommendation,
+    process_pending_recommendations,
+    requeue_stale_recommendations,
+)
+from polecacz.service import RecommendationService
+from test.factories.game import GameFactory
+
+
+class RecommendationJobsTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="user", password="password")
+        self.game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        self.game_2 = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        self.game_3 = GameFactory(tags=["Tag1"], rating=7.0)
+
+    def create_pending_recommendation(self) -> Recommendation:
+        recommendation = Recommendation.objects.create(
+            user=self.user, status=Recommendation.Status.PENDING
+        )
+        recommendation.selected_games.add(self.game_1)
+        return recommendation
+
+    def test_compute_recommendation_excludes_owned_games(self):
+        OwnedGames.objects.create(user=self.user).owned_games.add(self.game_2)
+        recommendation = self.create_pending_recommendation()
+
+        self.assertTrue(compute_recommendation(recommendation.id))
+        recommendation.refresh_from_db()
+        self.assertEqual(recommendation.status, Recommendation.Status.DONE)
+        self.assertEqual(list(recommendation.recommended_games.all()), [self.game_3])
+
+    def test_compute_recommendation_computes_recommendation_once(self):
+        recommendation = self.create_pending_recommendation()
+        self.assertTrue(compute_recommendation(recommendation.id))
+        self.assertFalse(compute_recommendation(recommendation.id))
+        self.assertEqual(recommendation.recommended_games.count(), 2)
+
+    @patch("polecacz.recommendations.jobs.RecommendationService.add_recommended_games")
+    def test_compute_recommendation_marks_failed_recommendation(
+        self, mocked_add_recommended_games
+    ):
+        mocked_add_recommended_games.side_effect = ValueError
+        recommendation = self.create_pending_recommendation()
+        self.assertTrue(compute_recommendation(recommendation.id))
+        recommendation.refresh_from_db()
+        self.assertEqual(recommendation.status, Recommendation.Status.FAILED)
+
+    def test_process_pending_recommendations_respects_limit(self):
+        for _ in range(3):
+            self.create_pending_recommendation()
+        self.assertEqual(process_pending_recommendations(limit=2), 2)
+        self.assertEqual(
+            Recommendation.objects.filter(status=Recommendation.Status.PENDING).count(),
+            1,
+        )
+
+    def test_process_pending_recommendations_requeues_stale_claims(self):
+        stale = self.create_pending_recommendation()
+        running = self.create_pending_recommendation()
+        Recommendation.objects.filter(id=stale.id).update(
+            status=Recommendation.Status.RUNNING,
+            claimed_at=timezone.now() - datetime.timedelta(seconds=301),
+        )
+        Recommendation.objects.filter(id=running.id).update(
+            status=Recommendation.Status.RUNNING, claimed_at=timezone.now()
+        )
+
+        self.assertEqual(process_pending_recommendations(), 1)
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, Recommendation.Status.DONE)
+        self.assertEqual(stale.recommended_games.count(), 2)
+        self.assertEqual(running.status, Recommendation.Status.RUNNING)
+        self.assertEqual(running.recommended_games.count(), 0)
+
+    def test_requeue_stale_recommendations_uses_timeout(self):
+        recommendation = self.create_pending_recommendation()
+        Recommendation.objects.filter(id=recommendation.id).update(
+            status=Recommendation.Status.RUNNING,
+            claimed_at=timezone.now() - datetime.timedelta(seconds=10),
+        )
+        self.assertEqual(requeue_stale_recommendations(timeout=60), 0)
+        self.assertEqual(requeue_stale_recommendations(timeout=5), 1)
+        recommendation.refresh_from_db()
+        self.assertEqual(recommendation.status, Recommendation.Status.PENDING)
+        self.assertIsNone(recommendation.claimed_at)
+
+    def test_compute_recommendation_discards_result_of_lost_claim(self):
+        recommendation = self.create_pending_recommendation()
+        add_recommended_games = RecommendationService.add_recommended_games
+
+        def requeue_and_claim(*args):
+            add_recommended_games(*args)
+            requeue_stale_recommendations(timeout=-1)
+            Recommendation.objects.filter(id=recommendation.id).update(
+                status=Recommendation.Status.RUNNING, claimed_at=timezone.now()
+            )
+
+        with patch(
+            "polecacz.recommendations.jobs.RecommendationService.add_recommended_games",
+            side_effect=requeue_and_claim,
+        ):
+            self.assertFalse(compute_recommendation(recommendation.id))
+        recommendation.refresh_from_db()
+        self.assertEqual(recommendation.recommended_games.count(), 0)
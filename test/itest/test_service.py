@@ -1,10 +1,18 @@
+import threading
 import uuid
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.http import Http404
-from django.test import TestCase
-
-from polecacz.models import SelectedGames, Recommendation, OwnedGames, ImageMetadata
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from polecacz.models import SelectedGames, Recommendation, OwnedGames, ImageMetadata, GameNeighbour, \
+    RecommendedGame, GameCooccurrence
+from polecacz.recommendations.breakdown import make_breakdown
+from polecacz.recommendations.result_cache import RESULT_VERSION_KEY, RecommendationCache
+from polecacz.recommendations.tag_index import INDEX_VERSION_KEY, get_data_versions, invalidate_tag_index
+from polecacz.recommendations.tag_weights import TAG_WEIGHTS_VERSION_KEY, WEIGHT_SCALE, get_tag_weights
 from polecacz.service import GameService, SelectedGamesService, RecommendationService, OwnedGamesService, \
     ImageMetadataService
 from test.factories.game import GameFactory
@@ -63,6 +71,11 @@ class TestGameService(TestCase):
         result = GameService.get_tag_names_list_from_game(self.game_1)
         self.assertListEqual(sorted(result), ['Tag1', 'Tag2', 'Tag3'])
 
+    def test_get_tag_names_list_from_games(self):
+        with self.assertNumQueries(1):
+            result = GameService.get_tag_names_list_from_games([self.game_1.id, self.game_2.id])
+        self.assertListEqual(sorted(result), ['Tag1', 'Tag2', 'Tag3'])
+
     def test_find_most_similar_games_ideal_order(self):
         game_3 = GameFactory(tags=["Tag1"], rating=8.0)
         tags = ["Tag1", "Tag2", "Tag3", "Tag4"]
@@ -93,6 +106,290 @@ class TestGameService(TestCase):
         expected = [self.game_1, self.game_2]
         self.assertEqual(list(result), expected)
 
+    def test_find_most_similar_games_same_order_in_all_backends(self):
+        game_3 = GameFactory(tags=["Tag1", "Tag2", "Tag4"], rating=8.0)
+        GameFactory(tags=["Tag5"], rating=9.5)
+        tags = ["Tag1", "Tag2", "Tag3", "Tag4"]
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                result = GameService.find_most_similar_games(tags, [self.game_2.id], limit=10)
+                self.assertEqual(list(result), [self.game_1, game_3])
+                result = GameService.find_most_similar_games(tags, limit=1)
+                self.assertEqual(list(result), [self.game_1])
+
+    def test_find_most_similar_games_sparse_backend_uses_metric(self):
+        game_3 = GameFactory(tags=["Tag1"], rating=8.0)
+        with self.settings(RECOMMENDATION_BACKEND="sparse", RECOMMENDATION_METRIC="jaccard"):
+            result = GameService.find_most_similar_games(["Tag1"])
+        self.assertEqual(result, [game_3, self.game_2, self.game_1])
+
+    def test_find_most_similar_games_weighted_with_idf_in_all_backends(self):
+        game_3 = GameFactory(tags=["Tag3", "Tag4"], rating=1.0)
+        GameFactory(tags=["Tag1"], rating=5.0)
+        tags = ["Tag1", "Tag2", "Tag4"]
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(
+                RECOMMENDATION_BACKEND=backend, RECOMMENDATION_WEIGHTING="idf"
+            ):
+                result = GameService.find_most_similar_games(tags, limit=3)
+                self.assertEqual(list(result), [self.game_1, self.game_2, game_3])
+
+    def test_find_most_similar_games_weighted_with_idf_shows_unscaled_scores(self):
+        tags = ["Tag1", "Tag3"]
+        weights = {tag_name: weight / WEIGHT_SCALE for tag_name, weight in get_tag_weights().get_weights(tags).items()}
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(
+                RECOMMENDATION_BACKEND=backend, RECOMMENDATION_WEIGHTING="idf"
+            ):
+                result = list(GameService.find_most_similar_games(tags, limit=2))
+                self.assertAlmostEqual(result[0].score, weights["Tag1"] + weights["Tag3"])
+                self.assertEqual(result[0].breakdown, make_breakdown(weights))
+                self.assertAlmostEqual(result[1].score, weights["Tag1"])
+
+    def test_find_most_similar_games_excludes_ids_given_as_text(self):
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                result = GameService.find_most_similar_games(["Tag1", "Tag2"], [str(self.game_1.id)])
+                self.assertEqual(list(result), [self.game_2])
+
+    def test_find_most_similar_games_with_constraints_in_all_backends(self):
+        game_3 = GameFactory(
+            tags=["Tag1", "Tag2"], rating=8.0, min_players=2, max_players=2, playing_time=30, year_published="1995"
+        )
+        game_4 = GameFactory(
+            tags=["Tag1"], rating=7.0, min_players=1, max_players=6, playing_time=45, year_published="995"
+        )
+        tags = ["Tag1", "Tag2", "Tag3"]
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                result = GameService.find_most_similar_games(tags, constraints={"players": 2, "max_playing_time": 60})
+                self.assertEqual(list(result), [game_3, game_4])
+                result = GameService.find_most_similar_games(tags, constraints={"players": 5})
+                self.assertEqual(list(result), [game_4])
+                result = GameService.find_most_similar_games(tags, constraints={"year_to": 2000})
+                self.assertEqual(list(result), [game_3])
+                result = GameService.find_most_similar_games(tags, constraints={"year_from": 1000, "year_to": 2021})
+                self.assertEqual(list(result), [game_3])
+                result = GameService.find_most_similar_games(tags, [game_3.id], constraints={"players": 2})
+                self.assertEqual(list(result), [self.game_1, self.game_2, game_4])
+
+    def test_find_most_similar_games_with_constraints_in_memory_does_not_query_all_games(self):
+        GameFactory(tags=["Tag1"], rating=8.0, min_players=2, max_players=2)
+        for backend in ("index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                GameService.find_most_similar_games(["Tag1"])
+                with self.assertNumQueries(1):
+                    result = GameService.find_most_similar_games(["Tag1"], constraints={"players": 5})
+                self.assertEqual(result, [])
+
+    def test_find_games_similar_to_selected_with_constraints(self):
+        game_3 = GameFactory(tags=["Tag4"], rating=1.0, max_players=2)
+        game_4 = GameFactory(tags=["Tag1"], rating=2.0, max_players=6)
+        GameNeighbour.objects.bulk_create(
+            [
+                GameNeighbour(game=self.game_1, neighbour=game_3, score=2),
+                GameNeighbour(game=self.game_1, neighbour=game_4, score=1),
+            ]
+        )
+        GameCooccurrence.objects.create(game=self.game_1, other_game=game_3, counter=5)
+        constraints = {"players": 5}
+        for backend_settings in (
+            {"RECOMMENDATION_BACKEND": "neighbours"},
+            {"RECOMMENDATION_BACKEND": "index", "RECOMMENDATION_COOCCURRENCE_WEIGHT": 1.0},
+        ):
+            with self.subTest(**backend_settings), self.settings(**backend_settings):
+                result = GameService.find_games_similar_to_selected(
+                    [self.game_1.id], ["Tag1", "Tag2", "Tag3"], [], constraints=constraints
+                )
+                self.assertEqual(result, [game_4])
+                result = GameService.find_games_similar_to_selected([self.game_1.id], ["Tag1", "Tag2", "Tag3"], [])
+                self.assertIn(game_3, result)
+
+    def test_find_most_similar_games_breakdown_in_all_backends(self):
+        GameFactory(tags=["Tag1"], rating=8.0)
+        tags = ["Tag1", "Tag3"]
+        for backend in ("sql", "index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                result = list(GameService.find_most_similar_games(tags, limit=2))
+                self.assertEqual(result[0].breakdown, {"tags": {"Tag1": 1, "Tag3": 1}})
+                self.assertEqual(result[1].breakdown, {"tags": {"Tag1": 1}})
+            with self.subTest(backend=backend, weighting="idf"), self.settings(
+                RECOMMENDATION_BACKEND=backend, RECOMMENDATION_WEIGHTING="idf"
+            ):
+                for game in GameService.find_most_similar_games(tags, limit=3):
+                    self.assertAlmostEqual(sum(game.breakdown["tags"].values()), game.score)
+
+    def test_find_games_similar_to_selected_blended_breakdown(self):
+        game_3 = GameFactory(tags=["Tag4"], rating=1.0)
+        GameCooccurrence.objects.create(game=self.game_1, other_game=game_3, counter=2)
+        with self.settings(RECOMMENDATION_BACKEND="index", RECOMMENDATION_COOCCURRENCE_WEIGHT=0.5):
+            result = GameService.find_games_similar_to_selected([self.game_1.id], ["Tag1", "Tag2", "Tag3"], [])
+        self.assertEqual(result, [self.game_2, game_3])
+        self.assertEqual(result[0].breakdown, {"tags": {"Tag1": 0.5, "Tag2": 0.5}})
+        self.assertEqual(result[1].breakdown, {"tags": {}, "cooccurrence": 0.5})
+
+    def test_find_games_similar_to_selected_blends_scores_of_selected_backend(self):
+        game_3 = GameFactory(tags=["Tag4"], rating=1.0)
+        game_4 = GameFactory(tags=["Tag1"], rating=2.0)
+        GameCooccurrence.objects.create(game=self.game_1, other_game=game_3, counter=2)
+        tags = ["Tag1", "Tag2", "Tag3"]
+        with self.settings(
+            RECOMMENDATION_BACKEND="sparse", RECOMMENDATION_METRIC="cosine", RECOMMENDATION_COOCCURRENCE_WEIGHT=0.5
+        ):
+            tag_scores = {game.id: game.score for game in GameService.find_most_similar_games(tags, [self.game_1.id])}
+            result = GameService.find_games_similar_to_selected([self.game_1.id], tags, [])
+        self.assertEqual(result, [self.game_2, game_4, game_3])
+        max_tag_score = max(tag_scores.values())
+        for game in result:
+            self.assertAlmostEqual(
+                sum(game.breakdown["tags"].values()), tag_scores.get(game.id, 0) / max_tag_score, places=3
+            )
+
+    def test_tag_weights_refreshed_only_when_tag_distribution_changes(self):
+        weights = get_tag_weights()
+        self.assertEqual(weights.number_of_games, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game_1.rating = 1.0
+            self.game_1.save()
+        self.assertIs(get_tag_weights(), weights)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game_2.tags.add("Tag3")
+        self.assertLess(get_tag_weights().weights["Tag3"], weights.weights["Tag3"])
+
+    def test_find_games_similar_to_selected_merges_neighbours(self):
+        game_3 = GameFactory(tags=["Tag4"], rating=1.0)
+        game_4 = GameFactory(tags=["Tag5"], rating=2.0)
+        game_5 = GameFactory(tags=["Tag6"], rating=3.0)
+        GameNeighbour.objects.bulk_create(
+            [
+                GameNeighbour(game=self.game_1, neighbour=self.game_2, score=2),
+                GameNeighbour(game=self.game_1, neighbour=game_3, score=1),
+                GameNeighbour(game=self.game_1, neighbour=game_5, score=1),
+                GameNeighbour(game=game_4, neighbour=game_3, score=1),
+                GameNeighbour(game=game_4, neighbour=self.game_1, score=3),
+            ]
+        )
+        get_data_versions([INDEX_VERSION_KEY, RESULT_VERSION_KEY])
+        RecommendationCache().reset_stats()
+        with self.settings(RECOMMENDATION_BACKEND="neighbours"):
+            with self.assertNumQueries(4):
+                result = GameService.find_games_similar_to_selected(
+                    [self.game_1.id, game_4.id], [], [self.game_2.id]
+                )
+            self.assertEqual(result, [game_3, game_5])
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id, game_4.id], [], [], limit=1
+            )
+            self.assertEqual(result, [self.game_2])
+
+    def test_find_games_similar_to_selected_without_neighbours_uses_tags(self):
+        game_3 = GameFactory(tags=["Tag2"], rating=1.0)
+        GameNeighbour.objects.create(game=game_3, neighbour=self.game_2, score=1)
+        with self.settings(RECOMMENDATION_BACKEND="neighbours"):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_2.id, game_3.id], ["Tag1", "Tag2"], []
+            )
+        self.assertEqual(list(result), [self.game_1])
+
+    def test_find_games_similar_to_selected_uses_cache(self):
+        game_3 = GameFactory(tags=["Tag1"], rating=1.0)
+        RecommendationCache().reset_stats()
+        result = GameService.find_games_similar_to_selected(
+            [self.game_1.id], ["Tag1", "Tag2", "Tag3"], [game_3.id]
+        )
+        self.assertEqual(result, [self.game_2])
+        with self.assertNumQueries(2):
+            result = GameService.find_games_similar_to_selected(
+                [self.game_1.id], ["Tag1", "Tag2", "Tag3"], [game_3.id]
+            )
+        self.assertEqual(result, [self.game_2])
+        self.assertEqual(result[0].score, 2)
+        self.assertEqual(result[0].breakdown, {"tags": {"Tag1": 1, "Tag2": 1}})
+        self.assertEqual(RecommendationCache().get_stats()["hits"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game_4 = GameFactory(tags=["Tag1", "Tag2", "Tag3"], rating=2.0)
+        result = GameService.find_games_similar_to_selected(
+            [self.game_1.id], ["Tag1", "Tag2", "Tag3"], [game_3.id]
+        )
+        self.assertEqual(result, [game_4, self.game_2])
+        self.assertEqual(RecommendationCache().get_stats()["misses"], 2)
+
+    def test_find_games_similar_to_selected_reranks_for_diversity(self):
+        clone = GameFactory(tags=["Tag1", "Tag2"], rating=8.0)
+        other_game = GameFactory(tags=["Tag3", "Tag4"], rating=7.0)
+        tags = ["Tag1", "Tag2", "Tag3"]
+        result = GameService.find_games_similar_to_selected([self.game_1.id], tags, [], limit=2)
+        self.assertEqual(result, [self.game_2, clone])
+        with self.settings(RECOMMENDATION_DIVERSITY=0.5):
+            result = GameService.find_games_similar_to_selected([self.game_1.id], tags, [], limit=2)
+        self.assertEqual(result, [self.game_2, other_game])
+
+    def test_find_most_similar_games_rebuilds_in_memory_backends_after_change(self):
+        tags = ["Tag3", "Tag4"]
+        for backend in ("index", "sparse"):
+            with self.subTest(backend=backend), self.settings(RECOMMENDATION_BACKEND=backend):
+                self.assertEqual(GameService.find_most_similar_games(tags), [self.game_1])
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.game_2.tags.add("Tag4")
+                    game_3 = GameFactory(tags=["Tag3", "Tag4"], rating=1.0)
+                result = GameService.find_most_similar_games(tags)
+                self.assertEqual(result, [game_3, self.game_1, self.game_2])
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.game_1.tags.remove("Tag3")
+                    self.game_2.tags.remove("Tag4")
+                    self.game_1.tags.add("Tag3")
+                    game_3.delete()
+
+    def test_changes_of_games_in_transaction_bump_every_data_version_once(self):
+        versions = get_data_versions([INDEX_VERSION_KEY, TAG_WEIGHTS_VERSION_KEY])
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                game_3 = GameFactory(tags=["Tag1", "Tag2", "Tag3", "Tag4"], rating=1.0)
+                game_3.save()
+                game_3.tags.set(["Tag1", "Tag5"])
+        writes = [
+            query["sql"] for query in queries
+            if "polecacz_dataversion" in query["sql"] and not query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(len(writes), 2)
+        new_versions = get_data_versions([INDEX_VERSION_KEY, TAG_WEIGHTS_VERSION_KEY])
+        self.assertNotEqual(versions[0], new_versions[0])
+        self.assertNotEqual(versions[1], new_versions[1])
+
+
+class TestGameServiceInvalidation(TransactionTestCase):
+    def run_in_other_process(self, function):
+        """
+        Runs function with separate database connection and separate local memory cache, like import command
+        running in other process than web server
+        """
+        def target():
+            other_cache = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "other"}}
+            try:
+                with self.settings(CACHES=other_cache):
+                    function()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+    def test_index_backend_returns_games_added_by_other_process(self):
+        game_1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.0)
+        with self.settings(RECOMMENDATION_BACKEND="index"):
+            self.assertEqual(list(GameService.find_most_similar_games(["Tag1", "Tag2"])), [game_1])
+            created_games = []
+
+            def import_game():
+                created_games.append(GameFactory(tags=["Tag1", "Tag2"], rating=8.0))
+                invalidate_tag_index()
+
+            self.run_in_other_process(import_game)
+            result = GameService.find_most_similar_games(["Tag1", "Tag2"])
+        self.assertEqual(list(result), [game_1, *created_games])
+
 
 class TestSelectedGamesService(TestCase):
 
@@ -212,6 +509,33 @@ class TestRecommendationService(TestCase):
         self.assertTrue(self.game_2 in result)
         self.assertEqual(len(result), 2)
 
+    def test_get_recommended_games_in_recommended_order(self):
+        recommendation = Recommendation.objects.create(user=self.user)
+        RecommendedGame.objects.bulk_create([
+            RecommendedGame(recommendation=recommendation, game=self.game_3, rank=1, score=3.0),
+            RecommendedGame(recommendation=recommendation, game=self.game_1, rank=2, score=1.5),
+        ])
+        with self.assertNumQueries(1):
+            result = RecommendationService.get_recommended_games(recommendation.id)
+
+        self.assertEqual(result, [self.game_3, self.game_1])
+        self.assertEqual([game.score for game in result], [3.0, 1.5])
+
+    def test_add_recommended_games_stores_ranks_and_scores(self):
+        recommendation = Recommendation.objects.create(user=self.user)
+        with self.settings(RECOMMENDATION_BACKEND="index"):
+            result = RecommendationService.add_recommended_games(recommendation, [self.game_1.id], [])
+
+        self.assertEqual(result, [self.game_2, self.game_3])
+        self.assertEqual(
+            list(RecommendedGame.objects.filter(recommendation=recommendation).values_list("game", "rank", "score")),
+            [(self.game_2.id, 1, 2.0), (self.game_3.id, 2, 2.0)],
+        )
+        self.assertEqual(
+            RecommendedGame.objects.get(recommendation=recommendation, game=self.game_2).breakdown,
+            {"tags": {"Tag1": 1, "Tag2": 1}},
+        )
+
     def test_get_recommended_games_does_not_exist(self):
         result = RecommendationService.get_recommended_games('3bb078e5-4a40-44dd-b53c-37a693353cfd')
 
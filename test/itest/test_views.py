@@ -1,14 +1,19 @@
 from http import HTTPStatus
+from io import StringIO
 from unittest.mock import patch, ANY
 
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from polecacz.models import SelectedGames, Recommendation, Opinion, OwnedGames, ImageMetadata
+from polecacz.models import SelectedGames, Recommendation, Opinion, OwnedGames, ImageMetadata, TagFeedback, RecommendedGame
+from polecacz.recommendations.jobs import run_recommendation_job
 from polecacz.validators import TooBigFileException
 from test.factories.game import GameFactory
 
@@ -679,6 +684,58 @@ class RecommendationDetailViewTest(TestCase):
         self.assertEqual(response.context["opinion_created"], False)
         self.assertEqual(response.context["id"], recommendation.id)
 
+    def test_recommendation_detail_shows_score_breakdown(self):
+        recommendation = Recommendation.objects.create(user=self.user)
+        game = GameFactory(tags=["Tag1", "Tag2"])
+        RecommendedGame.objects.create(
+            recommendation=recommendation,
+            game=game,
+            rank=1,
+            score=2.5,
+            breakdown={"tags": {"Worker Placement": 1.5, "Economic": 1.0}, "cooccurrence": 0.25},
+        )
+        with self.assertNumQueries(9):
+            response = self.client.get(f"/polecacz/recommendation/{recommendation.id}/")
+        self.assertContains(response, "Worker Placement (+1,50), Economic (+1,00)")
+        self.assertContains(response, "Często wybierana razem z wybranymi grami: </strong>+0,25")
+        self.assertNotContains(response, "Podobieństwo do wybranych gier")
+
+    def test_recommendation_detail_waits_for_pending_recommendation(self):
+        recommendation = Recommendation.objects.create(
+            user=self.user, status=Recommendation.Status.PENDING
+        )
+        response = self.client.get(f"/polecacz/recommendation/{recommendation.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Rekomendacja jest przygotowywana")
+        self.assertContains(response, f"/polecacz/recommendation/{recommendation.id}/status/")
+        self.assertNotContains(response, "Zostaw proszę")
+
+
+class RecommendationStatusViewTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username="testuser")
+        self.user.set_password("12345")
+        self.user.save()
+        self.client.login(username="testuser", password="12345")
+
+    def test_recommendation_status(self):
+        recommendation = Recommendation.objects.create(
+            user=self.user, status=Recommendation.Status.RUNNING
+        )
+        response = self.client.get(f"/polecacz/recommendation/{recommendation.id}/status/")
+        self.assertEqual(response.json()["data"], {"status": "running", "finished": False})
+
+        recommendation.status = Recommendation.Status.DONE
+        recommendation.save()
+        response = self.client.get(f"/polecacz/recommendation/{recommendation.id}/status/")
+        self.assertEqual(response.json()["data"], {"status": "done", "finished": True})
+
+    def test_recommendation_status_of_other_user_returns_404(self):
+        other_user = User.objects.create(username="otheruser")
+        recommendation = Recommendation.objects.create(user=other_user)
+        response = self.client.get(f"/polecacz/recommendation/{recommendation.id}/status/")
+        self.assertEqual(response.status_code, 404)
+
 
 class OpinionFormViewTest(TestCase):
     def setUp(self) -> None:
@@ -718,6 +775,21 @@ class OpinionCreateViewTest(TestCase):
         self.assertEqual(opinion.rating, 2)
         self.assertEqual(opinion.user, self.user)
 
+    def test_opinion_create_view_aggregates_rating_of_recommended_games(self):
+        game = GameFactory(tags=["Tag1"])
+        recommendation = Recommendation.objects.create(user=self.user)
+        recommendation.recommended_games.add(game)
+        for rating in (2, 9):
+            self.client.post(
+                f"/polecacz/opinion/create/{recommendation.id}/",
+                data={"description": "TestDescription", "rating": rating},
+            )
+        self.assertEqual(
+            (game.feedback.rating_sum, game.feedback.counter), (11, 2)
+        )
+        tag_feedback = TagFeedback.objects.get(tag__name="Tag1")
+        self.assertEqual((tag_feedback.rating_sum, tag_feedback.counter), (11, 2))
+
     def test_opinion_create_view_returns_errors(self):
         recommendation = Recommendation.objects.create(user=self.user)
         response = self.client.post(
@@ -811,6 +883,85 @@ class RecommendationCreateViewTest(TestCase):
         self.assertEqual(len(selected_games_obj.selected_games.all()), 0)
 
 
+    def test_create_recommendation_with_constraints(self):
+        game1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.02)
+        GameFactory(tags=["Tag1", "Tag2"], rating=8.5, max_players=2)
+        game3 = GameFactory(tags=["Tag1"], rating=7.0, max_players=6, playing_time=60)
+        SelectedGames.objects.create(user=self.user).selected_games.add(game1)
+
+        response = self.client.post("/polecacz/create_recommendation/", {"players": 5, "max_playing_time": ""})
+        self.assertEqual(response.status_code, 302)
+
+        recommendation = Recommendation.objects.get(user=self.user)
+        self.assertEqual(recommendation.constraints, {"players": 5})
+        self.assertEqual(list(recommendation.recommended_games.all()), [game3])
+
+    def test_create_recommendation_with_invalid_constraints(self):
+        game1 = GameFactory(tags=["Tag1", "Tag2"])
+        selected_games_obj = SelectedGames.objects.create(user=self.user)
+        selected_games_obj.selected_games.add(game1)
+
+        response = self.client.post("/polecacz/create_recommendation/", {"year_from": 2000, "year_to": 1990})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, "/polecacz/selected_games/")
+        self.assertFalse(Recommendation.objects.filter(user=self.user).exists())
+        self.assertEqual(list(selected_games_obj.selected_games.all()), [game1])
+
+    def test_create_recommendation_uses_constant_number_of_queries(self):
+        games = [
+            GameFactory(tags=["Common", f"Tag{number}"], rating=8.0 - number / 10)
+            for number in range(20)
+        ]
+        OwnedGames.objects.create(user=self.user).owned_games.add(*games[-3:])
+        selected_games_obj = SelectedGames.objects.create(user=self.user)
+
+        def count_queries(selected_games: list) -> int:
+            selected_games_obj.selected_games.add(*selected_games)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post("/polecacz/create_recommendation/")
+            self.assertEqual(response.status_code, 302)
+            return len(context.captured_queries)
+
+        count_queries(games[:1])
+        self.assertEqual(count_queries(games[1:3]), count_queries(games[3:10]))
+        recommendation = Recommendation.objects.filter(user=self.user).latest("creation_date")
+        self.assertEqual(recommendation.selected_games.count(), 7)
+        self.assertEqual(recommendation.recommended_games.count(), 10)
+
+    def test_create_recommendation_in_background(self):
+        game1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.02)
+        game2 = GameFactory(tags=["Tag1", "Tag2", "Tag3"], rating=8.92)
+        selected_games_obj = SelectedGames.objects.create(user=self.user)
+        selected_games_obj.selected_games.add(game1)
+
+        with self.settings(RECOMMENDATION_JOBS="db"):
+            response = self.client.post("/polecacz/create_recommendation/")
+        recommendation = Recommendation.objects.get(user=self.user)
+        self.assertEqual(response.url, f"/polecacz/recommendation/{recommendation.id}/")
+        self.assertEqual(recommendation.status, Recommendation.Status.PENDING)
+        self.assertFalse(recommendation.recommended_games.exists())
+        self.assertFalse(selected_games_obj.selected_games.exists())
+
+        out = StringIO()
+        call_command("process_recommendation_jobs", "--once", stdout=out)
+        self.assertIn("Computed 1 recommendations", out.getvalue())
+        recommendation.refresh_from_db()
+        self.assertEqual(recommendation.status, Recommendation.Status.DONE)
+        self.assertEqual(list(recommendation.recommended_games.all()), [game2])
+
+    @patch("polecacz.recommendations.jobs.get_executor")
+    def test_create_recommendation_in_thread_pool(self, mocked_get_executor):
+        game1 = GameFactory(tags=["Tag1", "Tag2"], rating=9.02)
+        selected_games_obj = SelectedGames.objects.create(user=self.user)
+        selected_games_obj.selected_games.add(game1)
+
+        with self.settings(RECOMMENDATION_JOBS="thread"), self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/polecacz/create_recommendation/")
+        recommendation = Recommendation.objects.get(user=self.user)
+        mocked_get_executor.return_value.submit.assert_called_once_with(
+            run_recommendation_job, recommendation.id
+        )
+
 class TestRemoveImageView(TestCase):
     def setUp(self) -> None:
         self.user = User.objects.create(username="testuser")
@@ -893,3 +1044,24 @@ class TestAddImageView(TestCase):
             image_metadata = ImageMetadata.objects.filter(user=self.user, game=self.game1, image_name='image.jpg', download_token=self.token).first()
             self.assertFalse(image_metadata)
             self.assertEqual(response.url, f"/polecacz/game/{self.game1.id}/")
+
+
+class RecommendationCacheStatsViewTest(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(username="testuser")
+        self.user.set_password("12345")
+        self.user.save()
+        self.client.login(username="testuser", password="12345")
+
+    def test_recommendation_cache_stats_forbidden_for_regular_user(self):
+        response = self.client.get("/polecacz/recommendation_cache_stats/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_recommendation_cache_stats_returns_counters(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/polecacz/recommendation_cache_stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()["data"]), {"hits", "misses", "hit_ratio"}
+        )
@@ -1,53 +1,131 @@
 import datetime
+import os
+import tempfile
 
-from unittest.mock import patch, Mock, mock_open
+from unittest.mock import patch, MagicMock, Mock, mock_open, ANY
 
+import requests
 from django.test import TestCase
 
 from polecacz.bgg_api.api_wrapper import BGGApiWrapper
+from polecacz.bgg_api.response_cache import ResponseCache
 
 BGG_WRAPPER = BGGApiWrapper()
+RECORDED_RESPONSES_DIR = "test/utest/recorded_responses"
+
+
+def recorded_get(url: str, *args, **kwargs) -> Mock:
+    """
+    Replays responses recorded in RECORDED_RESPONSES_DIR instead of calling BGG.
+    Request for thing?id=1,2 is answered with recorded items which have requested ids, request for dump is
+    answered with file with the same name. Requests for which nothing was recorded are answered with 404.
+    """
+    resource = url.rsplit("/", 1)[-1]
+    response = MagicMock()
+    response.status_code = 404
+    response.content = b"Not Found"
+    if resource.startswith("thing?id="):
+        game_ids = resource[len("thing?id=") :].split(",")
+        items = [
+            item
+            for item in _load_recorded_items()
+            if item.split('id="', 1)[1].split('"', 1)[0] in game_ids
+        ]
+        if items:
+            response.status_code = 200
+            response.text = "<items>" + "".join(items) + "</items>"
+            response.content = response.text.encode("utf-8")
+    elif os.path.exists(os.path.join(RECORDED_RESPONSES_DIR, resource)):
+        with open(os.path.join(RECORDED_RESPONSES_DIR, resource), "rb") as file:
+            response.content = file.read()
+        response.status_code = 200
+        response.text = response.content.decode("utf-8")
+        response.iter_lines.side_effect = lambda *args, **kwargs: iter(
+            response.text.splitlines()
+        )
+    return response
+
+
+def _load_recorded_items() -> list[str]:
+    """
+    Loads all items from recorded thing responses
+    :return: List with item XML strings
+    """
+    items = []
+    for filename in sorted(os.listdir(RECORDED_RESPONSES_DIR)):
+        if filename.startswith("thing") and filename.endswith(".xml"):
+            with open(
+                os.path.join(RECORDED_RESPONSES_DIR, filename), encoding="utf-8"
+            ) as file:
+                content = file.read()
+            items.extend(
+                "<item " + item.split("</item>", 1)[0] + "</item>"
+                for item in content.split("<item ")[1:]
+            )
+    return items
 
 
 class BggApiTests(TestCase):
-    @patch("polecacz.bgg_api.api_wrapper.requests.get")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
     def test_get_games_csv_successfully(self, mocked_get):
-        mocked_response = Mock()
+        mocked_response = MagicMock()
         mocked_get.return_value = mocked_response
         mocked_response.status_code = 200
-        mocked_response.content = b"test123"
+        mocked_response.iter_lines.return_value = iter(["ID,Name", "1,Game1"])
         with patch("builtins.open", mock_open()) as mocked_open:
-            BGG_WRAPPER._get_games_csv()
+            lines = BGG_WRAPPER._get_games_csv()
+            assert list(lines) == ["ID,Name", "1,Game1"]
 
-        mocked_open.assert_called_once_with(
-            f"dump-{datetime.datetime.now().date()}.csv", "wb"
+        assert not mocked_open.called
+        mocked_get.assert_called_once_with(ANY, stream=True, timeout=(5, 30))
+        mocked_response.iter_lines.assert_called_once_with(
+            chunk_size=BGGApiWrapper.DOWNLOAD_CHUNK_SIZE, decode_unicode=True
         )
-        writer = mocked_open()
-        writer.write.assert_called_once_with(b"test123")
+        assert mocked_response.__exit__.called
 
-    @patch("polecacz.bgg_api.api_wrapper.requests.get")
-    def test_get_games_csv_unsuccessfully(self, mocked_get):
-        mocked_response = Mock()
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_get_games_csv_unsuccessfully(self, mocked_get, mocked_sleep):
+        mocked_response = MagicMock()
         mocked_get.return_value = mocked_response
         mocked_response.status_code = 404
-        BGG_WRAPPER._get_games_csv()
         with patch("builtins.open", mock_open()) as mocked_open:
-            BGG_WRAPPER._get_games_csv()
+            assert BGG_WRAPPER._get_games_csv() is None
 
         assert not mocked_open.called
-        writer = mocked_open()
-        assert not writer.write.called
+        assert mocked_response.close.call_count == mocked_get.call_count == 3
+
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_get_games_info_from_dump_stops_reading_response(self, mocked_get):
+        read_lines = []
+
+        def iter_lines(*args, **kwargs):
+            with open("test/utest/game_info.csv", encoding="utf-8") as file:
+                for line in file.read().splitlines():
+                    read_lines.append(line)
+                    yield line
 
-    def test_get_games_info_from_csv_file(self):
+        mocked_response = MagicMock(status_code=200)
+        mocked_response.iter_lines.side_effect = iter_lines
+        mocked_get.return_value = mocked_response
+        games_info = BGG_WRAPPER.get_games_info_from_dump(1)
+        assert [game["id"] for game in games_info] == ["1"]
+        assert len(read_lines) == 2
+        del games_info
+        assert mocked_response.__exit__.called
+
+    def test_get_games_info_from_csv(self):
         path = "test/utest/game_info.csv"
-        info = BGG_WRAPPER._get_games_info_from_csv_file(path)
+        info = list(
+            BGG_WRAPPER._get_games_info_from_csv(BGG_WRAPPER._read_csv_file(path))
+        )
         assert len(info) == 2
         assert info[0]["id"] == "1"
         assert info[0]["rank"] == "1"
         assert info[0]["average"] == "8.475"
         assert info[0]["thumbnail"] == "https://url1.jpg"
 
-    @patch("polecacz.bgg_api.api_wrapper.requests.get")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
     def test_get_game_information_using_id(self, mocked_get):
         mocked_response = Mock()
         mocked_get.return_value = mocked_response
@@ -126,3 +204,238 @@ class BggApiTests(TestCase):
             {"mechanics": [], "categories": ["Zombie"]},
             {"mechanics": ["Kontrakty"], "categories": []},
         ]
+
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_get_games_information_using_ids(self, mocked_get):
+        games_info = BGG_WRAPPER._get_games_information_using_ids(["1", "2"])
+        mocked_get.assert_called_once_with(
+            BGG_WRAPPER.api_url + "thing?id=1,2", timeout=(5, 30)
+        )
+        assert games_info["1"]["game_name"] == "Game1"
+        assert games_info["1"]["mechanics"] == ["Hand Management", "Cooperative Game"]
+        assert games_info["1"]["artist"] == "artist1, artist2"
+        assert games_info["2"]["game_name"] == "Game2"
+        assert games_info["2"]["alternate_name"] == []
+        assert games_info["2"]["min_players"] == "2"
+        assert games_info["2"]["thumbnail"] == "https://url2.jpg"
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_get_games_information_using_ids_reports_errors_per_id(
+        self, mocked_get, mocked_sleep
+    ):
+        games_info = BGG_WRAPPER._get_games_information_using_ids(["3", "4"])
+        assert games_info == {
+            "3": {"game_id": "3", "error": b"Not Found"},
+            "4": {"game_id": "4", "error": b"Not Found"},
+        }
+
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_get_games_information_using_ids_missing_item(self, mocked_get):
+        mocked_get.side_effect = recorded_get
+        games_info = BGG_WRAPPER._get_games_information_using_ids(["1", "2", "3"])
+        assert games_info["1"]["game_name"] == "Game1"
+        assert games_info["2"]["game_name"] == "Game2"
+        assert games_info["3"]["game_id"] == "3"
+        assert "error" in games_info["3"]
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_prepare_data_to_import_to_database_in_batches(
+        self, mocked_get, mocked_sleep
+    ):
+        wrapper = BGGApiWrapper(batch_size=2)
+        with patch.object(
+            wrapper,
+            "_get_games_csv",
+            return_value=BGGApiWrapper._read_csv_file(
+                os.path.join(RECORDED_RESPONSES_DIR, "2022-09-01.csv")
+            ),
+        ):
+            data, wrong_data = wrapper.prepare_data_to_import_to_database()
+
+        assert mocked_get.call_args_list[0].args == (wrapper.api_url + "thing?id=1,2",)
+        assert mocked_get.call_args_list[1].args == (wrapper.api_url + "thing?id=3",)
+        assert [game["id"] for game in data] == ["1", "2"]
+        assert data[0]["rank"] == "1"
+        assert data[0]["mechanics"] == ["Zarządzanie ręką", "Współpraca"]
+        assert data[1]["mechanics"] == ["Otwarty dobór"]
+        assert [game["id"] for game in wrong_data] == ["3"]
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_request_games_info_using_api_retries_queued_request(
+        self, mocked_get, mocked_sleep
+    ):
+        queued_response = Mock(status_code=202)
+        accepted_response = Mock(status_code=200, text="<items></items>")
+        mocked_get.side_effect = [queued_response, queued_response, accepted_response]
+        result = BGG_WRAPPER._request_games_info_using_api(["1"])
+        assert result == "<items></items>"
+        assert [call.args for call in mocked_sleep.call_args_list] == [(0.5,), (1.0,)]
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_request_games_info_using_api_honours_retry_after(
+        self, mocked_get, mocked_sleep
+    ):
+        throttled_response = Mock(status_code=429, headers={"Retry-After": "5"})
+        accepted_response = Mock(status_code=200, text="<items></items>")
+        mocked_get.side_effect = [throttled_response, accepted_response]
+        BGG_WRAPPER._request_games_info_using_api(["1"])
+        mocked_sleep.assert_called_once_with(5.0)
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_iterate_games_information_concurrently_keeps_order(
+        self, mocked_get, mocked_sleep
+    ):
+        wrapper = BGGApiWrapper(batch_size=1, workers=3, rate=100)
+        games_info = [{"id": "3"}, {"id": "2"}, {"id": "1"}]
+        result = list(wrapper._iterate_games_information(games_info))
+        assert [game["id"] for game, _ in result] == ["3", "2", "1"]
+        assert "error" in result[0][1]
+        assert result[1][1]["game_name"] == "Game2"
+        assert result[2][1]["game_name"] == "Game1"
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_prepare_data_to_import_to_database_stops_after_number_of_games(
+        self, mocked_get, mocked_sleep
+    ):
+        wrapper = BGGApiWrapper(batch_size=1)
+        read_rows = []
+        games_info = BGGApiWrapper._get_games_info_from_csv(
+            BGGApiWrapper._read_csv_file(
+                os.path.join(RECORDED_RESPONSES_DIR, "2022-09-01.csv")
+            )
+        )
+
+        def tracked_games_info(dump_lines):
+            for game in games_info:
+                read_rows.append(game["id"])
+                yield game
+
+        with patch.object(wrapper, "_get_games_csv", return_value=iter([])), patch(
+            "polecacz.bgg_api.api_wrapper.BGGApiWrapper._get_games_info_from_csv",
+            side_effect=tracked_games_info,
+        ):
+            data, wrong_data = wrapper.prepare_data_to_import_to_database(1)
+
+        assert [game["id"] for game in data] == ["1"]
+        assert wrong_data == []
+        assert read_rows == ["1"]
+        mocked_get.assert_called_once_with(
+            wrapper.api_url + "thing?id=1", timeout=(5, 30)
+        )
+
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get
+    )
+    def test_request_games_info_using_api_uses_cache(self, mocked_get):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = BGGApiWrapper(cache=ResponseCache(directory))
+            first_result = wrapper._get_games_information_using_ids(["1", "2"])
+            second_result = wrapper._get_games_information_using_ids(["1", "2"])
+
+            offline_wrapper = BGGApiWrapper(
+                cache=ResponseCache(directory, offline=True)
+            )
+            offline_result = offline_wrapper._get_games_information_using_ids(
+                ["1", "2", "3"]
+            )
+        mocked_get.assert_called_once()
+        assert first_result == second_result
+        assert first_result["1"]["game_name"] == "Game1"
+        assert offline_result["3"] == {
+            "game_id": "3",
+            "error": b"Response is not cached",
+        }
+
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_get_games_csv_uses_cache(self, mocked_get):
+        mocked_response = MagicMock()
+        mocked_get.return_value = mocked_response
+        mocked_response.status_code = 200
+        mocked_response.iter_lines.side_effect = lambda *args, **kwargs: iter(
+            ["ID,Name", "1,Game1"]
+        )
+        current_directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                cache = ResponseCache(os.path.join(directory, "cache"))
+                wrapper = BGGApiWrapper(cache=cache)
+                next(wrapper._get_games_csv())
+                assert not os.listdir(cache.directory)
+                assert list(wrapper._get_games_csv()) == ["ID,Name", "1,Game1"]
+                assert list(wrapper._get_games_csv()) == ["ID,Name\n", "1,Game1\n"]
+                assert os.listdir(directory) == ["cache"]
+            finally:
+                os.chdir(current_directory)
+        assert mocked_get.call_count == 2
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch("polecacz.bgg_api.api_wrapper.requests.Session.get")
+    def test_request_games_info_using_api_retries_timeout(
+        self, mocked_get, mocked_sleep
+    ):
+        accepted_response = Mock(status_code=200, text="<items></items>")
+        mocked_get.side_effect = [
+            requests.exceptions.ReadTimeout("Read timed out"),
+            accepted_response,
+        ]
+        result = BGG_WRAPPER._request_games_info_using_api(["1"])
+        assert result == "<items></items>"
+        mocked_sleep.assert_called_once_with(0.5)
+
+    @patch("polecacz.bgg_api.api_wrapper.time.sleep")
+    @patch(
+        "polecacz.bgg_api.api_wrapper.requests.Session.get",
+        side_effect=requests.exceptions.ConnectionError("Connection refused"),
+    )
+    def test_request_games_info_using_api_reports_connection_error(
+        self, mocked_get, mocked_sleep
+    ):
+        result = BGG_WRAPPER._request_games_info_using_api(["1"])
+        assert result == {"game_ids": ["1"], "error": b"Connection refused"}
+        assert mocked_get.call_count == BGGApiWrapper.MAX_RETRIES + 1
+
+    def test_session_keeps_pool_of_connections(self):
+        wrapper = BGGApiWrapper(workers=4, pool_size=8, timeout=(1, 2))
+        adapter = wrapper.session.get_adapter(wrapper.api_url)
+        assert adapter._pool_maxsize == 8
+        assert adapter.max_retries.total == BGGApiWrapper.CONNECTION_RETRIES
+        assert adapter.max_retries.status == 0
+        assert wrapper.timeout == (1, 2)
+        assert (
+            BGGApiWrapper(workers=4).session.get_adapter(wrapper.api_url)._pool_maxsize
+            == 4
+        )
+
+    def test_get_connection_stats(self):
+        wrapper = BGGApiWrapper()
+        assert wrapper.get_connection_stats() == {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+        }
+        pool = wrapper.session.get_adapter(
+            wrapper.api_url
+        ).poolmanager.connection_from_url(wrapper.api_url)
+        pool.num_requests, pool.num_connections = 5, 2
+        assert wrapper.get_connection_stats() == {
+            "requests": 5,
+            "new_connections": 2,
+            "reused_connections": 3,
+        }
@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from polecacz.models import Game
+from polecacz.recommendations.blending import blend_scores
+
+
+class BlendingTests(TestCase):
+    def test_blend_scores_orders_by_blended_score_and_rating(self):
+        game_1 = Game(name="game1", rating=9.0)
+        game_2 = Game(name="game2", rating=8.0)
+        game_3 = Game(name="game3", rating=7.0)
+        tag_scores = {game_1.id: 2, game_2.id: 1, game_3.id: 1}
+        cooccurrence_scores = {game_3.id: 4}
+        games = [game_1, game_2, game_3]
+
+        assert blend_scores(games, [(tag_scores, 1), (cooccurrence_scores, 0)], 3) == [
+            game_1,
+            game_2,
+            game_3,
+        ]
+        assert blend_scores(games, [(tag_scores, 1), (cooccurrence_scores, 1)], 2) == [
+            game_3,
+            game_1,
+        ]
+
+    def test_blend_scores_sets_components(self):
+        game_1 = Game(name="game1", rating=9.0)
+        game_2 = Game(name="game2", rating=8.0)
+        tag_scores = {game_1.id: 4, game_2.id: 2}
+        cooccurrence_scores = {game_2.id: 3}
+
+        result = blend_scores(
+            [game_1, game_2],
+            [(tag_scores, 1), (cooccurrence_scores, 1)],
+            2,
+            ["tags", "cooccurrence"],
+        )
+        assert result == [game_2, game_1]
+        assert game_1.components == {"tags": 1.0, "cooccurrence": 0}
+        assert game_2.components == {"tags": 0.5, "cooccurrence": 1.0}
+
+    def test_blend_scores_normalizes_negative_scores(self):
+        game_1 = Game(name="game1", rating=9.0)
+        game_2 = Game(name="game2", rating=8.0)
+        boosts = {game_1.id: -0.5, game_2.id: 0.25}
+
+        assert blend_scores([game_1, game_2], [({}, 1), (boosts, 1)], 2) == [
+            game_2,
+            game_1,
+        ]
@@ -0,0 +1,23 @@
+from django.test import TestCase
+
+from polecacz.recommendations.breakdown import make_breakdown, scale_breakdown
+
+
+class BreakdownTests(TestCase):
+    def test_make_breakdown_orders_tags_and_skips_empty_components(self):
+        breakdown = make_breakdown(
+            {"Tag1": 1, "Tag2": 2.123456}, cooccurrence=0.5, feedback=0
+        )
+        assert breakdown == {
+            "tags": {"Tag2": 2.1235, "Tag1": 1.0},
+            "cooccurrence": 0.5,
+        }
+        assert list(breakdown["tags"]) == ["Tag2", "Tag1"]
+        assert make_breakdown() == {"tags": {}}
+
+    def test_scale_breakdown(self):
+        assert scale_breakdown({"Tag1": 1, "Tag2": 3}, 0.5) == {
+            "Tag1": 0.125,
+            "Tag2": 0.375,
+        }
+        assert scale_breakdown({}, 1) == {}
@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from polecacz.recommendations.constraints import GameAttributes
+
+
+class GameAttributesTests(TestCase):
+    def setUp(self) -> None:
+        self.attributes = GameAttributes(
+            [
+                (2, 4, 60, "1995"),
+                (1, 1, 30, "995"),
+                (None, None, None, None),
+                (3,),
+            ]
+        )
+
+    def test_get_mask_without_constraints(self):
+        assert self.attributes.get_mask() is None
+        assert self.attributes.get_mask({"players": None}) is None
+
+    def test_get_mask_checks_every_constraint(self):
+        assert self.attributes.get_mask({"players": 3}).tolist() == [
+            True,
+            False,
+            False,
+            False,
+        ]
+        assert self.attributes.get_mask({"max_playing_time": 45}).tolist() == [
+            False,
+            True,
+            False,
+            False,
+        ]
+        assert self.attributes.get_mask(
+            {"year_from": 900, "year_to": 2000}
+        ).tolist() == [True, False, False, False]
@@ -0,0 +1,12 @@
+from django.test import TestCase
+
+from polecacz.recommendations.cooccurrence import count_cooccurrence
+
+
+class CooccurrenceTests(TestCase):
+    def test_count_cooccurrence_counts_pairs_in_both_directions(self):
+        counter = count_cooccurrence([{"1", "2", "3"}, {"1", "2"}])
+        assert counter[("1", "2")] == 2
+        assert counter[("2", "1")] == 2
+        assert counter[("1", "3")] == 1
+        assert ("1", "1") not in counter
@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from polecacz.recommendations.diversity import (
+    get_intra_list_similarity,
+    get_tag_similarity,
+    rerank_with_mmr,
+)
+from polecacz.recommendations.tag_index import TagIndex
+from test.utest.test_tag_index import GAME_TAGS, GAMES
+
+TAG_VECTORS = {"1": 0b0111, "2": 0b0111, "3": 0b0011, "4": 0b1000}
+RELEVANCE = {"1": 3, "2": 3, "3": 2, "4": 1}
+
+
+class DiversityTests(TestCase):
+    def test_get_tag_similarity(self):
+        assert get_tag_similarity(0b0111, 0b0111) == 1
+        assert get_tag_similarity(0b0011, 0b1100) == 0
+        assert get_tag_similarity(0b0001, 0b0011) == 1 / 2**0.5
+        assert get_tag_similarity(0, 0b0011) == 0
+
+    def test_rerank_with_mmr_without_diversity_keeps_order(self):
+        assert rerank_with_mmr(["1", "2", "3", "4"], RELEVANCE, TAG_VECTORS, 3, 0) == [
+            "1",
+            "2",
+            "3",
+        ]
+
+    def test_rerank_with_mmr_skips_near_clones(self):
+        assert rerank_with_mmr(
+            ["1", "2", "3", "4"], RELEVANCE, TAG_VECTORS, 3, 0.7
+        ) == ["1", "4", "3"]
+
+    def test_rerank_with_mmr_lowers_intra_list_similarity(self):
+        relevant = ["1", "2", "3"]
+        diverse = rerank_with_mmr(["1", "2", "3", "4"], RELEVANCE, TAG_VECTORS, 3, 0.7)
+        assert get_intra_list_similarity(diverse, TAG_VECTORS) < (
+            get_intra_list_similarity(relevant, TAG_VECTORS)
+        )
+        assert get_intra_list_similarity(["1"], TAG_VECTORS) == 0
+
+    def test_tag_index_keeps_tag_vectors(self):
+        index = TagIndex(GAMES, GAME_TAGS)
+        assert get_tag_similarity(index.tag_vectors["1"], index.tag_vectors["4"]) == 1
+        assert get_tag_similarity(index.tag_vectors["1"], index.tag_vectors["5"]) == 0
+        assert "6" not in index.tag_vectors
@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from polecacz.recommendations.feedback import FeedbackBoosts
+
+
+class FeedbackBoostsTests(TestCase):
+    def test_feedback_boosts_are_smoothed(self):
+        boosts = FeedbackBoosts(
+            [("1", 10, 1), ("2", 100, 10), ("3", 11, 2)], [("Tag1", 1, 1)]
+        )
+        assert 0 < boosts.game_boosts["1"] < boosts.game_boosts["2"] < 1
+        assert boosts.game_boosts["3"] == 0
+        assert boosts.tag_boosts["Tag1"] < 0
+
+    def test_feedback_boosts_get_boost(self):
+        boosts = FeedbackBoosts([("1", 40, 4)], [("Tag1", 10, 1), ("Tag2", 1, 1)])
+        assert boosts.get_boost("1") == boosts.game_boosts["1"]
+        assert (
+            boosts.get_boost("2", ["Tag1", "Tag2", "Tag3"])
+            == (boosts.tag_boosts["Tag1"] + boosts.tag_boosts["Tag2"]) / 3
+        )
+        assert boosts.get_boost("2") == 0
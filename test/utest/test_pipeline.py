@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from polecacz.bgg_api.api_wrapper import BGGApiWrapper
+from polecacz.bgg_api.pipeline import ImportPipeline, StageCounter
+from test.utest.test_bgg_api import recorded_get
+
+
+@patch("polecacz.bgg_api.api_wrapper.time.sleep")
+@patch("polecacz.bgg_api.api_wrapper.requests.Session.get", side_effect=recorded_get)
+class ImportPipelineTests(TestCase):
+    def test_run_keeps_order_and_counts_games(self, mocked_get, mocked_sleep):
+        wrapper = BGGApiWrapper(batch_size=1, workers=3)
+        pipeline = ImportPipeline(wrapper, queue_size=1)
+        games_info = [{"id": "3"}, {"id": "2"}, {"id": "1"}, {"id": "2"}]
+        result = list(pipeline.run(games_info))
+        assert [game["id"] for game, _ in result] == ["3", "2", "1", "2"]
+        assert "error" in result[0][1]
+        assert result[1][1]["game_name"] == "Game2"
+        assert result[2][1]["game_name"] == "Game1"
+        assert pipeline.counters["fetch"].items == 4
+        assert pipeline.counters["parse"].items == 4
+
+    def test_run_parses_in_process_pool(self, mocked_get, mocked_sleep):
+        wrapper = BGGApiWrapper(batch_size=2, workers=2)
+        pipeline = ImportPipeline(wrapper, parse_processes=2)
+        result = list(pipeline.run([{"id": "1"}, {"id": "2"}]))
+        assert [info["game_name"] for _, info in result] == ["Game1", "Game2"]
+        assert pipeline.counters["parse"].workers == 2
+
+    def test_run_stops_when_consumer_stops(self, mocked_get, mocked_sleep):
+        wrapper = BGGApiWrapper(batch_size=1, workers=1)
+        pipeline = ImportPipeline(wrapper, queue_size=1)
+        games_info = ({"id": str(game_id % 2 + 1)} for game_id in range(1000))
+        result = pipeline.run(games_info)
+        assert next(result)[0]["id"] == "1"
+        result.close()
+        assert mocked_get.call_count < 20
+
+    def test_run_raises_stage_error(self, mocked_get, mocked_sleep):
+        def games_info():
+            yield {"id": "1"}
+            raise ValueError("broken dump")
+
+        wrapper = BGGApiWrapper(batch_size=1, workers=1)
+        with self.assertRaises(ValueError):
+            list(ImportPipeline(wrapper).run(games_info()))
+
+
+class StageCounterTests(TestCase):
+    def test_throughput(self):
+        counter = StageCounter("fetch", workers=2)
+        assert counter.throughput == 0.0
+        counter.add(10, 2.0)
+        counter.add(10, 2.0)
+        assert counter.throughput == 10.0
+        assert str(counter) == "fetch: 20 games, 4.00s busy, 10.0 games/s"
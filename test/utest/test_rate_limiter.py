@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from polecacz.bgg_api.rate_limiter import TokenBucket
+
+
+class TokenBucketTests(TestCase):
+    def test_token_bucket_wrong_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    @patch("polecacz.bgg_api.rate_limiter.time.sleep")
+    @patch("polecacz.bgg_api.rate_limiter.time.monotonic")
+    def test_token_bucket_allows_burst_up_to_capacity(
+        self, mocked_monotonic, mocked_sleep
+    ):
+        mocked_monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=2)
+        bucket.acquire()
+        bucket.acquire()
+        assert not mocked_sleep.called
+
+    @patch("polecacz.bgg_api.rate_limiter.time.sleep")
+    @patch("polecacz.bgg_api.rate_limiter.time.monotonic")
+    def test_token_bucket_waits_for_token(self, mocked_monotonic, mocked_sleep):
+        current_time = [100.0]
+        mocked_monotonic.side_effect = lambda: current_time[0]
+
+        def sleep(seconds):
+            current_time[0] += seconds
+
+        mocked_sleep.side_effect = sleep
+        bucket = TokenBucket(rate=2)
+        for _ in range(4):
+            bucket.acquire()
+        mocked_sleep.assert_called_with(0.5)
+        assert current_time[0] == 101.0
@@ -0,0 +1,79 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from polecacz.bgg_api.response_cache import ResponseCache
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_put_and_get(self):
+        cache = ResponseCache(self.directory.name)
+        assert cache.get("https://url/1") is None
+        cache.put("https://url/1", b"content")
+        assert cache.get("https://url/1") == b"content"
+        assert cache.get("https://url/2") is None
+
+    def test_put_file(self):
+        cache = ResponseCache(self.directory.name)
+        filename = os.path.join(self.directory.name, "source.csv")
+        with open(filename, "wb") as file:
+            file.write(b"id,name")
+        cache.put_file("https://url/dump.csv", filename)
+        with open(cache.get_path("https://url/dump.csv"), "rb") as file:
+            assert file.read() == b"id,name"
+
+    @patch("polecacz.bgg_api.response_cache.time.time")
+    def test_expired_response(self, mocked_time):
+        mocked_time.return_value = 1000.0
+        cache = ResponseCache(self.directory.name, ttl=10)
+        cache.put("https://url/1", b"content")
+        os.utime(cache._get_cache_path("https://url/1"), (1000.0, 1000.0))
+        assert cache.get("https://url/1") == b"content"
+        mocked_time.return_value = 1011.0
+        assert (
+            ResponseCache(self.directory.name, ttl=10, offline=True).get(
+                "https://url/1"
+            )
+            == b"content"
+        )
+        assert cache.get("https://url/1") is None
+        assert not os.path.exists(cache._get_cache_path("https://url/1"))
+
+    def test_least_recently_used_response_is_evicted(self):
+        cache = ResponseCache(self.directory.name, max_size=10)
+        cache.put("https://url/1", b"1234")
+        cache.put("https://url/2", b"1234")
+        os.utime(cache._get_cache_path("https://url/1"), (100.0, 100.0))
+        os.utime(cache._get_cache_path("https://url/2"), (50.0, 50.0))
+        cache = ResponseCache(self.directory.name, max_size=10)
+        cache.put("https://url/3", b"1234")
+        assert cache.get("https://url/1") == b"1234"
+        assert cache.get("https://url/2") is None
+        assert cache.get("https://url/3") == b"1234"
+
+    def test_used_response_is_not_evicted(self):
+        cache = ResponseCache(self.directory.name, max_size=10)
+        cache.put("https://url/1", b"1234")
+        cache.put("https://url/2", b"1234")
+        assert cache.get("https://url/1") == b"1234"
+        cache.put("https://url/3", b"1234")
+        assert cache.get("https://url/1") == b"1234"
+        assert cache.get("https://url/2") is None
+        assert cache.get("https://url/3") == b"1234"
+        with patch("polecacz.bgg_api.response_cache.os.scandir") as scandir:
+            cache.put("https://url/4", b"12")
+            scandir.assert_not_called()
+
+    def test_response_removed_after_it_was_found_is_not_cached(self):
+        cache = ResponseCache(self.directory.name)
+        cache.put("https://url/1", b"content")
+        path = cache.get_path("https://url/1")
+        os.remove(path)
+        with patch.object(cache, "get_path", return_value=path):
+            assert cache.get("https://url/1") is None
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.test import TestCase
+
+from polecacz.recommendations.result_cache import (
+    RecommendationCache,
+    invalidate_recommendation_cache,
+)
+
+OTHER_PROCESS_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "other-process",
+    },
+    # Results and counters are kept in cache shared by all processes, e.g. memcached
+    "recommendations": settings.CACHES["recommendations"],
+}
+
+
+class RecommendationCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.cache = RecommendationCache()
+        self.cache.reset_stats()
+
+    def test_recommendation_cache_key_ignores_order_of_games(self):
+        key = self.cache.make_key(["1", "2"], ["3", "4"], 10)
+        assert key == self.cache.make_key(["2", "1", "1"], ["4", "3"], 10)
+        assert key != self.cache.make_key(["1", "2"], ["3"], 10)
+        assert key != self.cache.make_key(["1", "2"], ["3", "4"], 5)
+        with self.settings(RECOMMENDATION_BACKEND="sparse"):
+            assert key != self.cache.make_key(["1", "2"], ["3", "4"], 10)
+
+    def test_recommendation_cache_counts_hits_and_misses(self):
+        key = self.cache.make_key(["1"], [], 10)
+        assert self.cache.get(key) is None
+        self.cache.set(key, ["2", "3"])
+        assert self.cache.get(key) == ["2", "3"]
+        assert self.cache.get(key) == ["2", "3"]
+        assert self.cache.get_stats() == {
+            "hits": 2,
+            "misses": 1,
+            "hit_ratio": 2 / 3,
+        }
+
+    def test_recommendation_cache_invalidation_changes_key(self):
+        key = self.cache.make_key(["1"], [], 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_recommendation_cache()
+        assert key != self.cache.make_key(["1"], [], 10)
+
+    def test_recommendation_cache_invalidation_from_other_process_changes_key(self):
+        key = self.cache.make_key(["1"], [], 10)
+        with self.settings(CACHES=OTHER_PROCESS_CACHES):
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_recommendation_cache()
+        assert key != self.cache.make_key(["1"], [], 10)
+
+    def test_recommendation_cache_counts_hits_and_misses_of_all_processes(self):
+        key = self.cache.make_key(["1"], [], 10)
+        assert self.cache.get(key) is None
+        with self.settings(CACHES=OTHER_PROCESS_CACHES):
+            other_cache = RecommendationCache()
+            assert other_cache.get(key) is None
+            other_cache.set(key, ["2"])
+            assert other_cache.get(key) == ["2"]
+        assert self.cache.get_stats() == {
+            "hits": 1,
+            "misses": 2,
+            "hit_ratio": 1 / 3,
+        }
+
+    def test_recommendation_cache_counts_without_database_queries(self):
+        key = self.cache.make_key(["1"], [], 10)
+        with self.assertNumQueries(0):
+            self.cache.get(key)
+            self.cache.set(key, ["2"])
+            self.cache.get(key)
+        assert self.cache.get_stats()["hits"] == 1
@@ -0,0 +1,119 @@
+import uuid
+
+from django.test import TestCase
+
+import numpy as np
+
+from polecacz.recommendations.sparse_engine import SparseRecommendationEngine
+from polecacz.recommendations.tag_index import TagIndex
+from test.utest.test_tag_index import GAMES, GAME_TAGS
+
+
+class SparseRecommendationEngineTests(TestCase):
+    def setUp(self) -> None:
+        self.engine = SparseRecommendationEngine(GAMES, GAME_TAGS)
+
+    def test_sparse_engine_overlap_matches_tag_index(self):
+        index = TagIndex(GAMES, GAME_TAGS)
+        for tags, exclude_ids in (
+            (["Tag1", "Tag2", "Tag3"], []),
+            (["Tag1", "Tag2", "Tag3"], ["1", "7"]),
+            (["Tag1", "Tag1", "Tag2"], []),
+            (["Tag4"], []),
+            (["Tag5"], []),
+            ([], []),
+        ):
+            assert self.engine.find_most_similar_games(
+                tags, exclude_ids
+            ) == index.find_most_similar_games(tags, exclude_ids)
+
+    def test_sparse_engine_accepts_uuid_ids_given_as_text(self):
+        game_1, game_2, game_3 = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        engine = SparseRecommendationEngine(
+            [(game_1, 9.0), (game_2, 8.0), (game_3, 7.0)],
+            [(game_1, "Tag1"), (game_2, "Tag1"), (game_3, "Tag1"), (game_3, "Tag2")],
+        )
+        ((result,),) = engine.score_most_similar_games_batch(
+            [["Tag1", "Tag2"]],
+            [[str(game_3)]],
+            include_ids=[str(game_2), str(game_3)],
+        )
+        assert result == (game_2, 1.0)
+        assert engine.explain_games([str(game_3)], ["Tag2"]) == {game_3: {"Tag2": 1.0}}
+        assert engine.get_tag_names(str(game_3)) == ["Tag1", "Tag2"]
+
+    def test_sparse_engine_scores_metrics(self):
+        overlap, cosine, jaccard = (
+            self.engine.score([["Tag1", "Tag2"]], metric)[0]
+            for metric in ("overlap", "cosine", "jaccard")
+        )
+        positions = [self.engine.positions[game_id] for game_id in ["1", "2", "5"]]
+        np.testing.assert_allclose(overlap[positions], [2, 1, 0])
+        np.testing.assert_allclose(
+            cosine[positions], [2 / np.sqrt(6), 1 / np.sqrt(2), 0], rtol=1e-6
+        )
+        np.testing.assert_allclose(jaccard[positions], [2 / 3, 1 / 2, 0], rtol=1e-6)
+
+    def test_sparse_engine_normalized_metrics_prefer_smaller_games(self):
+        result = self.engine.find_most_similar_games(["Tag1"], metric="jaccard")
+        assert result == ["2", "3", "1", "4"]
+
+    def test_sparse_engine_batch_scores_many_selections(self):
+        result = self.engine.find_most_similar_games_batch(
+            [["Tag1", "Tag2", "Tag3"], ["Tag4"], ["Tag2"]],
+            [["1"], [], ["3"]],
+            limit=2,
+        )
+        assert result == [["4", "3"], ["5"], ["1", "4"]]
+
+    def test_sparse_engine_batch_returns_only_included_games(self):
+        result = self.engine.score_most_similar_games_batch(
+            [["Tag1", "Tag2", "Tag3"], ["Tag4"]],
+            [["3"], []],
+            include_ids=["2", "3", "7"],
+        )
+        assert result == [[("2", 1.0)], []]
+
+    def test_sparse_engine_explain_games_sums_to_score(self):
+        tags = ["Tag1", "Tag3", "Tag4"]
+        for metric in ("overlap", "cosine", "jaccard"):
+            for weights in (None, {"Tag1": 1, "Tag2": 2, "Tag3": 3}):
+                scores = self.engine.score([tags], metric, weights)[0]
+                explanation = self.engine.explain_games(
+                    self.engine.game_ids, tags, metric, weights
+                )
+                for game_id, tag_contributions in explanation.items():
+                    np.testing.assert_allclose(
+                        sum(tag_contributions.values()),
+                        scores[self.engine.positions[game_id]],
+                    )
+        assert self.engine.explain_games(["1", "5"], ["Tag1", "Tag3"]) == {
+            "1": {"Tag1": 1.0, "Tag3": 1.0},
+            "5": {},
+        }
+
+    def test_sparse_engine_wrong_metric(self):
+        with self.assertRaises(ValueError):
+            self.engine.score([["Tag1"]], "euclidean")
+
+    def test_sparse_engine_empty_catalogue(self):
+        engine = SparseRecommendationEngine([], [])
+        assert engine.find_most_similar_games(["Tag1"]) == []
+
+    def test_sparse_engine_weighted_overlap_matches_tag_index(self):
+        index = TagIndex(GAMES, GAME_TAGS)
+        weights = {"Tag1": 1, "Tag2": 5, "Tag3": 3, "Tag4": 9}
+        for tags in (["Tag1", "Tag2", "Tag3", "Tag4"], ["Tag1", "Tag3", "Tag4"]):
+            assert self.engine.find_most_similar_games(
+                tags, weights=weights
+            ) == index.find_most_similar_games(tags, weights=weights)
+
+    def test_sparse_engine_weighted_metrics(self):
+        weights = {"Tag1": 1, "Tag2": 2, "Tag3": 3}
+        position = self.engine.positions["3"]
+        cosine, jaccard = (
+            self.engine.score([["Tag1", "Tag3"]], metric, weights)[0][position]
+            for metric in ("cosine", "jaccard")
+        )
+        np.testing.assert_allclose(cosine, 1 / (np.sqrt(10) * np.sqrt(5)))
+        np.testing.assert_allclose(jaccard, 1 / (4 + 3 - 1))
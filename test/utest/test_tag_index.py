@@ -0,0 +1,118 @@
+import uuid
+
+from django.test import TestCase
+
+from polecacz.recommendations.tag_index import TagIndex
+
+GAMES = [("1", 7.0), ("2", 9.0), ("3", 8.0), ("4", None), ("5", 6.0)]
+GAME_TAGS = [
+    ("1", "Tag1"),
+    ("1", "Tag2"),
+    ("1", "Tag3"),
+    ("2", "Tag1"),
+    ("3", "Tag1"),
+    ("3", "Tag2"),
+    ("4", "Tag1"),
+    ("4", "Tag2"),
+    ("4", "Tag3"),
+    ("5", "Tag4"),
+    ("6", "Tag1"),
+]
+
+
+class TagIndexTests(TestCase):
+    def setUp(self) -> None:
+        self.index = TagIndex(GAMES, GAME_TAGS)
+
+    def test_tag_index_orders_by_number_of_tags_and_rating(self):
+        result = self.index.find_most_similar_games(["Tag1", "Tag2", "Tag3"])
+        assert result == ["1", "4", "3", "2"]
+
+    def test_tag_index_skips_games_without_tags(self):
+        assert self.index.find_most_similar_games(["Tag4"]) == ["5"]
+        assert self.index.find_most_similar_games(["Tag5"]) == []
+        assert self.index.find_most_similar_games([]) == []
+
+    def test_tag_index_excludes_games_and_limits_result(self):
+        result = self.index.find_most_similar_games(
+            ["Tag1", "Tag2", "Tag3"], exclude_ids=["1", "7"], limit=2
+        )
+        assert result == ["4", "3"]
+
+    def test_tag_index_returns_only_included_games(self):
+        result = self.index.find_most_similar_games(
+            ["Tag1", "Tag2", "Tag3"], include_ids=["2", "3", "5", "7"]
+        )
+        assert result == ["3", "2"]
+        assert self.index.find_most_similar_games(["Tag1"], include_ids=[]) == []
+
+    def test_tag_index_returns_only_games_satisfying_constraints(self):
+        index = TagIndex(
+            [("1", 7.0, 1, 4, 60, "2001"), ("2", 9.0, 2, 2, 30, "1999"), ("3", 8.0)],
+            GAME_TAGS,
+        )
+        result = index.find_most_similar_games(["Tag1"], constraints={"players": 2})
+        assert result == ["2", "1"]
+        result = index.find_most_similar_games(
+            ["Tag1"], constraints={"year_from": 2000}
+        )
+        assert result == ["1"]
+
+    def test_tag_index_accepts_uuid_ids_given_as_text(self):
+        game_1, game_2, game_3 = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        index = TagIndex(
+            [(game_1, 9.0), (game_2, 8.0), (game_3, 7.0)],
+            [(game_1, "Tag1"), (game_2, "Tag1"), (game_3, "Tag1"), (game_3, "Tag2")],
+        )
+        result = index.find_most_similar_games(
+            ["Tag1", "Tag2"],
+            exclude_ids=[str(game_3)],
+            include_ids=[str(game_2), str(game_3)],
+        )
+        assert result == [game_2]
+        assert index.explain_games([str(game_3)], ["Tag2"]) == {game_3: {"Tag2": 1}}
+        assert index.get_tag_names([str(game_3)]) == ["Tag1", "Tag2"]
+
+    def test_tag_index_ignores_duplicated_tags(self):
+        result = self.index.find_most_similar_games(["Tag1", "Tag1", "Tag2"])
+        assert result == ["3", "1", "4", "2"]
+
+    def test_tag_index_score_games(self):
+        assert self.index.score_games(["1", "2", "5"], ["Tag1", "Tag2"]) == {
+            "1": 2,
+            "2": 1,
+            "5": 0,
+        }
+        assert self.index.score_games(["1"], ["Tag1", "Tag2"], {"Tag2": 5}) == {"1": 6}
+
+    def test_tag_index_explain_games(self):
+        assert self.index.explain_games(
+            ["1", "2", "5"], ["Tag1", "Tag2"], {"Tag2": 5}
+        ) == {"1": {"Tag1": 1, "Tag2": 5}, "2": {"Tag1": 1}, "5": {}}
+
+    def test_tag_index_get_tag_names(self):
+        assert self.index.get_tag_names(["2", "3", "7"]) == ["Tag1", "Tag2"]
+        assert len(self.index) == 5
+
+    def test_tag_index_counts_many_tags(self):
+        tags = [f"Tag{number}" for number in range(40)]
+        games = [(uuid.uuid4(), float(number)) for number in range(100)]
+        game_tags = [
+            (game_id, tag)
+            for number, (game_id, _) in enumerate(games)
+            for tag in tags[: number % 40]
+        ]
+        index = TagIndex(games, game_tags)
+        result = index.find_most_similar_games(tags, limit=3)
+        assert result == [games[79][0], games[39][0], games[78][0]]
+
+    def test_tag_index_sums_weights_of_shared_tags(self):
+        weights = {"Tag1": 1, "Tag2": 5, "Tag3": 3, "Tag4": 9}
+        result = self.index.find_most_similar_games(
+            ["Tag1", "Tag2", "Tag3", "Tag4"], weights=weights
+        )
+        assert result == ["1", "5", "4", "3", "2"]
+        result = self.index.find_most_similar_games(
+            ["Tag1", "Tag3", "Tag4"], weights=weights, limit=2
+        )
+        assert result == ["5", "1"]
@@ -0,0 +1,17 @@
+from django.test import TestCase
+
+from polecacz.recommendations.tag_weights import TagWeights, WEIGHT_SCALE
+
+
+class TagWeightsTests(TestCase):
+    def test_tag_weights_prefer_rare_tags(self):
+        weights = TagWeights({"Common": 100, "Rare": 2}, 100)
+        assert weights.weights["Common"] == WEIGHT_SCALE
+        assert weights.weights["Rare"] > 3 * weights.weights["Common"]
+
+    def test_tag_weights_get_weights(self):
+        weights = TagWeights({"Common": 100, "Rare": 2}, 100)
+        assert weights.get_weights(["Rare", "Missing"]) == {
+            "Rare": weights.weights["Rare"],
+            "Missing": TagWeights._calculate_weight(100, 0),
+        }
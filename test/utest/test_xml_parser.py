@@ -0,0 +1,45 @@
+from bs4 import BeautifulSoup
+from django.test import TestCase
+
+from polecacz.bgg_api import xml_parser
+from polecacz.bgg_api.api_wrapper import BGGApiWrapper
+
+RECORDED_THING = "test/utest/recorded_responses/thing_1_2.xml"
+
+
+class XmlParserTests(TestCase):
+    def setUp(self) -> None:
+        with open(RECORDED_THING, "rb") as file:
+            self.games_info = file.read()
+
+    def test_iterate_items_returns_all_items(self):
+        result = dict(xml_parser.iterate_items(self.games_info))
+        assert list(result.keys()) == ["1", "2"]
+        assert result["1"] == {
+            "game_name": "Game1",
+            "year_published": "2021",
+            "min_players": "1",
+            "max_players": "4",
+            "playing_time": "120",
+            "alternate_name": ["Gra1"],
+            "categories": ["Adventure", "Fantasy"],
+            "mechanics": ["Hand Management", "Cooperative Game"],
+            "designer": "designer1",
+            "artist": "artist1, artist2",
+            "thumbnail": "https://url1.jpg",
+        }
+
+    def test_iterate_items_matches_soup_parser(self):
+        soup = BeautifulSoup(self.games_info, features="xml")
+        expected = {
+            item.get("id"): BGGApiWrapper._process_game_info(item)
+            for item in soup.find_all("item")
+        }
+        result = dict(xml_parser.iterate_items(self.games_info.decode("utf-8")))
+        assert result == expected
+
+    def test_iterate_items_missing_fields(self):
+        result = dict(xml_parser.iterate_items('<items><item id="5"></item></items>'))
+        assert result["5"]["game_name"] is None
+        assert result["5"]["mechanics"] == []
+        assert "thumbnail" not in result["5"]